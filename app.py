@@ -1,11 +1,55 @@
-from flask import Flask, jsonify, request, render_template
+from flask import (
+    Flask,
+    Response,
+    abort,
+    jsonify,
+    request,
+    render_template,
+)
 from flask_cors import CORS
-import pdfplumber
+from werkzeug.middleware.proxy_fix import ProxyFix
+import asyncio
+import functools
+import hmac
+import itertools
 import json
+import math
 import os
+import time
 
-from recog_ai import get_embedding, get_module_database, RecognitionAssistant
-from visualize.visualize import visualize_bp, initChromaviz
+from recog_ai import get_embedding, RecognitionAssistant
+from recog_ai.admission import (
+    PRIORITY_ANONYMOUS,
+    PRIORITY_STAFF,
+    AdmissionController,
+    AdmissionRejected,
+)
+from recog_ai.assets import AssetCache, compress_response
+from recog_ai.audit import get_decision_log, inputs_hash, module_key
+from recog_ai.cache import SemanticCache
+from recog_ai.chunking import ChunkedModuleIndex, open_chunk_database
+from recog_ai.circuit_breaker import CircuitOpenError
+from recog_ai.config import embedding_signature
+from recog_ai.llm_client import track_usage
+from recog_ai.memory import (
+    embedding_model_memory,
+    get_memory_registry,
+    megabytes,
+    vector_index_memory,
+)
+from recog_ai.precedents import get_precedent_index
+from recog_ai.uploads import (
+    UnsupportedFileType,
+    detach_uploads,
+    iter_upload_sections,
+    stream_completed,
+)
+from recog_ai.utils import VERDICTS, build_suggestion_query, parse_verdict
+from recog_ai.sync import ModuleDatabaseHandle
+from recog_ai.warmstart import WarmStart, touch_index
+from recog_ai.workspace import get_workspace_store
+import visualize.visualize as visualize
+from visualize.visualize import visualize_bp, initChromaviz, get_layout
 
 INSTITUTION_FILTERS = [
     {"value": "all", "label": "Alle Hochschulen"},
@@ -13,16 +57,304 @@ INSTITUTION_FILTERS = [
     {"value": "Universität Bielefeld", "label": "Universität Bielefeld"},
 ]
 
+# Maximum number of simultaneous LLM examinations for the top-k assessment
+ASSESS_CONCURRENCY = int(os.getenv("ASSESS_CONCURRENCY", "5"))
+
+# Combined uploads are split into at most UPLOAD_MAX_MODULES modules, of
+# which UPLOAD_CONCURRENCY are extracted at the same time
+UPLOAD_MAX_MODULES = int(os.getenv("UPLOAD_MAX_MODULES", "20"))
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "3"))
+
 
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 2**20)))
 app.register_blueprint(visualize_bp)
 CORS(app)
 
-# Initialize embedding and module database
+# Behind TRUSTED_PROXIES reverse proxies, the client address used for
+# per-client rate limits is taken from X-Forwarded-For
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0"))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+# Static files are served from memory with ETags and precompressed bodies;
+# rendered pages above COMPRESS_MIN_SIZE bytes are gzipped per request
+static_assets = AssetCache(app.static_folder)
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+
+
+def send_static(filename):
+    response = static_assets.response(
+        filename,
+        accept_encoding=request.headers.get("Accept-Encoding"),
+        if_none_match=request.headers.get("If-None-Match"),
+    )
+    if response is None:
+        abort(404)
+    return response
+
+
+app.view_functions["static"] = send_static
+
+
+@app.after_request
+def compress(response):
+    """Revalidate rendered GET pages by ETag and gzip compressible bodies."""
+    if (
+        request.method == "GET"
+        and response.status_code == 200
+        and response.mimetype == "text/html"
+        and not response.is_streamed
+        and not response.get_etag()[0]
+    ):
+        response.add_etag()
+        response.headers.setdefault("Cache-Control", "no-cache")
+        response.make_conditional(request)
+    return compress_response(
+        response, request.headers.get("Accept-Encoding"), min_size=COMPRESS_MIN_SIZE
+    )
+
+# Initialize embedding and module database. The handle swaps to a newly
+# published snapshot (see recog_ai.sync) without restarting the app.
 embedding = get_embedding()
-moduledb = get_module_database(embedding)
+moduledb_handle = ModuleDatabaseHandle(embedding)
+moduledb = moduledb_handle.get()
+
+# The map follows snapshot swaps like the search does
+initChromaviz(lambda: moduledb_handle.get()._collection, embedding.embed_query)
+
+# Search section vectors pooled per module (see recog_ai.chunking)
+CHUNKED_INDEX = os.getenv("CHUNKED_INDEX", "0") == "1"
+CHUNK_POOLING = os.getenv("CHUNK_POOLING", "max")
+chunk_index = None
+
+
+def module_index():
+    """Return the search index of the current snapshot."""
+    global chunk_index
+    current = moduledb_handle.get()
+    if not CHUNKED_INDEX:
+        return current
+    if chunk_index is None or chunk_index.db is not current:
+        chunk_index = ChunkedModuleIndex(current, pooling=CHUNK_POOLING)
+    return chunk_index
+
+# Reuse extraction and suggestions for near-duplicate uploads
+suggestion_cache = SemanticCache(
+    embedding.embed_query,
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97")),
+    max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "256")),
+    max_bytes=megabytes("SEMANTIC_CACHE_MAX_MB", 64),
+    min_overlap=float(os.getenv("SEMANTIC_CACHE_MIN_OVERLAP", "0.8")),
+)
+
+
+def cache_namespace(institution_filter):
+    """Cached suggestions depend on the filter and the vector store snapshot."""
+    moduledb_handle.get()
+    return f"{moduledb_handle.path}\0{institution_filter}"
+
+# Confirmed decisions for known external modules, shown above suggestions
+precedent_index = get_precedent_index(embedding.embed_query)
+
+# Hot caches are snapshotted to disk and restored after a restart; the
+# readiness probe reports ready once the model and index are warm
+warm_start = WarmStart.from_env(
+    fingerprint={
+        "embedding": embedding_signature(),
+        "vectorstore": str(moduledb_handle.path),
+    }
+)
+
+
+def warm_index():
+    """Search with recent query embeddings so the index pages are resident."""
+    count = int(os.getenv("WARM_QUERIES", "8"))
+    if hasattr(embedding, "snapshot"):
+        vectors = embedding.snapshot()["vectors"][-count:]
+    else:
+        vectors = []
+    if not vectors:
+        vectors = [embedding.embed_query("Modul Lernziele")]
+    current = moduledb_handle.get()
+    searches = touch_index(current, vectors)
+    chunkdb = open_chunk_database(current) if CHUNKED_INDEX else None
+    if chunkdb is not None:
+        searches += touch_index(chunkdb, vectors)
+    return {"searches": searches}
+
+
+if os.getenv("WARM_START", "1") == "0":
+    warm_start.ready.set()
+else:
+    if hasattr(embedding, "snapshot"):
+        warm_start.register_cache("query_embeddings", embedding, depends_on=["embedding"])
+    warm_start.register_cache(
+        "suggestions", suggestion_cache, depends_on=["embedding", "vectorstore"]
+    )
+    warm_start.add_step(
+        "embedding_model", lambda: len(embedding.embed_documents(["warm-up"])[0])
+    )
+    warm_start.add_step("vector_index", warm_index)
+    if os.getenv("WARM_LAYOUT", "0") == "1":
+        warm_start.add_step("layout", lambda: len(get_layout(wait=True).groups))
+    warm_start.start()
+
+# Bounds concurrent LLM-bound requests; staff requests are queued first
+admission = AdmissionController.from_env()
+
 
-initChromaviz(moduledb._collection)
+def request_priority():
+    """Staff send the shared STAFF_TOKEN in the X-Staff-Token header."""
+    staff_token = os.getenv("STAFF_TOKEN")
+    sent = request.headers.get("X-Staff-Token", "")
+    if staff_token and hmac.compare_digest(sent, staff_token):
+        return PRIORITY_STAFF
+    return PRIORITY_ANONYMOUS
+
+
+def staff_authorized():
+    """Staff-only actions need STAFF_TOKEN (header or form field); denied if unset."""
+    staff_token = os.getenv("STAFF_TOKEN")
+    if not staff_token:
+        return False
+    sent = request.headers.get("X-Staff-Token") or request.form.get("staff_token", "")
+    return hmac.compare_digest(sent, staff_token)
+
+
+def admission_controlled(view):
+    """Run an LLM-bound POST view only after the admission controller admits it."""
+
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+        if request.method != "POST":
+            return await view(*args, **kwargs)
+        ticket = await asyncio.to_thread(
+            admission.acquire, request.remote_addr or "", request_priority()
+        )
+        streamed = False
+        try:
+            response = await view(*args, **kwargs)
+            # Streamed responses keep working after the view returns
+            if isinstance(response, Response) and response.is_streamed:
+                response.call_on_close(lambda: admission.release(ticket))
+                streamed = True
+            return response
+        finally:
+            if not streamed:
+                admission.release(ticket)
+
+    return wrapper
+
+
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(error):
+    response = jsonify({"error": "overloaded", "reason": error.reason})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(math.ceil(error.retry_after))
+    return response
+
+
+@app.errorhandler(CircuitOpenError)
+def llm_unavailable(error):
+    response = jsonify({"error": "llm unavailable", "reason": str(error)})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(math.ceil(error.retry_after))
+    return response
+
+
+# Extracted modules and candidates are kept server-side; forms carry only IDs
+workspace_store = get_workspace_store()
+
+# Memory per component, reported on /diagnostics/memory
+memory_registry = get_memory_registry()
+memory_registry.register("embedding_model", lambda: embedding_model_memory(embedding))
+memory_registry.register(
+    "vector_index", lambda: vector_index_memory(moduledb_handle.path)
+)
+memory_registry.register("visualization", visualize.memory_usage)
+memory_registry.register("suggestion_cache", suggestion_cache.memory)
+if hasattr(embedding, "memory"):
+    memory_registry.register("query_embeddings", embedding.memory)
+if hasattr(workspace_store, "memory"):
+    memory_registry.register("workspaces", workspace_store.memory)
+memory_registry.register(
+    "static_assets",
+    lambda: {"bytes": static_assets.memory()["bytes"] + visualize.assets.memory()["bytes"]},
+)
+
+# Decisions of /select_module are logged; with AUDIT_REUSE_RESULTS=1,
+# identical examinations with the same model and prompt reuse a logged result
+# younger than AUDIT_REUSE_MAX_AGE instead of calling the LLM again
+decision_log = get_decision_log()
+AUDIT_REUSE_RESULTS = os.getenv("AUDIT_REUSE_RESULTS", "0") == "1"
+
+
+def examination_json(module_parsed):
+    """Serialize a module for the examination prompt without its original_doc."""
+    tmp = dict(module_parsed)
+    # Original_doc is not needed for processing of the examination result
+    if "original_doc" in tmp:
+        del tmp["original_doc"]
+    return json.dumps(tmp)
+
+
+def load_workspace():
+    """
+    Return the workspace referenced by the posted form.
+
+    Modules are only ever read from the server-side store; a form without a
+    workspace token is rejected with 400, an expired token with 410.
+    """
+    token = request.form.get("workspace")
+    if not token:
+        abort(400)
+    workspace = workspace_store.get(token)
+    if workspace is None:
+        abort(410)
+    return token, workspace
+
+
+def load_candidate(workspace):
+    """Return the posted ``candidate_id`` and its candidate; 400 if invalid."""
+    try:
+        index = int(request.form.get("candidate_id", "0"))
+        if index < 0:
+            raise IndexError(index)
+        return str(index), workspace["candidates"][index]
+    except (ValueError, IndexError):
+        abort(400)
+
+
+@app.errorhandler(410)
+def workspace_expired(error):
+    return (
+        render_template(
+            "module_suggestions.html",
+            workspace_expired=True,
+            institution_filter="all",
+            institution_filters=INSTITUTION_FILTERS,
+        ),
+        410,
+    )
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """Readiness probe: 503 until caches are restored and the index is warm."""
+    if not warm_start.ready.is_set():
+        return jsonify({"ready": False}), 503, {"Retry-After": "5"}
+    return jsonify({"ready": True, **warm_start.status})
+
+
+@app.route("/diagnostics/memory", methods=["GET"])
+def memory_diagnostics():
+    """Per-component memory of this process; staff only, hidden without STAFF_TOKEN."""
+    if not os.getenv("STAFF_TOKEN"):
+        abort(404)
+    if not staff_authorized():
+        abort(403)
+    return jsonify(memory_registry.report())
 
 
 @app.route("/", methods=["GET"])
@@ -30,67 +362,162 @@ def index():
     return render_template("index.html")
 
 
+async def analyze_document(doc, institution_filter):
+    """
+    Extract one external module and find suggestions for it.
+
+    Args:
+        doc: Module description (at most 10000 characters are used).
+        institution_filter: Institution to restrict suggestions to, or "all".
+
+    Returns:
+        Dictionary with the parsed module, suggestions, retrieval summary
+        (scores and truncation reason), confirmed precedents and the token
+        of the workspace created for the module.
+    """
+    # No more than 10000 characters
+    doc = doc[:10000]
+
+    precedents = []
+    if precedent_index:
+        precedents = await asyncio.to_thread(precedent_index.match, doc)
+    exact = next((p for p in precedents if p["match"] == "exact"), None)
+
+    namespace = cache_namespace(institution_filter)
+    cached = await asyncio.to_thread(suggestion_cache.lookup, doc, namespace=namespace)
+    if cached:
+        external_module_parsed = cached["external_module_parsed"]
+        external_module_parsed["original_doc"] = doc
+        external_module_parsed["raw_document"] = doc
+        module_suggestions = cached["module_suggestions"]
+        retrieval = cached.get("retrieval")
+    elif exact:
+        # A confirmed decision exists for this document: reuse its
+        # extraction, so suggestions only need the embedding
+        external_module_parsed = exact["external_module"]
+        external_module_parsed["original_doc"] = doc
+        external_module_parsed["raw_document"] = doc
+        retrieval = await RecognitionAssistant(module_index()).aretrieve(
+            build_suggestion_query(external_module_parsed, doc),
+            institution=institution_filter,
+        )
+        module_suggestions = retrieval.suggestions
+        retrieval = retrieval.as_dict()
+    else:
+        recog_assistant = RecognitionAssistant(module_index())
+
+        external_module_parsed = await recog_assistant.aget_module_info(doc)
+        translated_doc = build_suggestion_query(external_module_parsed, doc)
+        retrieval = await recog_assistant.aretrieve(
+            translated_doc, institution=institution_filter
+        )
+        module_suggestions = retrieval.suggestions
+        retrieval = retrieval.as_dict()
+        # Failed extractions are not cached so they are retried next time
+        if "error" not in external_module_parsed:
+            await asyncio.to_thread(
+                suggestion_cache.store,
+                doc,
+                {
+                    "external_module_parsed": external_module_parsed,
+                    "module_suggestions": module_suggestions,
+                    "retrieval": retrieval,
+                },
+                namespace=namespace,
+            )
+    workspace_token = workspace_store.create(
+        {
+            "external_module": external_module_parsed,
+            "external_module_json": examination_json(external_module_parsed),
+            "candidates": module_suggestions,
+            "internal_goals": {},
+        }
+    )
+    return {
+        "external_module_parsed": external_module_parsed,
+        "module_suggestions": module_suggestions,
+        "retrieval": retrieval,
+        "precedents": precedents,
+        "workspace_token": workspace_token,
+    }
+
+
+def close_all(files):
+    """Close detached upload copies."""
+    for upload in files:
+        upload.close()
+
+
+def stream_analyses(sections, institution_filter):
+    """Analyze upload sections concurrently, yielding results as they finish."""
+
+    async def analyze(section):
+        position, (source, doc) = section
+        try:
+            result = await analyze_document(doc, institution_filter)
+        except Exception as e:
+            app.logger.exception("Analysis of module %d from %s failed", position, source)
+            result = {"error": str(e)}
+        result.update(position=position + 1, source=source)
+        return result
+
+    for _, result in stream_completed(
+        analyze, enumerate(sections), concurrency=UPLOAD_CONCURRENCY
+    ):
+        yield result
+
+
 # Endpunkt für die Startseite
 @app.route("/find_module", methods=["GET", "POST"])
-def find_module():
+@admission_controlled
+async def find_module():
     institution_filter = "all"
     if request.method == "POST":
-        # Hier verarbeiten wir den Dateiupload und rufen getModuleSuggestions() auf.
+        # Hier verarbeiten wir die Uploads und rufen getModuleSuggestions() auf.
         institution_filter = request.form.get("institution_filter", "all")
-        doc = None
-        uploaded_file = request.files["file"]
-        if uploaded_file:
-            # Check if it's a PDF file
-            if uploaded_file.filename.endswith(".pdf"):
-                with pdfplumber.open(uploaded_file) as pdf:
-                    doc = ""
-                    for page_num in range(max(2, len(pdf.pages))):
-                        doc += pdf.pages[page_num].extract_text()
-            # Check if it's a TXT file
-            elif uploaded_file.filename.endswith(".txt"):
-                doc = uploaded_file.read().decode("utf-8")
-            # Check if it's a xml file
-            elif uploaded_file.filename.endswith(".xml"):
-                doc = uploaded_file.read().decode("utf-8")
-            else:
-                raise Exception("File type not supported")
-        else:
-            doc = request.form["text"]
+        # Request files are closed with the request, but a streamed response
+        # keeps reading them
+        files = detach_uploads(request.files.getlist("file"))
+        # Pasted text is only used without uploads (the form keeps the last text)
+        text = None if files else request.form.get("text")
+        sections = iter_upload_sections(
+            files, text, max_sections=UPLOAD_MAX_MODULES
+        )
+        try:
+            first = list(itertools.islice(sections, 2))
+        except UnsupportedFileType:
+            close_all(files)
+            abort(415)
 
-        if not doc:
-            return render_template("module_suggestions.html")
+        if len(first) > 1:
+            # Combined documents: results are rendered as they become ready.
+            # The template is streamed without the request context, which
+            # cannot be carried over from an async view.
+            template = app.jinja_env.get_template("module_batch.html")
+            response = Response(
+                template.generate(
+                    results=stream_analyses(
+                        itertools.chain(first, sections), institution_filter
+                    ),
+                    verdicts=VERDICTS,
+                )
+            )
+            response.call_on_close(lambda: close_all(files))
+            return response
+        close_all(files)
 
-        # No more than 10000 characters
-        doc = doc[:10000]
-
-        recog_assistant = RecognitionAssistant(moduledb)
-
-        external_module_parsed = recog_assistant.get_module_info(doc)
-        external_module_json = json.dumps(external_module_parsed)
-        translated_doc = ""
-        if external_module_parsed["title"]:
-            translated_doc += "Titel: \n"
-            translated_doc += external_module_parsed["title"]
-            translated_doc += "\n"
-        if external_module_parsed["learninggoals"]:
-            translated_doc += "Lernziele: \n"
-            translated_doc += "\n".join(external_module_parsed["learninggoals"])
-            translated_doc += "\n"
-        if external_module_parsed["level"]:
-            translated_doc += "Niveau: \n"
-            translated_doc += external_module_parsed["level"]
-            translated_doc += "\n"
-        if not translated_doc.strip():
-            translated_doc = external_module_parsed.get("raw_document", doc)[:10000]
-        module_suggestions = recog_assistant.get_module_suggestions(
-            translated_doc, institution=institution_filter
-        )
+        if not first:
+            return render_template("module_suggestions.html")
 
+        result = await analyze_document(first[0][1], institution_filter)
         return render_template(
             "module_suggestions.html",
-            module_suggestions=module_suggestions,
-            external_module_parsed=external_module_parsed,
-            external_module_json=external_module_json,
+            module_suggestions=result["module_suggestions"],
+            external_module_parsed=result["external_module_parsed"],
+            workspace_token=result["workspace_token"],
+            precedents=result["precedents"],
+            retrieval=result["retrieval"],
+            verdicts=VERDICTS,
             institution_filter=institution_filter,
             institution_filters=INSTITUTION_FILTERS,
         )
@@ -104,35 +531,149 @@ def find_module():
 
 # Endpunkt für die Modulauswahl und Prüfung
 @app.route("/select_module", methods=["POST"])
-def select_module():
-    recog_assistant = RecognitionAssistant(moduledb)
-    internal_module_json = request.form["selected_module"]
-    internal_module_parsed = json.loads(internal_module_json)
+@admission_controlled
+async def select_module():
+    recog_assistant = RecognitionAssistant(module_index())
+    token, workspace = load_workspace()
+    candidate_id, candidate = load_candidate(workspace)
 
-    # Get learninggoals
-    internal_module_ai_parsed = recog_assistant.get_module_info(internal_module_json)
-    internal_module_parsed["learninggoals"] = internal_module_ai_parsed["learninggoals"]
+    internal_module_json = candidate["json"]
+    internal_module_parsed = dict(candidate)
+    external_module_parsed = workspace["external_module"]
 
-    external_module_json = request.form["external_module"]
-    external_module_parsed = json.loads(external_module_json)
+    external_module_json = workspace["external_module_json"]
+    model = getattr(recog_assistant._llm_for("examination"), "model", None)
+    decision_inputs = inputs_hash(
+        internal_module_json,
+        external_module_json,
+        model,
+        recog_assistant.examination_prompt_key(),
+    )
+    previous = None
+    if decision_log and AUDIT_REUSE_RESULTS:
+        previous = await asyncio.to_thread(decision_log.lookup, decision_inputs)
+    timings = {}
 
-    # Original_doc is not needed for processing of the examination result
-    tmp = json.loads(external_module_json)
-    # Remove original_doc if it exists
-    if "original_doc" in tmp:
-        del tmp["original_doc"]
-    external_module_json = json.dumps(tmp)
+    async def learninggoals():
+        started = time.perf_counter()
+        # Lernziele eines bereits geprüften Kandidaten werden wiederverwendet.
+        if candidate_id not in workspace["internal_goals"]:
+            info = await recog_assistant.aget_module_info(internal_module_json)
+            workspace["internal_goals"][candidate_id] = info["learninggoals"]
+        timings["learninggoals_ms"] = (time.perf_counter() - started) * 1000
+        return workspace["internal_goals"][candidate_id]
 
-    # Hier rufen wir get_examination_result() auf und generieren das Prüfungsergebnis.
-    examination_result = recog_assistant.get_examination_result(
-        internal_module_json, external_module_json
-    )
+    async def examination():
+        started = time.perf_counter()
+        if previous:
+            result = previous["result"]
+        else:
+            result = await recog_assistant.aget_examination_result(
+                internal_module_json, external_module_json
+            )
+        timings["examination_ms"] = (time.perf_counter() - started) * 1000
+        return result
+
+    # Lernziele des internen Moduls und Prüfungsergebnis werden parallel erzeugt.
+    started = time.perf_counter()
+    with track_usage() as usage:
+        internal_module_parsed["learninggoals"], examination_result = (
+            await asyncio.gather(learninggoals(), examination())
+        )
+    # Kept for confirming the decision as a precedent
+    workspace.setdefault("results", {})[candidate_id] = examination_result
+    workspace_store.update(token, workspace)
+
+    if decision_log:
+        decision_log.log(
+            {
+                "route": "select_module",
+                "inputs_hash": decision_inputs,
+                "external_hash": inputs_hash("", external_module_json, None),
+                "module_key": module_key(internal_module_json),
+                "module_title": candidate.get("title"),
+                "model": model,
+                "verdict": parse_verdict(examination_result),
+                "reused": previous is not None,
+                "total_ms": (time.perf_counter() - started) * 1000,
+                "llm_calls": usage["calls"],
+                "input_tokens": usage["input_tokens"],
+                "output_tokens": usage["output_tokens"],
+                "result": examination_result,
+                **timings,
+            }
+        )
 
     return render_template(
         "examination_result.html",
         internal_module_parsed=internal_module_parsed,
         external_module_parsed=external_module_parsed,
         examination_result=examination_result,
+        workspace_token=token,
+        candidate_id=candidate_id,
+        verdict=parse_verdict(examination_result),
+        verdicts=VERDICTS,
+        can_confirm=precedent_index is not None and bool(os.getenv("STAFF_TOKEN")),
+    )
+
+
+# Endpunkt für die Bestätigung einer Entscheidung als Präzedenzfall
+@app.route("/confirm_decision", methods=["POST"])
+def confirm_decision():
+    # Confirming is a staff action and disabled without a staff token
+    if precedent_index is None or not os.getenv("STAFF_TOKEN"):
+        abort(404)
+    if not staff_authorized():
+        abort(403)
+    token, workspace = load_workspace()
+    candidate_id, candidate = load_candidate(workspace)
+    verdict = request.form.get("verdict")
+    external_module_parsed = workspace["external_module"]
+    document = external_module_parsed.get("original_doc") or external_module_parsed.get(
+        "raw_document"
+    )
+    if verdict not in VERDICTS or not document:
+        abort(400)
+
+    precedent_index.confirm(
+        document,
+        external_module_parsed,
+        candidate["json"],
+        verdict,
+        workspace.get("results", {}).get(candidate_id),
+    )
+    return render_template(
+        "module_suggestions.html",
+        precedent_confirmed=True,
+        institution_filter="all",
+        institution_filters=INSTITUTION_FILTERS,
+    )
+
+
+# Endpunkt für die automatische Prüfung der besten Modulvorschläge
+@app.route("/assess_candidates", methods=["POST"])
+@admission_controlled
+async def assess_candidates():
+    recog_assistant = RecognitionAssistant(module_index())
+    token, workspace = load_workspace()
+
+    candidates = workspace["candidates"]
+    top_k = request.form.get("top_k", type=int) or len(candidates)
+    candidates = candidates[:top_k]
+    stop_on_full = request.form.get("stop_on_full") == "on"
+
+    assessments = await recog_assistant.assess_candidates(
+        workspace["external_module_json"],
+        candidates,
+        concurrency=ASSESS_CONCURRENCY,
+        stop_on_full=stop_on_full,
+    )
+
+    return render_template(
+        "assessment_ranking.html",
+        external_module_parsed=workspace["external_module"],
+        assessments=assessments,
+        verdicts=VERDICTS,
     )
 
 
@@ -0,0 +1,405 @@
+"""Open-loop load driver replaying mixed recognition traffic at target rates.
+
+    python -m loadtest.driver --url http://localhost:5000 --corpus data/eval.jsonl \
+        --rps 1,2,4,8 --duration 30 --select-ratio 0.3
+
+Each stage sends requests at a fixed rate regardless of how fast the app
+answers; latency is measured from the scheduled send time, so queueing in
+the driver counts against the app. ``/select_module`` requests reuse
+workspaces returned by earlier ``/find_module`` responses. The report lists
+latency percentiles per stage and route and the first stage at which the
+app saturated.
+
+All requests come from one address, so they are sent with the staff token
+(``--staff-token`` or ``STAFF_TOKEN``) to bypass per-client rate limits. The
+corpus is replayed repeatedly; run the app with ``SEMANTIC_CACHE_SIZE=0`` and
+``AUDIT_REUSE_RESULTS=0`` so repeated documents are not answered from caches.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WORKSPACE_PATTERN = re.compile(r'name="workspace" value="([^"]+)"')
+PERCENTILES = (50, 90, 95, 99)
+
+
+@dataclass
+class Sample:
+    """Outcome of one request."""
+
+    route: str
+    status: int
+    latency: float
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and 200 <= self.status < 400
+
+
+def load_corpus(path: str) -> List[str]:
+    """
+    Load module descriptions used as ``/find_module`` inputs.
+
+    Args:
+        path: JSONL file with ``text``, ``query`` or ``external_module`` per
+            line (the evaluation dataset works), or a directory of .txt files.
+
+    Returns:
+        List of documents.
+    """
+    if os.path.isdir(path):
+        documents = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".txt"):
+                with open(os.path.join(path, name), "r", encoding="utf-8") as file:
+                    documents.append(file.read())
+        return documents
+    documents = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            text = row.get("text") or row.get("query") or row.get("external_module")
+            if isinstance(text, dict):
+                text = json.dumps(text, ensure_ascii=False)
+            if text:
+                documents.append(text)
+    return documents
+
+
+def encode_multipart(fields: Dict[str, str]) -> Tuple[bytes, str]:
+    """
+    Encode a form with an empty file field, as the upload form sends it.
+
+    Args:
+        fields: Text fields.
+
+    Returns:
+        Tuple of body and content type.
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n"
+        )
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename=""\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n")
+    return "".join(parts).encode("utf-8"), f"multipart/form-data; boundary={boundary}"
+
+
+class TrafficMix:
+    """Issue ``/find_module`` and ``/select_module`` requests against the app."""
+
+    def __init__(
+        self,
+        base_url: str,
+        corpus: Sequence[str],
+        select_ratio: float = 0.3,
+        timeout: float = 120.0,
+        seed: int = 0,
+        staff_token: Optional[str] = None,
+    ) -> None:
+        """
+        Initialize the traffic mix.
+
+        Args:
+            base_url: Root URL of the app.
+            corpus: Module descriptions to search for.
+            select_ratio: Fraction of requests that select a suggestion.
+            timeout: Client timeout per request in seconds.
+            seed: Random seed for document and route choice.
+            staff_token: Sent as ``X-Staff-Token`` if given.
+        """
+        if not corpus:
+            raise ValueError("corpus is empty")
+        self.base_url = base_url.rstrip("/")
+        self.corpus = list(corpus)
+        self.select_ratio = select_ratio
+        self.timeout = timeout
+        self.staff_token = staff_token
+        self._random = random.Random(seed)
+        self._workspaces = deque(maxlen=256)
+        self._lock = threading.Lock()
+
+    def next_request(self) -> Tuple[str, Any]:
+        """
+        Choose the next request.
+
+        Returns:
+            Tuple of route and its argument (document or workspace token).
+            Selections fall back to a search until a workspace exists.
+        """
+        with self._lock:
+            if self._workspaces and self._random.random() < self.select_ratio:
+                return "select_module", self._random.choice(self._workspaces)
+            return "find_module", self._random.choice(self.corpus)
+
+    def _post(self, path: str, body: bytes, content_type: str) -> Tuple[int, bytes]:
+        headers = {"Content-Type": content_type}
+        if self.staff_token:
+            headers["X-Staff-Token"] = self.staff_token
+        request = urllib.request.Request(
+            self.base_url + path, data=body, headers=headers, method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read()
+
+    def send(self, route: str, argument: Any) -> int:
+        """
+        Send one request.
+
+        Args:
+            route: "find_module" or "select_module".
+            argument: Document text or workspace token.
+
+        Returns:
+            HTTP status code.
+        """
+        if route == "find_module":
+            body, content_type = encode_multipart(
+                {"text": argument, "institution_filter": "all"}
+            )
+            status, data = self._post("/find_module", body, content_type)
+            match = WORKSPACE_PATTERN.search(data.decode("utf-8", "replace"))
+            if match:
+                with self._lock:
+                    self._workspaces.append(match.group(1))
+            return status
+        body = urllib.parse.urlencode({"workspace": argument, "candidate_id": "0"})
+        status, _ = self._post(
+            "/select_module", body.encode(), "application/x-www-form-urlencoded"
+        )
+        return status
+
+
+def run_stage(
+    traffic: TrafficMix, rps: float, duration: float, max_inflight: int = 256
+) -> Tuple[List[Sample], float]:
+    """
+    Send requests at a constant rate for ``duration`` seconds.
+
+    Args:
+        traffic: Request source.
+        rps: Target requests per second.
+        duration: Stage length in seconds.
+        max_inflight: Worker threads; beyond that requests queue in the
+            driver, which shows up as latency.
+
+    Returns:
+        Tuple of samples and the wall time until the last response.
+    """
+    samples = []
+    lock = threading.Lock()
+    start = time.monotonic()
+
+    def run(route: str, argument: Any, scheduled: float) -> None:
+        error = None
+        status = 0
+        try:
+            status = traffic.send(route, argument)
+        except Exception as exc:
+            error = type(exc).__name__
+        sample = Sample(route, status, time.monotonic() - scheduled, error)
+        with lock:
+            samples.append(sample)
+
+    with ThreadPoolExecutor(max_workers=max_inflight) as executor:
+        total = max(1, int(round(rps * duration)))
+        for index in range(total):
+            scheduled = start + index / rps
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            route, argument = traffic.next_request()
+            executor.submit(run, route, argument, scheduled)
+    return samples, time.monotonic() - start
+
+
+def summarize_stage(
+    rps: float, samples: Sequence[Sample], wall_time: float
+) -> Dict[str, Any]:
+    """
+    Summarize one stage.
+
+    Args:
+        rps: Target rate of the stage.
+        samples: Request outcomes.
+        wall_time: Seconds from the first send to the last response.
+
+    Returns:
+        Dictionary with throughput, error rate and latency percentiles in
+        milliseconds, overall and per route.
+    """
+
+    def latency(group: Sequence[Sample]) -> Dict[str, float]:
+        if not group:
+            return {}
+        millis = np.array([sample.latency for sample in group]) * 1000
+        stats = {f"p{p}": float(np.percentile(millis, p)) for p in PERCENTILES}
+        stats["max"] = float(millis.max())
+        return stats
+
+    ok = [sample for sample in samples if sample.ok]
+    routes = sorted({sample.route for sample in samples})
+    return {
+        "target_rps": rps,
+        "requests": len(samples),
+        "throughput": len(ok) / wall_time if wall_time > 0 else 0.0,
+        "error_rate": 1 - len(ok) / len(samples) if samples else 0.0,
+        "statuses": {
+            str(status): sum(1 for sample in samples if sample.status == status)
+            for status in sorted({sample.status for sample in samples})
+        },
+        "latency_ms": latency(ok),
+        "routes": {
+            route: latency([s for s in ok if s.route == route]) for route in routes
+        },
+    }
+
+
+def find_saturation(
+    stages: Sequence[Dict[str, Any]],
+    slo_p95_ms: float = 10000.0,
+    max_error_rate: float = 0.01,
+    min_throughput_ratio: float = 0.9,
+) -> Optional[Dict[str, Any]]:
+    """
+    Find the first stage at which the app stopped keeping up.
+
+    A stage is saturated when its p95 latency exceeds the SLO, more than
+    ``max_error_rate`` of its requests failed (including shed 503s), or it
+    completed less than ``min_throughput_ratio`` of the target rate.
+
+    Args:
+        stages: Stage summaries in increasing rate order.
+        slo_p95_ms: Latency objective for the 95th percentile.
+        max_error_rate: Tolerated fraction of failed requests.
+        min_throughput_ratio: Required fraction of the target rate.
+
+    Returns:
+        ``{"target_rps", "reason", "last_good_rps"}`` or None if no stage
+        saturated.
+    """
+    last_good = None
+    for stage in stages:
+        reasons = []
+        if stage["latency_ms"].get("p95", float("inf")) > slo_p95_ms:
+            reasons.append("p95 latency above SLO")
+        if stage["error_rate"] > max_error_rate:
+            reasons.append("error rate")
+        if stage["throughput"] < min_throughput_ratio * stage["target_rps"]:
+            reasons.append("throughput below target")
+        if reasons:
+            return {
+                "target_rps": stage["target_rps"],
+                "reason": ", ".join(reasons),
+                "last_good_rps": last_good,
+            }
+        last_good = stage["target_rps"]
+    return None
+
+
+def format_report(
+    stages: Sequence[Dict[str, Any]], saturation: Optional[Dict[str, Any]]
+) -> str:
+    """Render stage summaries and the saturation point as a text table."""
+    header = ["rps", "req", "thru", "err%"] + [f"p{p}" for p in PERCENTILES]
+    lines = ["  ".join(f"{column:>8}" for column in header)]
+    for stage in stages:
+        latency = stage["latency_ms"]
+        row = [
+            f"{stage['target_rps']:.1f}",
+            str(stage["requests"]),
+            f"{stage['throughput']:.2f}",
+            f"{100 * stage['error_rate']:.1f}",
+        ] + [f"{latency.get(f'p{p}', float('nan')):.0f}" for p in PERCENTILES]
+        lines.append("  ".join(f"{value:>8}" for value in row))
+    if saturation:
+        lines.append(
+            f"Saturated at {saturation['target_rps']} rps ({saturation['reason']}); "
+            f"last good stage: {saturation['last_good_rps']} rps"
+        )
+    else:
+        lines.append("No stage saturated")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--corpus", required=True, help="JSONL or directory of .txt")
+    parser.add_argument("--rps", default="1,2,4,8", help="comma-separated stage rates")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per stage")
+    parser.add_argument("--select-ratio", type=float, default=0.3)
+    parser.add_argument("--max-inflight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument(
+        "--staff-token",
+        default=os.getenv("STAFF_TOKEN"),
+        help="sent as X-Staff-Token to bypass per-client rate limits",
+    )
+    parser.add_argument("--slo-p95-ms", type=float, default=10000.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument(
+        "--stop-on-saturation", action="store_true", help="skip faster stages"
+    )
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    traffic = TrafficMix(
+        args.url,
+        load_corpus(args.corpus),
+        args.select_ratio,
+        args.timeout,
+        staff_token=args.staff_token,
+    )
+    if not args.staff_token:
+        logger.warning("No staff token; per-client rate limits apply to the driver")
+    stages = []
+    saturation = None
+    for rps in [float(value) for value in args.rps.split(",")]:
+        logger.info("Stage at %.1f rps for %.0fs", rps, args.duration)
+        samples, wall_time = run_stage(traffic, rps, args.duration, args.max_inflight)
+        stages.append(summarize_stage(rps, samples, wall_time))
+        saturation = find_saturation(stages, args.slo_p95_ms, args.max_error_rate)
+        if saturation and args.stop_on_saturation:
+            break
+
+    print(format_report(stages, saturation))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"stages": stages, "saturation": saturation}, file, indent=2)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,310 @@
+"""OpenAI-compatible stub server replaying recorded LLM responses.
+
+Point ``LLM_URL`` at this server to load-test the app without a real model:
+
+    python -m loadtest.stub_server --recording data/llm_exchanges.jsonl --port 8001
+    LLM_URL=http://localhost:8001/v1 LLM_API_KEY=stub flask run
+
+Responses are looked up by the exact request (see ``recog_ai.recorder``); an
+unknown request gets a recorded response of the same task (same system
+prompt). Generation is simulated with a time to first token and a token rate,
+streamed as server-sent events when the client asks for ``stream``.
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from recog_ai.recorder import exchange_key, load_exchanges, prompt_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESPONSE = "Keine Aufzeichnung für diese Anfrage vorhanden."
+
+
+def split_tokens(text: str) -> List[str]:
+    """
+    Split text into pseudo tokens (words with their trailing whitespace).
+
+    Args:
+        text: Response text.
+
+    Returns:
+        Pieces that concatenate back to ``text``.
+    """
+    return re.findall(r"\s*\S+\s*", text) or [text]
+
+
+class ReplayBook:
+    """Recorded responses indexed by request and by task."""
+
+    def __init__(self, exchanges: Sequence[Dict[str, Any]] = ()) -> None:
+        """
+        Index recorded exchanges.
+
+        Args:
+            exchanges: Entries written by ``ExchangeRecorder``.
+        """
+        self.by_key = {}
+        self.by_prompt = {}
+        for entry in exchanges:
+            self.by_key[entry["key"]] = entry
+            self.by_prompt.setdefault(entry["prompt_key"], []).append(entry)
+        self._all = list(exchanges)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_file(cls, path: Optional[str]) -> "ReplayBook":
+        """Load a recording, or return an empty book if ``path`` is None."""
+        return cls(load_exchanges(path) if path else ())
+
+    def lookup(self, pairs: Sequence[Tuple[str, str]]) -> Tuple[str, Optional[Dict]]:
+        """
+        Find the response for a request.
+
+        Args:
+            pairs: (role, content) pairs of the request.
+
+        Returns:
+            Tuple of response text and the recorded entry (None if nothing
+            was recorded).
+        """
+        key = exchange_key(pairs)
+        entry = self.by_key.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry["response"], entry
+        self.misses += 1
+        # Same task, chosen deterministically so repeated requests agree
+        candidates = self.by_prompt.get(prompt_key(pairs)) or self._all
+        if not candidates:
+            return DEFAULT_RESPONSE, None
+        entry = candidates[int(key, 16) % len(candidates)]
+        return entry["response"], entry
+
+
+@dataclass
+class StubTiming:
+    """Simulated generation speed of the stub."""
+
+    ttft: float = 0.3
+    tokens_per_second: float = 40.0
+    jitter: float = 0.1
+    replay_latency: bool = False
+    error_rate: float = 0.0
+
+    def first_token_delay(self) -> float:
+        """Delay before the first token, with relative jitter."""
+        return max(0.0, self.ttft * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def token_delay(self) -> float:
+        """Delay between two tokens."""
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def total_delay(self, tokens: int, entry: Optional[Dict]) -> float:
+        """Delay of a non-streamed response of ``tokens`` tokens."""
+        if self.replay_latency and entry and entry.get("latency") is not None:
+            return float(entry["latency"])
+        return self.first_token_delay() + tokens * self.token_delay()
+
+
+def completion(model: str, content: str, prompt_tokens: int, tokens: int) -> Dict:
+    """Build a ``chat.completion`` response body."""
+    return {
+        "id": "chatcmpl-" + uuid.uuid4().hex,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": tokens,
+            "total_tokens": prompt_tokens + tokens,
+        },
+    }
+
+
+def completion_chunks(model: str, pieces: Sequence[str]) -> Iterator[Dict]:
+    """Build the ``chat.completion.chunk`` events of a streamed response."""
+    base = {
+        "id": "chatcmpl-" + uuid.uuid4().hex,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+    }
+    for index, piece in enumerate(pieces):
+        delta = {"content": piece}
+        if index == 0:
+            delta["role"] = "assistant"
+        yield {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+    yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler; book and timing are attributes of the server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format, *args)
+
+    def _send_json(self, status: int, body: Dict) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(
+                200, {"object": "list", "data": [{"id": "stub", "object": "model"}]}
+            )
+        elif self.path == "/health":
+            book = self.server.book
+            self._send_json(200, {"hits": book.hits, "misses": book.misses})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self) -> None:
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        timing = self.server.timing
+        if timing.error_rate and random.random() < timing.error_rate:
+            time.sleep(timing.first_token_delay())
+            self._send_json(500, {"error": {"message": "injected failure"}})
+            return
+
+        pairs = [
+            (message.get("role", "user"), str(message.get("content", "")))
+            for message in payload.get("messages", [])
+        ]
+        content, entry = self.server.book.lookup(pairs)
+        pieces = split_tokens(content)
+        model = payload.get("model") or "stub"
+        max_tokens = payload.get("max_tokens")
+        if max_tokens:
+            pieces = pieces[:max_tokens]
+
+        if payload.get("stream"):
+            self._stream(model, pieces, timing)
+            return
+        time.sleep(timing.total_delay(len(pieces), entry))
+        prompt_tokens = sum(len(split_tokens(text)) for _, text in pairs)
+        self._send_json(
+            200, completion(model, "".join(pieces), prompt_tokens, len(pieces))
+        )
+
+    def _stream(self, model: str, pieces: Sequence[str], timing: StubTiming) -> None:
+        """Send the response as server-sent events at the simulated token rate."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        time.sleep(timing.first_token_delay())
+        for index, chunk in enumerate(completion_chunks(model, pieces)):
+            if index:
+                time.sleep(timing.token_delay())
+            event = "data: " + json.dumps(chunk, ensure_ascii=False) + "\n\n"
+            self.wfile.write(event.encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def make_server(
+    book: ReplayBook,
+    timing: Optional[StubTiming] = None,
+    host: str = "127.0.0.1",
+    port: int = 8001,
+) -> ThreadingHTTPServer:
+    """
+    Create the stub server (not yet serving).
+
+    Args:
+        book: Recorded responses.
+        timing: Simulated generation speed.
+        host: Interface to bind.
+        port: Port to bind; 0 picks a free one.
+
+    Returns:
+        Server; call ``serve_forever`` to start it.
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.book = book
+    server.timing = timing or StubTiming()
+    return server
+
+
+def serve_in_thread(server: ThreadingHTTPServer) -> threading.Thread:
+    """Run ``server`` on a daemon thread, e.g. inside a test."""
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recording", help="JSONL written with LLM_RECORD_FILE")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft", type=float, default=0.3, help="seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument(
+        "--replay-latency",
+        action="store_true",
+        help="sleep for the recorded latency of non-streamed responses",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    book = ReplayBook.from_file(args.recording)
+    timing = StubTiming(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        jitter=args.jitter,
+        replay_latency=args.replay_latency,
+        error_rate=args.error_rate,
+    )
+    server = make_server(book, timing, args.host, args.port)
+    logger.info(
+        "Replaying %d recorded exchanges on http://%s:%d/v1",
+        len(book.by_key),
+        args.host,
+        server.server_address[1],
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -3,7 +3,12 @@
 from recog_ai.config import load_env, get_embedding, get_module_database
 from recog_ai.llm_client import LLMClient
 from recog_ai.assistant import RecognitionAssistant
-from recog_ai.utils import extract_json, parse_workload, collect_programs
+from recog_ai.utils import (
+    extract_json,
+    parse_workload,
+    collect_programs,
+    parse_verdict,
+)
 
 # Load environment at module import
 load_env()
@@ -21,4 +26,5 @@ __all__ = [
     "extract_json",
     "parse_workload",
     "collect_programs",
+    "parse_verdict",
 ]
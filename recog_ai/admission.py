@@ -0,0 +1,268 @@
+"""Admission control for LLM-bound endpoints: rate limits, priority queue, shedding."""
+
+import heapq
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# Lower value means higher priority
+PRIORITY_STAFF = 0
+PRIORITY_ANONYMOUS = 1
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of admitted."""
+
+    def __init__(self, reason: str, retry_after: float) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate`` tokens per second."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate: Tokens added per second.
+            burst: Bucket capacity.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def try_acquire(self) -> float:
+        """
+        Take a token if available (caller synchronizes).
+
+        Returns:
+            0.0 if a token was taken, otherwise seconds until one is available.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+    def refund(self) -> None:
+        """Return a token taken by a request that was rejected elsewhere."""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class _Waiter:
+    """A queued request waiting for a concurrency slot."""
+
+    def __init__(self) -> None:
+        self.admitted = False
+        self.rejected = False
+
+
+class AdmissionController:
+    """
+    Gatekeeper in front of the upstream LLM.
+
+    Requests pass a global and an optional per-client token bucket, then wait for one of
+    ``limit`` concurrency slots in a bounded priority queue. The limit adapts
+    to observed latency (AIMD): it grows by one slot per ``limit`` fast
+    requests and shrinks multiplicatively when requests exceed the target.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 10.0,
+        global_burst: float = 20.0,
+        client_rate: float = 0.0,
+        client_burst: float = 10.0,
+        min_concurrency: int = 2,
+        max_concurrency: int = 32,
+        max_queue: int = 64,
+        queue_timeout: float = 30.0,
+        latency_target: float = 30.0,
+        max_clients: int = 10000,
+    ) -> None:
+        """
+        Initialize the controller.
+
+        Args:
+            global_rate: Requests per second admitted overall.
+            global_burst: Burst size of the global bucket.
+            client_rate: Requests per second admitted per client; 0 disables
+                the per-client limit (clients behind one proxy or NAT share
+                an address).
+            client_burst: Burst size of each client bucket.
+            min_concurrency: Lower bound of the adaptive concurrency limit.
+            max_concurrency: Upper bound (and initial value) of the limit.
+            max_queue: Maximum number of requests waiting for a slot.
+            queue_timeout: Seconds a request may wait before being shed.
+            latency_target: Request latency (seconds) above which the limit shrinks.
+            max_clients: Number of client buckets kept (least recent dropped).
+        """
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.latency_target = latency_target
+        self.max_clients = max_clients
+        self.limit = float(max_concurrency)
+        self.inflight = 0
+        self._clients = OrderedDict()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._lock = threading.Condition()
+        self._stats = {"admitted": 0, "rate_limited": 0, "shed": 0, "timed_out": 0}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """Create a controller configured through ``ADMISSION_*`` variables."""
+
+        def number(name, default):
+            return float(os.getenv("ADMISSION_" + name, default))
+
+        return cls(
+            global_rate=number("GLOBAL_RATE", 10),
+            global_burst=number("GLOBAL_BURST", 20),
+            client_rate=number("CLIENT_RATE", 0),
+            client_burst=number("CLIENT_BURST", 10),
+            min_concurrency=int(number("MIN_CONCURRENCY", 2)),
+            max_concurrency=int(number("MAX_CONCURRENCY", 32)),
+            max_queue=int(number("MAX_QUEUE", 64)),
+            queue_timeout=number("QUEUE_TIMEOUT", 30),
+            latency_target=number("LATENCY_TARGET", 30),
+        )
+
+    def _client_bucket(self, client_id: str) -> TokenBucket:
+        """Return the bucket of a client, creating it on first use."""
+        bucket = self._clients.get(client_id)
+        if bucket is None:
+            bucket = self._clients[client_id] = TokenBucket(
+                self.client_rate, self.client_burst
+            )
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client_id)
+        return bucket
+
+    def _retry_after(self) -> float:
+        """Rough wait estimate for shed requests."""
+        return max(1.0, self.latency_target * len(self._queue) / max(self.limit, 1))
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the highest-priority waiters (caller holds lock)."""
+        while self._queue and self.inflight < int(self.limit):
+            _, _, waiter = heapq.heappop(self._queue)
+            waiter.admitted = True
+            self.inflight += 1
+        self._lock.notify_all()
+
+    def acquire(self, client_id: str, priority: int = PRIORITY_ANONYMOUS) -> float:
+        """
+        Block until the request may proceed.
+
+        Args:
+            client_id: Identity used for the per-client rate limit.
+            priority: PRIORITY_STAFF or PRIORITY_ANONYMOUS.
+
+        Returns:
+            Ticket (start time) to pass to ``release``.
+
+        Raises:
+            AdmissionRejected: If the request is rate limited, the queue is
+                full or the wait exceeded ``queue_timeout``.
+        """
+        with self._lock:
+            client_bucket = None
+            if priority != PRIORITY_STAFF and self.client_rate > 0:
+                client_bucket = self._client_bucket(client_id)
+            wait = client_bucket.try_acquire() if client_bucket else 0.0
+            if not wait:
+                wait = self.global_bucket.try_acquire()
+                if wait and client_bucket:
+                    client_bucket.refund()
+            if wait:
+                self._stats["rate_limited"] += 1
+                raise AdmissionRejected("rate limited", max(1.0, wait))
+
+            if not self._queue and self.inflight < int(self.limit):
+                self.inflight += 1
+                self._stats["admitted"] += 1
+                return time.monotonic()
+
+            waiter = _Waiter()
+            entry = (priority, next(self._sequence), waiter)
+            if len(self._queue) >= self.max_queue:
+                # Shed the lowest-priority, most recent request (maybe this one)
+                worst = max(self._queue)
+                if worst[0] <= priority:
+                    self._stats["shed"] += 1
+                    raise AdmissionRejected("queue full", self._retry_after())
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                worst[2].rejected = True
+                self._lock.notify_all()
+                self._stats["shed"] += 1
+            heapq.heappush(self._queue, entry)
+
+            deadline = time.monotonic() + self.queue_timeout
+            while not (waiter.admitted or waiter.rejected):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self._stats["timed_out"] += 1
+                    raise AdmissionRejected("queue timeout", self._retry_after())
+                self._lock.wait(remaining)
+
+            if waiter.rejected:
+                raise AdmissionRejected("shed for higher priority", self._retry_after())
+            self._stats["admitted"] += 1
+            return time.monotonic()
+
+    def release(self, ticket: float) -> None:
+        """
+        Free the slot of a finished request and adapt the concurrency limit.
+
+        Args:
+            ticket: Value returned by ``acquire``.
+        """
+        latency = time.monotonic() - ticket
+        with self._lock:
+            self.inflight -= 1
+            if latency > self.latency_target:
+                self.limit = max(self.min_concurrency, self.limit * 0.9)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return counters and the current state.
+
+        Returns:
+            Dictionary with admission counters, in-flight count, queue length
+            and the current concurrency limit.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                inflight=self.inflight,
+                queued=len(self._queue),
+                limit=round(self.limit, 2),
+            )
+        return stats
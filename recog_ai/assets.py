@@ -0,0 +1,282 @@
+"""In-memory, precompressed static assets and response compression."""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is used without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+)
+
+# Build tools put a content hash in file names (index-351494fc.js); such
+# files never change and may be cached forever
+HASHED_NAME_PATTERN = re.compile(r"[.-][0-9a-f]{8,}\.[a-z0-9]+$")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+mimetypes.add_type("text/javascript", ".js")
+mimetypes.add_type("image/svg+xml", ".svg")
+
+
+def is_compressible(mimetype: Optional[str]) -> bool:
+    """Whether responses of this type benefit from compression."""
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def accepted_encodings(header: Optional[str]) -> Dict[str, float]:
+    """
+    Parse an ``Accept-Encoding`` header.
+
+    Args:
+        header: Header value.
+
+    Returns:
+        Encoding → quality; encodings with q=0 are refused.
+    """
+    encodings = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        encodings[name.strip().lower()] = quality
+    return encodings
+
+
+def negotiate_encoding(header: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """
+    Choose the preferred available encoding (brotli before gzip on ties).
+
+    Args:
+        header: ``Accept-Encoding`` header value.
+        available: Encodings the representation exists in.
+
+    Returns:
+        Encoding name, or None for the identity representation.
+    """
+    accepted = accepted_encodings(header)
+    best = None
+    best_quality = 0.0
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """
+    Evaluate ``If-None-Match`` against an ETag and its encoded variants.
+
+    Args:
+        header: ``If-None-Match`` header value.
+        etag: Unquoted base ETag of the asset.
+
+    Returns:
+        Whether the client's copy is current.
+    """
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        candidate = candidate.removeprefix("W/").strip('"')
+        if candidate == etag or candidate.startswith(etag + "-"):
+            return True
+    return False
+
+
+@dataclass
+class Asset:
+    """One file with its precompressed representations."""
+
+    body: bytes
+    mimetype: str
+    etag: str
+    cache_control: str
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+
+def load_asset(path: str, name: str, min_size: int = 256) -> Asset:
+    """
+    Read a file and precompress it if that pays off.
+
+    Args:
+        path: File path.
+        name: Name the asset is requested by.
+        min_size: Files smaller than this are not compressed.
+
+    Returns:
+        The asset.
+    """
+    with open(path, "rb") as file:
+        body = file.read()
+    mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    asset = Asset(
+        body=body,
+        mimetype=mimetype,
+        etag=hashlib.sha256(body).hexdigest()[:20],
+        cache_control=IMMUTABLE if HASHED_NAME_PATTERN.search(name) else REVALIDATE,
+    )
+    if is_compressible(mimetype) and len(body) >= min_size:
+        candidates = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            candidates["br"] = brotli.compress(body, quality=11)
+        asset.encoded = {
+            encoding: data for encoding, data in candidates.items() if len(data) < len(body)
+        }
+    return asset
+
+
+class AssetCache:
+    """
+    Files of a directory held in memory, served with ETags and compression.
+
+    Everything is read and compressed once when the cache is created, so a
+    request is a dictionary lookup. Files with a content hash in their name
+    are cached by browsers for a year; others must be revalidated, which
+    costs a 304 without body.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        exclude: Iterable[str] = (".py", ".pyc"),
+        max_file_size: int = 16 * 2**20,
+    ) -> None:
+        """
+        Load all files below ``directory``.
+
+        Args:
+            directory: Directory holding the assets.
+            exclude: File suffixes that are never served.
+            max_file_size: Larger files are skipped (and not served).
+        """
+        self.directory = directory
+        self.assets: Dict[str, Asset] = {}
+        exclude = tuple(exclude)
+        for root, _, names in os.walk(directory):
+            if "__pycache__" in root:
+                continue
+            for filename in names:
+                path = os.path.join(root, filename)
+                if filename.endswith(exclude) or os.path.getsize(path) > max_file_size:
+                    continue
+                name = os.path.relpath(path, directory).replace(os.sep, "/")
+                self.assets[name] = load_asset(path, name)
+        logger.info(
+            "Loaded %d assets from %s (%.0f kB)",
+            len(self.assets),
+            directory,
+            sum(len(asset.body) for asset in self.assets.values()) / 1024,
+        )
+
+    def memory(self) -> Dict[str, int]:
+        """
+        Return the memory held by the assets.
+
+        Returns:
+            Dictionary with ``bytes`` (bodies and encodings) and ``entries``.
+        """
+        size = sum(
+            len(asset.body) + sum(len(data) for data in asset.encoded.values())
+            for asset in self.assets.values()
+        )
+        return {"bytes": size, "entries": len(self.assets)}
+
+    def response(
+        self,
+        name: str,
+        accept_encoding: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+    ) -> Optional[Response]:
+        """
+        Build the response for an asset.
+
+        Args:
+            name: Asset name relative to the directory.
+            accept_encoding: Request's ``Accept-Encoding`` header.
+            if_none_match: Request's ``If-None-Match`` header.
+
+        Returns:
+            200 or 304 response, or None if there is no such asset.
+        """
+        asset = self.assets.get(name)
+        if asset is None:
+            return None
+        encoding = negotiate_encoding(accept_encoding, asset.encoded)
+        etag = f"{asset.etag}-{encoding}" if encoding else asset.etag
+        if etag_matches(if_none_match, asset.etag):
+            response = Response(status=304)
+        else:
+            body = asset.encoded[encoding] if encoding else asset.body
+            response = Response(body, mimetype=asset.mimetype)
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = asset.cache_control
+        if asset.encoded:
+            response.vary.add("Accept-Encoding")
+        return response
+
+
+def compress_response(
+    response: Response, accept_encoding: Optional[str], min_size: int = 1024
+) -> Response:
+    """
+    Gzip a rendered response in place if the client accepts it.
+
+    Streamed, already encoded, small and non-text responses are left alone.
+
+    Args:
+        response: Response about to be sent.
+        accept_encoding: Request's ``Accept-Encoding`` header.
+        min_size: Bodies smaller than this are sent as they are.
+
+    Returns:
+        The (possibly compressed) response.
+    """
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or not is_compressible(response.mimetype)
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < min_size or negotiate_encoding(accept_encoding, ("gzip",)) is None:
+        return response
+    response.set_data(gzip.compress(body, compresslevel=6))
+    response.headers["Content-Encoding"] = "gzip"
+    etag, _ = response.get_etag()
+    if etag:
+        # The compressed body is a different representation
+        response.set_etag(etag, weak=True)
+    return response
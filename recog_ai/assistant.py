@@ -1,14 +1,22 @@
 """Recognition assistant for module extraction and comparison."""
 
+import asyncio
+import contextvars
+import hashlib
 import json
 import logging
+import time
 import markdown
-from typing import List, Dict, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Any, Tuple
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
 
+from recog_ai.circuit_breaker import CircuitOpenError
+from recog_ai.extraction import ExtractionStrategy, merge_modules
 from recog_ai.llm_client import LLMClient
-from recog_ai.utils import extract_json, parse_workload, collect_programs
+from recog_ai.retrieval import Retrieval, RetrievalPolicy, get_retrieval_policy
+from recog_ai.utils import extract_json, parse_verdict
 
 logger = logging.getLogger(__name__)
 
@@ -27,23 +35,95 @@ MODULE_SCHEMA = {
     "institution": {"type": ["string", "null"], "description": "Institution"},
 }
 
+# Generation limits for task-specific clients (see LLMClient.for_task)
+TASK_MAX_TOKENS = {"extraction": 4096, "examination": 2048}
+
+# Ordering of verdicts in ranked assessments; unknown verdicts sort last.
+VERDICT_RANK = {"full": 0, "partial": 1, "none": 2}
+
+
+def _is_valid_module(module: Any) -> bool:
+    """Whether an extraction result is usable without escalation."""
+    if not isinstance(module, dict):
+        return False
+    goals = module.get("learninggoals")
+    return bool(module.get("title")) and isinstance(goals, list) and bool(goals)
+
 
 class RecognitionAssistant:
     """Orchestrates module parsing, suggestion, and recognition workflows."""
 
-    def __init__(self, moduledb: Any, llm_client: Optional[LLMClient] = None) -> None:
+    def __init__(
+        self,
+        moduledb: Any,
+        llm_client: Optional[LLMClient] = None,
+        task_clients: Optional[Dict[str, LLMClient]] = None,
+        retrieval_policy: Optional[RetrievalPolicy] = None,
+        extraction_strategy: Optional[ExtractionStrategy] = None,
+    ) -> None:
         """
         Initialize the recognition assistant.
 
         Args:
             moduledb: Chroma vector database instance for similarity search.
             llm_client: Optional LLMClient instance; if None, creates a default one.
+                Used for every task without a dedicated client and as the
+                escalation target when a task client's extraction fails.
+            task_clients: Optional mapping of task name ("extraction",
+                "examination") to LLMClient. If None and no ``llm_client`` is
+                given, task clients are configured from ``LLM_MODEL_<TASK>``.
+            retrieval_policy: Optional policy for suggestion retrieval; defaults
+                to the process-wide policy configured by ``RETRIEVAL_*``.
+            extraction_strategy: Optional choice between single-shot and
+                map-reduce extraction; defaults to ``EXTRACTION_*`` settings.
         """
         self.db = moduledb
+        self.retrieval_policy = retrieval_policy or get_retrieval_policy()
+        self.extraction_strategy = extraction_strategy or ExtractionStrategy.from_env()
         self.llm = llm_client or LLMClient()
+        if task_clients is None:
+            task_clients = {}
+            if llm_client is None:
+                for task, max_tokens in TASK_MAX_TOKENS.items():
+                    client = LLMClient.for_task(task, max_tokens=max_tokens)
+                    if client is not None:
+                        task_clients[task] = client
+        self.task_clients = task_clients
+
+    def _llm_for(self, task: str) -> Any:
+        """Return the client routed to a task, defaulting to the main client."""
+        return self.task_clients.get(task) or self.llm
+
+    def retrieve(
+        self, doc: str, institution: Optional[str] = None, limit: Optional[int] = None
+    ) -> Retrieval:
+        """
+        Retrieve module suggestions under the retrieval policy.
+
+        Args:
+            doc: Input document/query string.
+            institution: Optional institution filter.
+            limit: Maximum number of suggestions (default: the policy's).
+
+        Returns:
+            Retrieval with the suggestions, their scores and the reason the
+            list was truncated.
+        """
+        return self.retrieval_policy.retrieve(self.db, doc, institution, limit)
+
+    async def aretrieve(
+        self, doc: str, institution: Optional[str] = None, limit: Optional[int] = None
+    ) -> Retrieval:
+        """
+        Async counterpart of ``retrieve``.
+
+        Embedding and Chroma search are CPU/disk bound and run in a worker
+        thread so the event loop stays free for other requests.
+        """
+        return await asyncio.to_thread(self.retrieve, doc, institution, limit)
 
     def get_module_suggestions(
-        self, doc: str, institution: Optional[str] = None, limit: int = 5
+        self, doc: str, institution: Optional[str] = None, limit: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
         Retrieve module suggestions based on semantic similarity.
@@ -51,57 +131,31 @@ class RecognitionAssistant:
         Args:
             doc: Input document/query string.
             institution: Optional institution filter.
-            limit: Maximum number of suggestions to return.
+            limit: Maximum number of suggestions (default: the policy's).
 
         Returns:
             List of module suggestion dictionaries.
         """
-        docs = self.db.similarity_search_with_score(doc, limit)
-
-        module_suggestions = []
-        for module, score in docs:
-            workload = parse_workload(module.metadata)
-            module_institution = module.metadata.get("institution")
-
-            if institution and module_institution:
-                if (
-                    module_institution.strip().lower() != institution.strip().lower()
-                    and institution.lower() != "all"
-                ):
-                    continue
-
-            module_info = {
-                "title": module.metadata.get("title")
-                or module.metadata.get("name")
-                or "",
-                "credits": module.metadata.get("credits"),
-                "workload": workload,
-                "description": module.metadata.get("description")
-                or module.metadata.get("learning_outcomes")
-                or "",
-                "level": module.metadata.get("level"),
-                "program": collect_programs(module.metadata),
-                "institution": module_institution,
-                "content": module.page_content,
-            }
-            module_info["json"] = json.dumps(module_info)
-            module_suggestions.append(module_info)
-
-        return module_suggestions
+        return self.retrieve(doc, institution, limit).suggestions
 
-    def get_module_info(self, indoc: str) -> Dict[str, Any]:
+    async def aget_module_suggestions(
+        self, doc: str, institution: Optional[str] = None, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Extract structured module metadata from unstructured text using LLM.
-
-        Falls back to raw text if extraction fails.
+        Async counterpart of ``get_module_suggestions``.
 
         Args:
-            indoc: Raw module document/description text.
+            doc: Input document/query string.
+            institution: Optional institution filter.
+            limit: Maximum number of suggestions (default: the policy's).
 
         Returns:
-            Dictionary with extracted fields (title, credits, learninggoals, etc.)
-            or fallback structure with raw_document and error fields.
+            List of module suggestion dictionaries.
         """
+        return (await self.aretrieve(doc, institution, limit)).suggestions
+
+    def _flatten_document(self, indoc: str) -> str:
+        """Turn a JSON module description into ``key: value`` lines."""
         doc = ""
         try:
             jsondoc = json.loads(indoc)
@@ -109,7 +163,10 @@ class RecognitionAssistant:
                 doc += key + ": " + str(jsondoc[key]) + "\n"
         except Exception:
             doc = indoc
+        return doc
 
+    def _extraction_prompt(self, doc: str, intro: str, instruction: str) -> List[Any]:
+        """Build the extraction chat messages for a text and its framing."""
         schema_json = json.dumps(MODULE_SCHEMA, indent=2, sort_keys=True)
         schema_json_safe = (
             schema_json.replace("{", "{{").replace("}", "}}").replace("\n", "\n")
@@ -121,11 +178,7 @@ class RecognitionAssistant:
             "Nutze deutsche Feldbeschreibungen und vermeide zusätzlichen Fließtext.\n"
             "Wenn du Informationen nicht hast, verwende leere Strings oder leere Listen."
         )
-        human_prompt = (
-            "Folgendes Dokument ist gegeben:\n"
-            "{doc}\n\n"
-            "Achte auf Titel, Credits, Lernziele, Bildungsniveau, Arbeitsaufwand und Prüfungsform."
-        )
+        human_prompt = "{intro}\n{doc}\n\n{instruction}"
 
         prompt = ChatPromptTemplate(
             [
@@ -134,61 +187,232 @@ class RecognitionAssistant:
             ]
         )
 
-        llm = LLMClient(max_tokens=4096)
-        prompt_value = prompt.invoke({"doc": doc})
-        messages = prompt_value.to_messages()
+        prompt_value = prompt.invoke(
+            {"intro": intro, "doc": doc, "instruction": instruction}
+        )
+        return prompt_value.to_messages()
+
+    def _extraction_messages(self, indoc: str) -> Tuple[str, List[Any]]:
+        """Build the flattened document and chat messages for field extraction."""
+        doc = self._flatten_document(indoc)
+        messages = self._extraction_prompt(
+            doc,
+            "Folgendes Dokument ist gegeben:",
+            "Achte auf Titel, Credits, Lernziele, Bildungsniveau, Arbeitsaufwand und Prüfungsform.",
+        )
+        return doc, messages
+
+    def _section_messages(self, section: str, index: int, count: int) -> List[Any]:
+        """Build the extraction messages for one section of a long document."""
+        return self._extraction_prompt(
+            section,
+            f"Folgendes ist Abschnitt {index + 1} von {count} einer Modulbeschreibung:",
+            "Extrahiere nur, was in diesem Abschnitt steht, und lasse übrige Felder leer. "
+            "Gib die Lernziele wörtlich und vollständig an.",
+        )
+
+    def _section_client(self) -> Any:
+        """Return the extraction client, limited to short section answers."""
+        llm = self._llm_for("extraction")
+        if isinstance(llm, LLMClient):
+            return llm.with_max_tokens(self.extraction_strategy.section_max_tokens)
+        return llm
+
+    def _merge_sections(
+        self, doc: str, sections: List[str], responses: List[Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Merge the answers of a map-reduce extraction.
+
+        Args:
+            doc: Flattened full document.
+            sections: Sections that were extracted.
+            responses: Response or exception per section.
+
+        Returns:
+            Merged module, or None if it is unusable and the document should
+            be extracted in one call instead.
+        """
+        parts = []
+        for index, response in enumerate(responses):
+            if isinstance(response, BaseException):
+                logger.warning("Extraction of section %d failed: %s", index + 1, response)
+                parts.append(None)
+                continue
+            try:
+                parts.append(self._parse_module(response.content, sections[index]))
+            except Exception:
+                logger.warning("Unparseable extraction of section %d", index + 1)
+                parts.append(None)
+        module = merge_modules(parts)
+        if not _is_valid_module(module):
+            logger.info("Map-reduce extraction incomplete, extracting in one call")
+            return None
+        logger.info(
+            "Extracted %d sections (%d failed) with title=%s",
+            len(sections),
+            parts.count(None),
+            module.get("title"),
+        )
+        module["original_doc"] = doc
+        module["raw_document"] = doc
+        return module
+
+    def _extract_sections(self, doc: str, sections: List[str]) -> Optional[Dict[str, Any]]:
+        """Extract sections concurrently in threads and merge the answers."""
+        llm = self._section_client()
+
+        def extract(index: int) -> Any:
+            try:
+                return llm.invoke(self._section_messages(sections[index], index, len(sections)))
+            except Exception as e:
+                return e
+
+        # Each thread gets a copy of the context so token usage is tracked
+        with ThreadPoolExecutor(max_workers=len(sections)) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, extract, index)
+                for index in range(len(sections))
+            ]
+            responses = [future.result() for future in futures]
+        return self._merge_sections(doc, sections, responses)
+
+    async def _aextract_sections(
+        self, doc: str, sections: List[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Async counterpart of ``_extract_sections``."""
+        llm = self._section_client()
+        responses = await asyncio.gather(
+            *(
+                llm.ainvoke(self._section_messages(section, index, len(sections)))
+                for index, section in enumerate(sections)
+            ),
+            return_exceptions=True,
+        )
+        return self._merge_sections(doc, sections, responses)
+
+    def _parse_module(self, response: str, doc: str) -> Dict[str, Any]:
+        """Parse the extraction response into a module dictionary."""
+        module = extract_json(response)
+        if isinstance(module, list):
+            module = module[0]
+
+        if (
+            module.get("learninggoals")
+            and len(module["learninggoals"]) > 0
+            and isinstance(module["learninggoals"][0], dict)
+        ):
+            strlist = []
+            for item in module["learninggoals"]:
+                for _, value in item.items():
+                    strlist.append(value)
+            module["learninggoals"] = strlist
+
+        logger.info("Extracted module info with title=%s", module.get("title"))
+        module["original_doc"] = doc
+        module["raw_document"] = doc
+        return module
+
+    def _fallback_module(self, doc: str, error: Exception) -> Dict[str, Any]:
+        """Module dictionary carrying the raw text; call from an except block."""
+        if isinstance(error, CircuitOpenError):
+            logger.warning("LLM unavailable, falling back to raw text: %s", error)
+        else:
+            logger.exception("Module extraction failed, falling back to raw text")
+        module = {
+            "title": "",
+            "credits": "",
+            "workload": "",
+            "learninggoals": [],
+            "assessmenttype": "",
+            "level": "",
+            "description": doc,
+            "program": "",
+            "institution": "",
+        }
+        module["original_doc"] = doc
+        module["raw_document"] = doc
+        module["error"] = str(error)
+        # Suggestions are still produced, from the raw text embedding only
+        module["degraded"] = isinstance(error, CircuitOpenError)
+        return module
+
+    def get_module_info(self, indoc: str) -> Dict[str, Any]:
+        """
+        Extract structured module metadata from unstructured text using LLM.
+
+        Uses the "extraction" task client if configured and escalates to the
+        main client when its answer is unusable. Long documents are split
+        into sections that are extracted concurrently and merged (see
+        ``ExtractionStrategy``); if that yields no usable module, the whole
+        document is extracted in one call. Falls back to raw text if
+        extraction fails.
 
+        Args:
+            indoc: Raw module document/description text.
+
+        Returns:
+            Dictionary with extracted fields (title, credits, learninggoals, etc.)
+            or fallback structure with raw_document and error fields.
+        """
+        doc, messages = self._extraction_messages(indoc)
+        sections = self.extraction_strategy.sections(doc)
+        if sections:
+            module = self._extract_sections(doc, sections)
+            if module is not None:
+                return module
+        llm = self._llm_for("extraction")
+        if llm is not self.llm:
+            try:
+                module = self._parse_module(llm.invoke(messages).content, doc)
+                if _is_valid_module(module):
+                    return module
+                logger.info("Extraction by %s incomplete, escalating", llm.model)
+            except Exception:
+                logger.warning("Extraction by %s failed, escalating", llm.model)
         try:
             response = self.llm.invoke(messages).content
-            module = extract_json(response)
-            if isinstance(module, list):
-                module = module[0]
-
-            if (
-                module.get("learninggoals")
-                and len(module["learninggoals"]) > 0
-                and isinstance(module["learninggoals"][0], dict)
-            ):
-                strlist = []
-                for item in module["learninggoals"]:
-                    for _, value in item.items():
-                        strlist.append(value)
-                module["learninggoals"] = strlist
-
-            logger.info("Extracted module info with title=%s", module.get("title"))
-            module["original_doc"] = doc
-            module["raw_document"] = doc
+            return self._parse_module(response, doc)
         except Exception as e:
-            logger.exception("Module extraction failed, falling back to raw text")
-            module = {
-                "title": "",
-                "credits": "",
-                "workload": "",
-                "learninggoals": [],
-                "assessmenttype": "",
-                "level": "",
-                "description": doc,
-                "program": "",
-                "institution": "",
-            }
-            module["original_doc"] = doc
-            module["raw_document"] = doc
-            module["error"] = str(e)
-
-        return module
+            return self._fallback_module(doc, e)
 
-    def get_examination_result(self, module_internal: str, module_external: str) -> str:
+    async def aget_module_info(self, indoc: str) -> Dict[str, Any]:
         """
-        Compare two modules and generate an HTML-formatted examination result.
+        Async counterpart of ``get_module_info``.
 
         Args:
-            module_internal: JSON string of the internal module.
-            module_external: JSON string of the external module.
+            indoc: Raw module document/description text.
 
         Returns:
-            HTML-formatted examination result as a string.
+            Dictionary with extracted fields or the raw-text fallback structure.
         """
-        systemmessage = """
+        doc, messages = self._extraction_messages(indoc)
+        sections = self.extraction_strategy.sections(doc)
+        if sections:
+            module = await self._aextract_sections(doc, sections)
+            if module is not None:
+                return module
+        llm = self._llm_for("extraction")
+        if llm is not self.llm:
+            try:
+                module = self._parse_module((await llm.ainvoke(messages)).content, doc)
+                if _is_valid_module(module):
+                    return module
+                logger.info("Extraction by %s incomplete, escalating", llm.model)
+            except Exception:
+                logger.warning("Extraction by %s failed, escalating", llm.model)
+        try:
+            response = (await self.llm.ainvoke(messages)).content
+            return self._parse_module(response, doc)
+        except Exception as e:
+            return self._fallback_module(doc, e)
+
+    def _examination_messages(
+        self, module_internal: str, module_external: str
+    ) -> List[Any]:
+        """Build the chat messages for comparing two modules."""
+        model_name = getattr(self._llm_for("examination"), "model", None) or "unbekannt"
+        systemmessage = f"""
 Ich bin als KI-Assistent*in im Prüfungsamt einer Hochschule tätig. Meine Hauptaufgaben umfassen die Beantwortung von Fragen zu Modulen und die Überprüfung, ob ein externes Modul auf ein internes Modul anerkannt werden kann.
 
 Folgende Kriterien werden bei der Prüfung der Anerkennbarkeit berücksichtigt:
@@ -211,7 +435,7 @@ Es gibt drei mögliche Ergebnisse für die Prüfung:
 
 Die Abschnitte und Inhalte meiner Antworten strukturiere ich mit Markdown. Kriterien werden einzeln bewertet. Lernziele müssen nur bei Unterschieden aufgelistet werden.
 Am Schluss der Prüfung folgt eine prägnante, hervorgehobene Zusammenfassung des Prüfungsergebnisses mit dem Ergebnis: "Es wird auf Basis des Vergelichs der Module  eine *Vollständige Anerkennung*, *Teilweise Anerkennung* oder *Keine Anerkennung* empfohlen.
-Gib an dieser Stelle zusätzlich den Hinweis, dass das Ergebnis auf Basis eines generativen OpenSource-Sprachmodelles namens gemma-3-27b-it generiert wurde. Das Open-Source Modell wird von [KISSKI](https://kisski.gwdg.de) bereitgestellt.
+Gib an dieser Stelle zusätzlich den Hinweis, dass das Ergebnis auf Basis eines generativen OpenSource-Sprachmodelles namens {model_name} generiert wurde. Das Open-Source Modell wird von [KISSKI](https://kisski.gwdg.de) bereitgestellt.
         """
 
         humanmessage = (
@@ -231,14 +455,129 @@ Gib an dieser Stelle zusätzlich den Hinweis, dass das Ergebnis auf Basis eines
         """
         )
 
-        llm = LLMClient(max_tokens=2048)
-        messages = [
+        return [
             SystemMessage(content=systemmessage),
             HumanMessage(content=humanmessage),
         ]
 
-        response = self.llm.invoke(messages).content
+    def examination_prompt_key(self) -> str:
+        """Short hash of the examination prompt without the module descriptions."""
+        messages = self._examination_messages("", "")
+        text = "\x1f".join(message.content for message in messages)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+    def get_examination_result(self, module_internal: str, module_external: str) -> str:
+        """
+        Compare two modules and generate an HTML-formatted examination result.
+
+        Args:
+            module_internal: JSON string of the internal module.
+            module_external: JSON string of the external module.
+
+        Returns:
+            HTML-formatted examination result as a string.
+        """
+        messages = self._examination_messages(module_internal, module_external)
+
+        response = self._llm_for("examination").invoke(messages).content
         logger.info("Generated examination result")
         markdown_result = markdown.markdown(response)
 
         return markdown_result
+
+    async def aget_examination_result(
+        self, module_internal: str, module_external: str
+    ) -> str:
+        """
+        Async counterpart of ``get_examination_result``.
+
+        Args:
+            module_internal: JSON string of the internal module.
+            module_external: JSON string of the external module.
+
+        Returns:
+            HTML-formatted examination result as a string.
+        """
+        messages = self._examination_messages(module_internal, module_external)
+        response = (await self._llm_for("examination").ainvoke(messages)).content
+        logger.info("Generated examination result")
+        return markdown.markdown(response)
+
+    async def assess_candidates(
+        self,
+        module_external: str,
+        candidates: List[Dict[str, Any]],
+        concurrency: int = 5,
+        stop_on_full: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Run examinations for several candidate modules concurrently and rank them.
+
+        Args:
+            module_external: JSON string of the external module.
+            candidates: Module suggestions as returned by ``get_module_suggestions``.
+            concurrency: Maximum number of simultaneous LLM calls.
+            stop_on_full: Cancel outstanding examinations once one candidate
+                yields a full recognition.
+
+        Returns:
+            List of assessment dictionaries (module, verdict, result, elapsed,
+            error, rank) ordered by verdict and original retrieval order.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def assess(position: int, module: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                started = time.perf_counter()
+                assessment = {"position": position, "module": module, "error": None}
+                try:
+                    module_internal = module.get("json") or json.dumps(module)
+                    result = await self.aget_examination_result(
+                        module_internal, module_external
+                    )
+                    assessment["result"] = result
+                    assessment["verdict"] = parse_verdict(result)
+                except Exception as e:
+                    logger.exception("Examination of candidate %s failed", position)
+                    assessment["result"] = ""
+                    assessment["verdict"] = None
+                    assessment["error"] = str(e)
+                assessment["elapsed"] = time.perf_counter() - started
+                return assessment
+
+        tasks = [
+            asyncio.ensure_future(assess(position, module))
+            for position, module in enumerate(candidates)
+        ]
+        assessments = []
+        try:
+            for finished in asyncio.as_completed(tasks):
+                assessment = await finished
+                assessments.append(assessment)
+                if stop_on_full and assessment["verdict"] == "full":
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        done = {a["position"] for a in assessments}
+        for position, module in enumerate(candidates):
+            if position not in done:
+                assessments.append(
+                    {
+                        "position": position,
+                        "module": module,
+                        "result": "",
+                        "verdict": "cancelled",
+                        "error": None,
+                        "elapsed": None,
+                    }
+                )
+
+        assessments.sort(
+            key=lambda a: (VERDICT_RANK.get(a["verdict"], len(VERDICT_RANK)), a["position"])
+        )
+        for rank, assessment in enumerate(assessments, start=1):
+            assessment["rank"] = rank
+        return assessments
@@ -0,0 +1,523 @@
+"""Append-only log of recognition decisions with columnar compaction."""
+
+import argparse
+import contextlib
+import glob
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    "timestamp",
+    "route",
+    "inputs_hash",
+    "external_hash",
+    "module_key",
+    "module_title",
+    "model",
+    "verdict",
+    "reused",
+    "learninggoals_ms",
+    "examination_ms",
+    "total_ms",
+    "llm_calls",
+    "input_tokens",
+    "output_tokens",
+    "result",
+)
+
+SEGMENT_PREFIX = "decisions-"
+# Taken shared to append or read and exclusively to compact, across processes
+LOCK_NAME = ".decisions.lock"
+
+
+def default_audit_dir() -> str:
+    """Return the location of the decision log (env ``AUDIT_LOG_DIR``)."""
+    return os.getenv("AUDIT_LOG_DIR") or os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "data", "audit"
+    )
+
+
+def _digest(*parts: Optional[str]) -> str:
+    payload = "\x1f".join("" if part is None else str(part) for part in parts)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def inputs_hash(
+    internal_json: str,
+    external_json: str,
+    model: Optional[str],
+    prompt: Optional[str] = None,
+) -> str:
+    """
+    Identity of an examination: both module descriptions, the model and prompt.
+
+    Args:
+        internal_json: Internal module as sent to the examination prompt.
+        external_json: External module as sent to the examination prompt.
+        model: Examination model name.
+        prompt: Version key of the examination prompt template, so results
+            of an older prompt are not reused.
+
+    Returns:
+        Hex digest.
+    """
+    if prompt is None:
+        return _digest(internal_json, external_json, model)
+    return _digest(internal_json, external_json, model, prompt)
+
+
+def module_key(internal_json: str) -> str:
+    """Short stable key of an internal module card."""
+    return _digest(internal_json)[:16]
+
+
+def segment_day(timestamp: float) -> str:
+    """UTC day (YYYYMMDD) of the segment a record belongs to."""
+    return time.strftime("%Y%m%d", time.gmtime(timestamp))
+
+
+def _read_segment(path: str) -> pd.DataFrame:
+    # Keep timestamps as Unix seconds (pandas would parse a "timestamp" column)
+    return pd.read_json(path, lines=True, dtype=False, convert_dates=False)
+
+
+def _read_columnar(path: str) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, compression="gzip", keep_default_na=False, na_values=[""])
+
+
+def _write_columnar(frame: pd.DataFrame, base: str) -> str:
+    """
+    Write ``frame`` next to ``base`` as Parquet, or gzip CSV without a Parquet engine.
+
+    Returns:
+        Path of the written file.
+    """
+    path = base + ".parquet"
+    tmp_path = path + ".tmp"
+    try:
+        frame.to_parquet(tmp_path, index=False)
+    except ImportError:
+        path = base + ".csv.gz"
+        tmp_path = path + ".tmp"
+        frame.to_csv(tmp_path, index=False, compression="gzip")
+    os.replace(tmp_path, path)
+    return path
+
+
+class DecisionLog:
+    """
+    Append-only decision log written by a background thread.
+
+    ``log`` only enqueues the record, so the request path never waits for
+    disk. The writer appends buffered records to one JSONL segment per UTC
+    day; closed segments are periodically compacted into columnar files
+    (Parquet when an engine is installed). ``load`` and ``aggregate`` read
+    both, and ``lookup`` returns the last logged result for identical inputs
+    within ``reuse_max_age``.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        flush_interval: float = 1.0,
+        max_buffer: int = 100,
+        max_queue: int = 10000,
+        compact_interval: float = 3600.0,
+        reuse_max_age: float = 7 * 86400.0,
+        max_index_entries: int = 10000,
+    ) -> None:
+        """
+        Initialize the log.
+
+        Args:
+            directory: Directory holding the segments.
+            flush_interval: Seconds a record may wait in the buffer.
+            max_buffer: Records written at once at most.
+            max_queue: Pending records before new ones are dropped.
+            compact_interval: Seconds between compactions of closed segments.
+            reuse_max_age: Seconds a logged result is returned by ``lookup``.
+            max_index_entries: Results kept in the lookup index (least
+                recently logged dropped).
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_queue = max_queue
+        self.compact_interval = compact_interval
+        self.reuse_max_age = reuse_max_age
+        self.max_index_entries = max_index_entries
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._index = None
+        self._stats = {"logged": 0, "written": 0, "dropped": 0, "compacted": 0}
+
+    @classmethod
+    def from_env(cls) -> "DecisionLog":
+        """Create a log configured through ``AUDIT_*`` variables."""
+        return cls(
+            default_audit_dir(),
+            flush_interval=float(os.getenv("AUDIT_FLUSH_INTERVAL", "1")),
+            compact_interval=float(os.getenv("AUDIT_COMPACT_INTERVAL", "3600")),
+            reuse_max_age=float(os.getenv("AUDIT_REUSE_MAX_AGE", str(7 * 86400))),
+        )
+
+    def _ensure_worker(self) -> None:
+        """Start the writer thread (again after a fork)."""
+        if self._worker is not None and self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is None or self._worker_pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._worker = threading.Thread(
+                    target=self._run, name="decision-log", daemon=True
+                )
+                self._worker_pid = os.getpid()
+                self._worker.start()
+
+    def log(self, record: Dict[str, Any]) -> bool:
+        """
+        Enqueue a decision without blocking.
+
+        Args:
+            record: Values for ``COLUMNS``; ``timestamp`` defaults to now.
+
+        Returns:
+            Whether the record was accepted (False if the queue is full).
+        """
+        record = {column: record.get(column) for column in COLUMNS}
+        if record["timestamp"] is None:
+            record["timestamp"] = time.time()
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._stats["dropped"] += 1
+            logger.warning("Decision log queue full, dropping record")
+            return False
+        self._stats["logged"] += 1
+        with self._lock:
+            if self._index is not None:
+                self._remember(self._index, record)
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Write all records logged so far.
+
+        Args:
+            timeout: Seconds to wait for the writer.
+
+        Returns:
+            Whether the writer confirmed the flush in time.
+        """
+        self._ensure_worker()
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self) -> None:
+        """Writer loop: buffer records, append them, compact periodically."""
+        pending = self._queue
+        buffer = []
+        deadline = None
+        last_compaction = time.monotonic()
+        while True:
+            if buffer:
+                timeout = max(0.0, deadline - time.monotonic())
+            else:
+                timeout = self.compact_interval
+            try:
+                item = pending.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            flush_now = item is None or isinstance(item, threading.Event)
+            if isinstance(item, dict):
+                if not buffer:
+                    deadline = time.monotonic() + self.flush_interval
+                buffer.append(item)
+                flush_now = len(buffer) >= self.max_buffer
+            if buffer and (flush_now or time.monotonic() >= deadline):
+                self._write(buffer)
+                buffer = []
+            if isinstance(item, threading.Event):
+                item.set()
+
+            if time.monotonic() - last_compaction >= self.compact_interval:
+                last_compaction = time.monotonic()
+                try:
+                    self.compact()
+                except Exception:
+                    logger.exception("Decision log compaction failed")
+
+    @contextlib.contextmanager
+    def _locked_files(self, exclusive: bool = False) -> Iterator[None]:
+        """
+        Hold the segment files against compaction in this and other processes.
+
+        Appending and reading take the lock file shared, compaction takes it
+        exclusively, so no process sees a day both compacted and as segment.
+        """
+        with self._file_lock:
+            if fcntl is None or not os.path.isdir(self.directory):
+                yield
+                return
+            with open(os.path.join(self.directory, LOCK_NAME), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _segment_base(self, day: str) -> str:
+        return os.path.join(self.directory, SEGMENT_PREFIX + day)
+
+    def _write(self, records: Sequence[Dict[str, Any]]) -> None:
+        """Append records to their day segments."""
+        by_day = {}
+        for record in records:
+            by_day.setdefault(segment_day(record["timestamp"]), []).append(record)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with self._locked_files():
+                for day, day_records in by_day.items():
+                    with open(self._segment_base(day) + ".jsonl", "a", encoding="utf-8") as file:
+                        for record in day_records:
+                            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._stats["written"] += len(records)
+        except OSError:
+            logger.exception("Could not write %d decision records", len(records))
+
+    def compact(self, include_active: bool = False) -> List[str]:
+        """
+        Move JSONL segments into columnar files, one per day.
+
+        Args:
+            include_active: Also compact today's segment, which is still
+                being appended to.
+
+        Returns:
+            Paths of the written columnar files.
+        """
+        today = segment_day(time.time())
+        written = []
+        # Every worker's writer compacts; the exclusive lock lets one at a
+        # time in, and later ones find the segments already moved
+        with self._locked_files(exclusive=True):
+            for segment in sorted(glob.glob(self._segment_base("*") + ".jsonl")):
+                base = segment[: -len(".jsonl")]
+                if base.endswith(today) and not include_active:
+                    continue
+                frames = [_read_columnar(path) for path in self._columnar_files(base)]
+                frames.append(_read_segment(segment))
+                frame = pd.concat(frames, ignore_index=True).reindex(columns=list(COLUMNS))
+                path = _write_columnar(frame, base)
+                for stale in self._columnar_files(base) + [segment]:
+                    if stale != path:
+                        with contextlib.suppress(FileNotFoundError):
+                            os.remove(stale)
+                written.append(path)
+                self._stats["compacted"] += 1
+        return written
+
+    @staticmethod
+    def _columnar_files(base: str) -> List[str]:
+        return [
+            path for path in (base + ".parquet", base + ".csv.gz") if os.path.exists(path)
+        ]
+
+    def load(self, since: Optional[float] = None) -> pd.DataFrame:
+        """
+        Read all written decisions.
+
+        Args:
+            since: Only return records at or after this Unix timestamp.
+
+        Returns:
+            DataFrame with ``COLUMNS``, ordered by timestamp.
+        """
+        frames = []
+        with self._locked_files():
+            pattern = self._segment_base("*")
+            for path in sorted(glob.glob(pattern + ".parquet") + glob.glob(pattern + ".csv.gz")):
+                frames.append(_read_columnar(path))
+            for path in sorted(glob.glob(pattern + ".jsonl")):
+                frames.append(_read_segment(path))
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame(columns=list(COLUMNS))
+        frame = pd.concat(frames, ignore_index=True).reindex(columns=list(COLUMNS))
+        if since is not None:
+            frame = frame[frame["timestamp"] >= since]
+        return frame.sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+    def aggregate(
+        self,
+        by: Sequence[str] = ("verdict",),
+        since: Optional[float] = None,
+        frame: Optional[pd.DataFrame] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Aggregate decisions per group.
+
+        Args:
+            by: Columns to group by, e.g. ("model", "verdict").
+            since: Only consider records at or after this Unix timestamp.
+            frame: Decisions to aggregate instead of the whole log.
+
+        Returns:
+            One dictionary per group with its keys, ``count``, ``share``,
+            ``reused`` share, ``total_ms`` p50/p95 and token sums.
+        """
+        if frame is None:
+            frame = self.load(since)
+        if frame.empty:
+            return []
+        by = list(by)
+        groups = frame.astype({column: object for column in by}).fillna(
+            {column: "unknown" for column in by}
+        )
+        rows = []
+        for key, group in groups.groupby(by, sort=True):
+            key = key if isinstance(key, tuple) else (key,)
+            total_ms = pd.to_numeric(group["total_ms"], errors="coerce").dropna()
+            rows.append(
+                {
+                    **dict(zip(by, key)),
+                    "count": len(group),
+                    "share": len(group) / len(frame),
+                    # Booleans read back from CSV may be strings
+                    "reused": float(
+                        group["reused"].astype(str).isin(["True", "1", "1.0"]).mean()
+                    ),
+                    "total_ms_p50": float(np.percentile(total_ms, 50)) if len(total_ms) else None,
+                    "total_ms_p95": float(np.percentile(total_ms, 95)) if len(total_ms) else None,
+                    "input_tokens": int(pd.to_numeric(group["input_tokens"]).fillna(0).sum()),
+                    "output_tokens": int(pd.to_numeric(group["output_tokens"]).fillna(0).sum()),
+                }
+            )
+        return rows
+
+    def _remember(self, index: OrderedDict, record: Dict[str, Any]) -> None:
+        # Missing values read back from Parquet or CSV are NaN, not None
+        result, inputs = record.get("result"), record.get("inputs_hash")
+        if isinstance(result, str) and result and isinstance(inputs, str):
+            index.pop(record["inputs_hash"], None)
+            index[record["inputs_hash"]] = {
+                "verdict": record.get("verdict"),
+                "result": record["result"],
+                "timestamp": record["timestamp"],
+            }
+            while len(index) > self.max_index_entries:
+                index.popitem(last=False)
+
+    def lookup(self, inputs: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the latest logged result of an identical examination.
+
+        On first use the index is built from the records of the last
+        ``reuse_max_age`` seconds, reading the log outside the lock so
+        ``log`` does not wait for it; afterwards ``log`` keeps it up to date.
+        Lookups during the build miss.
+
+        Args:
+            inputs: ``inputs_hash`` of the examination.
+
+        Returns:
+            Dictionary with ``verdict``, ``result`` and ``timestamp``, or None
+            if there is no result younger than ``reuse_max_age``.
+        """
+        cutoff = time.time() - self.reuse_max_age
+        with self._lock:
+            build = self._index is None
+            if build:
+                self._index = OrderedDict()
+        if build:
+            index = OrderedDict()
+            for record in self.load(since=cutoff).to_dict("records"):
+                self._remember(index, record)
+            with self._lock:
+                # Records logged during the build are newer than the loaded ones
+                for key, entry in self._index.items():
+                    index.pop(key, None)
+                    index[key] = entry
+                while len(index) > self.max_index_entries:
+                    index.popitem(last=False)
+                self._index = index
+        with self._lock:
+            entry = self._index.get(inputs)
+        if entry is None or entry["timestamp"] < cutoff:
+            return None
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters of logged, written, dropped and compacted records."""
+        stats = dict(self._stats)
+        stats["pending"] = self._queue.qsize()
+        return stats
+
+
+_decision_log = None
+
+
+def get_decision_log() -> Optional[DecisionLog]:
+    """Return the process-wide decision log, or None if ``AUDIT_LOG=0``."""
+    global _decision_log
+    if os.getenv("AUDIT_LOG", "1") == "0":
+        return None
+    if _decision_log is None:
+        _decision_log = DecisionLog.from_env()
+    return _decision_log
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Compact or query the decision log")
+    parser.add_argument("--directory", default=default_audit_dir())
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact = commands.add_parser("compact", help="compact JSONL segments")
+    compact.add_argument(
+        "--include-active",
+        action="store_true",
+        help="also compact today's segment (stop the app first)",
+    )
+    stats = commands.add_parser("stats", help="aggregate statistics as JSON")
+    stats.add_argument("--by", default="verdict", help="comma-separated columns")
+    stats.add_argument("--days", type=float, help="only the last N days")
+    args = parser.parse_args(argv)
+
+    log = DecisionLog(args.directory)
+    if args.command == "compact":
+        for path in log.compact(include_active=args.include_active):
+            logger.info("Wrote %s", path)
+    else:
+        since = time.time() - args.days * 86400 if args.days else None
+        rows = log.aggregate(by=args.by.split(","), since=since)
+        print(json.dumps(rows, indent=2, ensure_ascii=False, default=str))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,317 @@
+"""Semantic cache for near-duplicate suggestion queries."""
+
+import copy
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from recog_ai.memory import deep_sizeof
+
+logger = logging.getLogger(__name__)
+
+PAGE_HEADER_PATTERN = re.compile(
+    r"^\s*(seite|page)\s+\d+(\s*(von|of|/)\s*\d+)?\s*$|^\s*[-–]\s*\d+\s*[-–]\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_document(text: str) -> str:
+    """
+    Normalize a module description for cache lookups.
+
+    Removes page headers/footers such as "Seite 2 von 5" or "- 3 -",
+    collapses whitespace and lower-cases the text.
+
+    Args:
+        text: Raw module description.
+
+    Returns:
+        Normalized text.
+    """
+    text = PAGE_HEADER_PATTERN.sub(" ", text or "")
+    return WHITESPACE_PATTERN.sub(" ", text).strip().lower()
+
+
+def shingles(normalized: str, size: int = 3) -> np.ndarray:
+    """
+    Hash the word n-grams of a normalized document.
+
+    Args:
+        normalized: Output of ``normalize_document``.
+        size: Words per n-gram.
+
+    Returns:
+        Sorted unique 64-bit hashes (stable across processes).
+    """
+    words = normalized.split()
+    grams = [" ".join(words[i : i + size]) for i in range(max(1, len(words) - size + 1))]
+    hashes = [
+        int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "little")
+        for gram in grams
+    ]
+    return np.unique(np.asarray(hashes, dtype=np.uint64))
+
+
+def overlap(first: np.ndarray, second: np.ndarray) -> float:
+    """Jaccard similarity of two shingle sets from ``shingles``."""
+    if not len(first) or not len(second):
+        return 0.0
+    common = len(np.intersect1d(first, second, assume_unique=True))
+    return common / (len(first) + len(second) - common)
+
+
+class SemanticCache:
+    """
+    LRU cache keyed by embedding similarity of normalized documents.
+
+    Embedding models only see the beginning of long documents, so modules
+    written from the same handbook template can embed almost identically.
+    A semantic hit therefore also needs ``min_overlap`` of the documents'
+    word n-grams to be shared.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], List[float]],
+        threshold: float = 0.97,
+        max_entries: int = 256,
+        max_bytes: Optional[int] = None,
+        min_overlap: float = 0.8,
+    ) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            embed_fn: Function embedding a text into a vector.
+            threshold: Minimum cosine similarity for a semantic hit.
+            max_entries: Maximum number of cached queries; 0 disables caching.
+            max_bytes: Memory budget of all entries (vectors and values);
+                least recently used entries are evicted beyond it.
+            min_overlap: Minimum Jaccard similarity of word 3-grams for a
+                semantic hit.
+        """
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.min_overlap = min_overlap
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._matrix_keys = []
+        # Embeddings of recent misses, reused when the result is stored
+        self._pending = OrderedDict()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def _key(normalized: str, namespace: str) -> str:
+        """Exact-match key for a normalized document in a namespace."""
+        return hashlib.sha256((namespace + "\0" + normalized).encode("utf-8")).hexdigest()
+
+    def _embed(self, normalized: str) -> np.ndarray:
+        """Embed and L2-normalize a document."""
+        vector = np.asarray(self.embed_fn(normalized), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _index(self):
+        """Return the (lazily rebuilt) embedding matrix and its keys."""
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries)
+            if self._matrix_keys:
+                self._matrix = np.stack(
+                    [self._entries[key]["vector"] for key in self._matrix_keys]
+                )
+            else:
+                self._matrix = np.empty((0, 0), dtype=np.float32)
+        return self._matrix, self._matrix_keys
+
+    def lookup(self, text: str, namespace: str = "") -> Optional[Any]:
+        """
+        Return a cached value for the text or a near-duplicate of it.
+
+        Args:
+            text: Raw module description.
+            namespace: Separates entries that must not be shared, e.g. filters.
+
+        Returns:
+            A copy of the cached value, or None on a miss.
+        """
+        if self.max_entries <= 0:
+            return None
+
+        normalized = normalize_document(text)
+        key = self._key(normalized, namespace)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return copy.deepcopy(self._entries[key]["value"])
+
+        vector = self._embed(normalized)
+        grams = shingles(normalized)
+        with self._lock:
+            matrix, keys = self._index()
+            if len(keys):
+                similarities = matrix @ vector
+                for position in np.argsort(-similarities):
+                    if similarities[position] < self.threshold:
+                        break
+                    entry = self._entries[keys[position]]
+                    if entry["namespace"] != namespace:
+                        continue
+                    shared = overlap(grams, entry["shingles"])
+                    if shared < self.min_overlap:
+                        continue
+                    self._entries.move_to_end(keys[position])
+                    self._stats["semantic_hits"] += 1
+                    logger.info(
+                        "Semantic cache hit (similarity=%.4f, overlap=%.2f)",
+                        similarities[position],
+                        shared,
+                    )
+                    return copy.deepcopy(entry["value"])
+            self._stats["misses"] += 1
+            self._pending[key] = vector
+            while len(self._pending) > 64:
+                self._pending.popitem(last=False)
+        return None
+
+    def store(self, text: str, value: Any, namespace: str = "") -> None:
+        """
+        Cache a value for a document, evicting least recently used entries
+        beyond the entry limit or memory budget.
+
+        Args:
+            text: Raw module description.
+            value: Value to cache (copied on store and on lookup).
+            namespace: Separates entries that must not be shared, e.g. filters.
+        """
+        if self.max_entries <= 0:
+            return
+
+        normalized = normalize_document(text)
+        key = self._key(normalized, namespace)
+        with self._lock:
+            vector = self._pending.pop(key, None)
+        if vector is None:
+            vector = self._embed(normalized)
+        grams = shingles(normalized)
+        with self._lock:
+            self._insert(key, namespace, vector, grams, copy.deepcopy(value))
+            self._matrix = None
+
+    def _insert(
+        self, key: str, namespace: str, vector: np.ndarray, grams: np.ndarray, value: Any
+    ) -> None:
+        """Add an entry and evict beyond the limits (caller holds the lock)."""
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)["size"]
+        size = vector.nbytes + grams.nbytes + deep_sizeof(value)
+        self._entries[key] = {
+            "namespace": namespace,
+            "vector": vector,
+            "shingles": grams,
+            "value": value,
+            "size": size,
+        }
+        self._bytes += size
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted["size"]
+            self._stats["evictions"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return all entries, least recently used first.
+
+        Returns:
+            Dictionary with a list of entries (key, namespace, vector,
+            shingles, value).
+        """
+        with self._lock:
+            entries = [
+                {
+                    "key": key,
+                    "namespace": entry["namespace"],
+                    "vector": entry["vector"].tolist(),
+                    "shingles": entry["shingles"].tolist(),
+                    "value": copy.deepcopy(entry["value"]),
+                }
+                for key, entry in self._entries.items()
+            ]
+        return {"entries": entries}
+
+    def restore(self, state: Dict[str, Any]) -> int:
+        """
+        Load entries from a snapshot, keeping the most recently used ones.
+
+        Entries of snapshots written before shingles were stored are skipped,
+        as they could not be checked for a semantic hit.
+
+        Args:
+            state: Result of ``snapshot``.
+
+        Returns:
+            Number of restored entries.
+        """
+        if self.max_entries <= 0:
+            return 0
+        entries = [entry for entry in state["entries"] if "shingles" in entry]
+        entries = entries[-self.max_entries :]
+        with self._lock:
+            for entry in entries:
+                vector = np.asarray(entry["vector"], dtype=np.float32)
+                grams = np.asarray(entry["shingles"], dtype=np.uint64)
+                self._insert(entry["key"], entry["namespace"], vector, grams, entry["value"])
+            self._matrix = None
+        return len(entries)
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._pending.clear()
+            self._matrix = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit metrics.
+
+        Returns:
+            Dictionary with hit/miss/eviction counters, size and hit rate.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        )
+        return stats
+
+    def memory(self) -> Dict[str, Any]:
+        """
+        Return the memory held by the entries.
+
+        Returns:
+            Dictionary with ``bytes``, ``max_bytes`` and ``entries``.
+        """
+        with self._lock:
+            return {
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "entries": len(self._entries),
+            }
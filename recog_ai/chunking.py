@@ -0,0 +1,321 @@
+"""Multi-vector indexing: module sections embedded separately, pooled per module."""
+
+import argparse
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from recog_ai.utils import distance_to_similarity
+
+logger = logging.getLogger(__name__)
+
+CHUNK_COLLECTION = "module_chunks"
+MODULE_ID_KEY = "module_id"
+SECTION_KEY = "section"
+
+# Metadata fields holding learning goals, as list or bullet/line separated text
+GOAL_FIELDS = ("learninggoals", "learning_outcomes", "description")
+BULLET = re.compile(r"^\s*(?:[-•*–]|\d+[.)])\s*")
+
+
+def _split_goals(value: Any) -> List[str]:
+    """Split learning goals given as list or as line/bullet separated text."""
+    if isinstance(value, (list, tuple)):
+        lines = [str(v) for v in value]
+    elif isinstance(value, str):
+        lines = value.splitlines()
+    else:
+        return []
+    goals = [BULLET.sub("", line).strip() for line in lines]
+    return [goal for goal in goals if len(goal) > 3]
+
+
+def _split_content(text: str, max_chars: int) -> List[str]:
+    """Pack paragraphs into windows of at most ``max_chars`` characters."""
+    chunks, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        paragraph = " ".join(paragraph.split())
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:cut])
+            paragraph = paragraph[cut:].strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 1 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = (current + " " + paragraph).strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_module(
+    metadata: Dict[str, Any], page_content: str, max_chars: int = 1000
+) -> List[Tuple[str, str]]:
+    """
+    Split a module into separately embedded sections.
+
+    Args:
+        metadata: Module metadata.
+        page_content: Indexed module text.
+        max_chars: Maximum characters per content chunk (well below the
+            512-token limit of the embedding model).
+
+    Returns:
+        List of (section, text) pairs: the title, each learning goal and the
+        content windows. Duplicate texts are dropped.
+    """
+    sections = []
+    title = metadata.get("title") or metadata.get("name")
+    if title:
+        sections.append(("title", str(title)))
+    for field in GOAL_FIELDS:
+        goals = _split_goals(metadata.get(field))
+        if goals:
+            sections.extend(("goal", goal) for goal in goals)
+            break
+    sections.extend(("content", chunk) for chunk in _split_content(page_content, max_chars))
+
+    seen, unique = set(), []
+    for section, text in sections:
+        if text not in seen:
+            seen.add(text)
+            unique.append((section, text))
+    return unique
+
+
+def get_chunk_database(moduledb: Any) -> Any:
+    """
+    Return the chunk collection stored next to a module database, creating it.
+
+    Only for code writing a snapshot (sync, rebuild); serving code uses
+    ``open_chunk_database`` so it never adds a collection to a live store.
+
+    Args:
+        moduledb: Chroma vector database of the modules.
+
+    Returns:
+        Chroma instance on the chunk collection of the same client.
+    """
+    from langchain_chroma import Chroma
+
+    return Chroma(
+        client=moduledb._client,
+        collection_name=CHUNK_COLLECTION,
+        embedding_function=moduledb.embeddings,
+    )
+
+
+def open_chunk_database(moduledb: Any) -> Optional[Any]:
+    """
+    Open the chunk collection next to a module database without creating it.
+
+    Args:
+        moduledb: Chroma vector database of the modules.
+
+    Returns:
+        Chroma instance on the chunk collection, or None if the store has no
+        chunk index.
+    """
+    from langchain_chroma import Chroma
+
+    try:
+        return Chroma(
+            client=moduledb._client,
+            collection_name=CHUNK_COLLECTION,
+            embedding_function=moduledb.embeddings,
+            create_collection_if_not_exists=False,
+        )
+    except ValueError:
+        return None
+
+
+def has_chunk_index(moduledb: Any) -> bool:
+    """Whether the store of ``moduledb`` contains a chunk collection."""
+    names = [getattr(c, "name", c) for c in moduledb._client.list_collections()]
+    return CHUNK_COLLECTION in names
+
+
+def delete_chunks(chunkdb: Any, module_ids: List[str]) -> None:
+    """
+    Remove all chunks of the given modules.
+
+    Args:
+        chunkdb: Chunk database.
+        module_ids: Module ids.
+    """
+    if module_ids:
+        chunkdb._collection.delete(where={MODULE_ID_KEY: {"$in": list(module_ids)}})
+
+
+def index_chunks(
+    chunkdb: Any,
+    modules: Iterable[Tuple[str, Dict[str, Any], str]],
+    batch_size: int = 64,
+) -> int:
+    """
+    Embed and store the chunks of modules.
+
+    Args:
+        chunkdb: Chunk database.
+        modules: (module id, metadata, page content) triples.
+        batch_size: Number of chunks embedded per call.
+
+    Returns:
+        Number of stored chunks.
+    """
+    ids, texts, metadatas = [], [], []
+    for module_id, metadata, content in modules:
+        for index, (section, text) in enumerate(split_module(metadata, content)):
+            ids.append(f"{module_id}#{index}")
+            texts.append(text)
+            metadatas.append({MODULE_ID_KEY: module_id, SECTION_KEY: section})
+
+    for start in range(0, len(ids), batch_size):
+        chunkdb.add_texts(
+            texts=texts[start : start + batch_size],
+            metadatas=metadatas[start : start + batch_size],
+            ids=ids[start : start + batch_size],
+        )
+    return len(ids)
+
+
+def build_chunk_index(moduledb: Any, batch_size: int = 64) -> int:
+    """
+    (Re)build the chunk collection for every module in the store.
+
+    Args:
+        moduledb: Chroma vector database of the modules.
+        batch_size: Number of chunks embedded per call.
+
+    Returns:
+        Number of stored chunks.
+    """
+    if has_chunk_index(moduledb):
+        moduledb._client.delete_collection(CHUNK_COLLECTION)
+    stored = moduledb.get(include=["metadatas", "documents"])
+    modules = zip(
+        stored["ids"],
+        [m or {} for m in stored["metadatas"]],
+        [d or "" for d in stored["documents"]],
+    )
+    count = index_chunks(get_chunk_database(moduledb), modules, batch_size)
+    logger.info("Indexed %d chunks for %d modules", count, len(stored["ids"]))
+    return count
+
+
+class ChunkedModuleIndex:
+    """
+    Module search over section vectors, drop-in for ``similarity_search_with_score``.
+
+    The query is matched against all chunks; chunk hits are grouped by module
+    and pooled (``max``: best chunk, ``sum``: sum of the similarities of the
+    module's retrieved chunks), so top-k contains each module once.
+    """
+
+    def __init__(
+        self,
+        moduledb: Any,
+        chunkdb: Optional[Any] = None,
+        pooling: str = "max",
+        chunks_per_module: int = 8,
+    ) -> None:
+        """
+        Initialize the index.
+
+        Args:
+            moduledb: Chroma vector database of the modules.
+            chunkdb: Chunk database (default: collection next to ``moduledb``,
+                opened read-only; without one every search is a whole-module
+                search).
+            pooling: "max" or "sum".
+            chunks_per_module: Chunks fetched per requested module.
+        """
+        if pooling not in ("max", "sum"):
+            raise ValueError(f"Unknown pooling: {pooling}")
+        self.db = moduledb
+        self.chunkdb = chunkdb if chunkdb is not None else open_chunk_database(moduledb)
+        self.pooling = pooling
+        self.chunks_per_module = chunks_per_module
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """
+        Return the k best modules for a query.
+
+        Args:
+            query: Query text.
+            k: Number of modules.
+            **kwargs: Passed to the chunk search (e.g. ``filter``).
+
+        Returns:
+            (module document, distance) pairs, best first. The distance is
+            that of the module's best chunk, raised where needed so that
+            distances never decrease down the ranking (with ``sum`` pooling
+            a module may rank above one with a closer chunk). Falls back to
+            whole-module search if no chunks are indexed.
+        """
+        embedding = self.db.embeddings.embed_query(query)
+        hits = []
+        if self.chunkdb is not None:
+            hits = self.chunkdb.similarity_search_by_vector_with_relevance_scores(
+                embedding, k=k * self.chunks_per_module, **kwargs
+            )
+        if not hits:
+            return self.db.similarity_search_by_vector_with_relevance_scores(
+                embedding, k=k, **kwargs
+            )
+
+        best, pooled = {}, {}
+        for chunk, distance in hits:
+            module_id = chunk.metadata[MODULE_ID_KEY]
+            similarity = distance_to_similarity(distance)
+            best[module_id] = min(distance, best.get(module_id, distance))
+            if self.pooling == "sum":
+                pooled[module_id] = pooled.get(module_id, 0.0) + similarity
+            else:
+                pooled[module_id] = max(similarity, pooled.get(module_id, similarity))
+
+        top = sorted(pooled, key=pooled.get, reverse=True)[:k]
+        stored = self.db.get(ids=top, include=["metadatas", "documents"])
+        documents = {
+            doc_id: Document(
+                page_content=content or "", metadata=metadata or {}, id=doc_id
+            )
+            for doc_id, metadata, content in zip(
+                stored["ids"], stored["metadatas"], stored["documents"]
+            )
+        }
+        results, floor = [], 0.0
+        for module_id in top:
+            if module_id in documents:
+                # Retrieval cut-offs expect scores sorted like the ranking
+                floor = max(floor, best[module_id])
+                results.append((documents[module_id], floor))
+        return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point: ``python -m recog_ai.chunking``."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectorstore", help="Vector store root directory")
+    args = parser.parse_args(argv)
+
+    from recog_ai.config import get_embedding
+    from recog_ai.sync import update_snapshot
+
+    # Rebuilt in a new snapshot; serving processes swap to it atomically
+    print(update_snapshot(build_chunk_index, get_embedding(), args.vectorstore))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,265 @@
+"""Circuit breaker that fails fast while the LLM upstream is unhealthy."""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, name: str, retry_after: float) -> None:
+        super().__init__(f"Circuit {name} is open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Track outcomes of upstream calls and stop calling a failing upstream.
+
+    The last ``window`` calls are kept; calls that raise or take longer than
+    ``slow_call_duration`` count as failures. Once at least ``min_calls``
+    were seen and the failure rate reaches ``failure_rate``, the circuit opens
+    and calls fail immediately with ``CircuitOpenError``. After ``cooldown``
+    seconds it half-opens and lets ``half_open_calls`` probes through: a
+    successful probe closes the circuit, a failed one opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str = "llm",
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        slow_call_duration: float = 60.0,
+        cooldown: float = 30.0,
+        half_open_calls: int = 1,
+    ) -> None:
+        """
+        Initialize a closed circuit.
+
+        Args:
+            name: Name used in logs and errors.
+            window: Number of recent calls considered.
+            min_calls: Calls needed before the circuit may open.
+            failure_rate: Fraction of failed calls that opens the circuit.
+            slow_call_duration: Seconds after which a successful call counts
+                as failed.
+            cooldown: Seconds the circuit stays open before probing.
+            half_open_calls: Concurrent probe calls allowed when half-open.
+        """
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_duration = slow_call_duration
+        self.cooldown = cooldown
+        self.half_open_calls = half_open_calls
+        self._outcomes = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @classmethod
+    def from_env(cls, name: str = "llm") -> "CircuitBreaker":
+        """Create a breaker configured through ``LLM_BREAKER_*`` variables."""
+
+        def number(key, default):
+            return float(os.getenv("LLM_BREAKER_" + key, default))
+
+        return cls(
+            name=name,
+            window=int(number("WINDOW", 20)),
+            min_calls=int(number("MIN_CALLS", 5)),
+            failure_rate=number("FAILURE_RATE", 0.5),
+            slow_call_duration=number("SLOW_CALL", 60),
+            cooldown=number("COOLDOWN", 30),
+        )
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once cooled down."""
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        """State at ``now`` (caller holds the lock)."""
+        if self._state == OPEN and now - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def is_open(self) -> bool:
+        """Whether calls would currently be rejected without probing."""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            return state == OPEN or (
+                state == HALF_OPEN and self._probes >= self.half_open_calls
+            )
+
+    def _open(self, now: float) -> None:
+        """Open the circuit (caller holds the lock)."""
+        if self._state != OPEN:
+            self._stats["opened"] += 1
+            logger.warning("Circuit %s opened for %.0fs", self.name, self.cooldown)
+        self._state = OPEN
+        self._opened_at = now
+
+    def before_call(self) -> bool:
+        """
+        Admit a call or fail fast.
+
+        Returns:
+            Whether the admitted call is a half-open probe.
+
+        Raises:
+            CircuitOpenError: If the circuit is open or all probes are taken.
+        """
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == CLOSED:
+                return False
+            if state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+            self._stats["rejected"] += 1
+            retry_after = max(1.0, self.cooldown - (now - self._opened_at))
+        raise CircuitOpenError(self.name, retry_after)
+
+    def after_call(self, failed: bool, duration: float, probe: bool = False) -> None:
+        """
+        Record the outcome of an admitted call.
+
+        Args:
+            failed: Whether the call raised.
+            duration: Call duration in seconds.
+            probe: Value returned by ``before_call`` for this call.
+        """
+        failed = failed or duration > self.slow_call_duration
+        with self._lock:
+            now = time.monotonic()
+            self._stats["calls"] += 1
+            self._stats["failures"] += failed
+            if probe:
+                self._probes = max(0, self._probes - 1)
+                if self._state != HALF_OPEN:
+                    return
+                if failed:
+                    self._open(now)
+                else:
+                    logger.info("Circuit %s closed after successful probe", self.name)
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                return
+            self._outcomes.append(failed)
+            if (
+                self._state == CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate
+            ):
+                self._open(now)
+
+    def _release(self, probe: bool) -> None:
+        """Give back a probe slot of a call that ended without an outcome."""
+        if probe:
+            with self._lock:
+                self._probes = max(0, self._probes - 1)
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """
+        Run ``fn`` through the breaker.
+
+        Args:
+            fn: Function calling the upstream.
+
+        Returns:
+            Result of ``fn``.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+        """
+        probe = self.before_call()
+        start = time.monotonic()
+        try:
+            result = fn()
+        except Exception:
+            self.after_call(True, time.monotonic() - start, probe)
+            raise
+        except BaseException:
+            self._release(probe)
+            raise
+        self.after_call(False, time.monotonic() - start, probe)
+        return result
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async variant of ``call``; cancellation is not counted as failure.
+
+        Args:
+            fn: Coroutine function calling the upstream.
+
+        Returns:
+            Result of ``fn``.
+        """
+        probe = self.before_call()
+        start = time.monotonic()
+        try:
+            result = await fn()
+        except Exception:
+            self.after_call(True, time.monotonic() - start, probe)
+            raise
+        except BaseException:
+            self._release(probe)
+            raise
+        self.after_call(False, time.monotonic() - start, probe)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return counters and the current state.
+
+        Returns:
+            Dictionary with call, failure, rejection and opening counters,
+            the state and the failure rate over the window.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["state"] = self._current_state(time.monotonic())
+            stats["failure_rate"] = (
+                sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+            )
+        return stats
+
+
+_breakers: Dict[Any, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(url: Optional[str], model: Optional[str]) -> CircuitBreaker:
+    """
+    Return the process-wide breaker of an upstream (endpoint and model).
+
+    Args:
+        url: API endpoint.
+        model: Model name.
+
+    Returns:
+        Shared CircuitBreaker instance.
+    """
+    key = (url, model)
+    with _breakers_lock:
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker.from_env(name=f"{model}@{url or 'default'}")
+        return _breakers[key]
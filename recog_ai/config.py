@@ -7,6 +7,9 @@ from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 from dotenv import load_dotenv
 
+EMBEDDING_MODEL = "isy-thl/multilingual-e5-base-course-skill-tuned"
+EMBEDDING_PROMPT = "passage: "
+
 
 def load_env():
     """Load environment variables from .env file."""
@@ -14,22 +17,102 @@ def load_env():
 
 
 def get_embedding():
-    """Initialize and return the embedding model."""
-    return HuggingFaceEmbeddings(
-        model_name="isy-thl/multilingual-e5-base-course-skill-tuned",
-        encode_kwargs={"normalize_embeddings": True, "prompt": "passage: "},
+    """
+    Initialize and return the embedding model.
+
+    ``EMBEDDING_BACKEND=onnx`` selects the ONNX Runtime backend (int8 unless
+    ``EMBEDDING_QUANTIZE=0``); ``EMBEDDING_THREADS`` limits CPU threads of
+    either backend. ``EMBEDDING_MICROBATCH=1`` batches concurrent queries
+    (``EMBEDDING_BATCH_SIZE`` texts or ``EMBEDDING_BATCH_WAIT_MS``). Up to
+    ``EMBEDDING_CACHE_SIZE`` query embeddings are cached (0 disables it)
+    within ``EMBEDDING_CACHE_MAX_MB``.
+    """
+    threads = int(os.getenv("EMBEDDING_THREADS", "0")) or None
+    if os.getenv("EMBEDDING_BACKEND", "torch").lower() == "onnx":
+        from recog_ai.embeddings import OnnxEmbeddings
+
+        embedding = OnnxEmbeddings(
+            EMBEDDING_MODEL,
+            quantize=os.getenv("EMBEDDING_QUANTIZE", "1") != "0",
+            threads=threads,
+            prompt=EMBEDDING_PROMPT,
+        )
+    else:
+        if threads:
+            import torch
+
+            torch.set_num_threads(threads)
+        embedding = HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            encode_kwargs={"normalize_embeddings": True, "prompt": EMBEDDING_PROMPT},
+        )
+
+    if os.getenv("EMBEDDING_MICROBATCH", "0") == "1":
+        from recog_ai.embeddings import MicroBatchingEmbeddings
+
+        embedding = MicroBatchingEmbeddings(
+            embedding,
+            max_batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "16")),
+            max_wait=float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5")) / 1000,
+        )
+
+    cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+    if cache_size > 0:
+        from recog_ai.embeddings import CachedEmbeddings
+        from recog_ai.memory import megabytes
+
+        embedding = CachedEmbeddings(
+            embedding,
+            max_entries=cache_size,
+            max_bytes=megabytes("EMBEDDING_CACHE_MAX_MB", 16),
+        )
+    return embedding
+
+
+def embedding_signature():
+    """
+    Identify the embedding configuration vectors were computed with.
+
+    Returns:
+        String naming the model, backend and quantization.
+    """
+    backend = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+    if backend == "onnx" and os.getenv("EMBEDDING_QUANTIZE", "1") != "0":
+        backend += "-int8"
+    return f"{EMBEDDING_MODEL}:{backend}"
+
+
+def default_vectorstore_path():
+    """Return the default location of the module vector store."""
+    return os.getenv("VECTORSTORE_PATH") or os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "data", "modules_vectorstore"
     )
 
 
 def get_module_database(embedding, vectorstore_path: str = None):
     """Initialize and return the Chroma vector database for modules."""
     if vectorstore_path is None:
-        vectorstore_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)), "data", "modules_vectorstore"
-        )
+        vectorstore_path = default_vectorstore_path()
 
     return Chroma(
         client=chromadb.PersistentClient(vectorstore_path),
         embedding_function=embedding,
         client_settings=Settings(anonymized_telemetry=False),
     )
+
+
+def close_module_database(moduledb) -> None:
+    """
+    Stop the Chroma client of a module database and release its files.
+
+    Chroma caches one client system per directory for the process lifetime;
+    dropping it lets the snapshot be closed and pruned.
+    """
+    from chromadb.api.client import SharedSystemClient
+
+    identifier = getattr(getattr(moduledb, "_client", None), "_identifier", None)
+    if identifier is None:
+        return
+    system = SharedSystemClient._identifier_to_system.pop(identifier, None)
+    if system is not None:
+        system.stop()
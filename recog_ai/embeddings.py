@@ -0,0 +1,462 @@
+"""Embedding backends: ONNX Runtime with int8 quantization, query micro-batching and caching."""
+
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model-int8.onnx"
+
+
+def default_onnx_dir(model_name: str) -> str:
+    """Return the export directory for a model (env ``EMBEDDING_ONNX_DIR``)."""
+    root = os.getenv("EMBEDDING_ONNX_DIR") or os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "data", "onnx"
+    )
+    return os.path.join(root, model_name.strip("/").replace("/", "__"))
+
+
+def mean_pool(hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    Mean-pool token embeddings over the attention mask and L2-normalize.
+
+    Matches the sentence-transformers pipeline of the e5 models
+    (mean pooling followed by normalization).
+
+    Args:
+        hidden: Token embeddings (batch × tokens × dim).
+        mask: Attention mask (batch × tokens).
+
+    Returns:
+        Normalized sentence embeddings (batch × dim).
+    """
+    mask = mask[..., None].astype(hidden.dtype)
+    summed = (hidden * mask).sum(axis=1)
+    pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+    norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+    return pooled / np.clip(norms, 1e-12, None)
+
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True) -> str:
+    """
+    Export a Hugging Face encoder to ONNX and optionally quantize it to int8.
+
+    Requires torch, transformers and onnx; only needed once per model.
+
+    Args:
+        model_name: Hugging Face model id or local directory.
+        output_dir: Directory receiving the ONNX files and the tokenizer.
+        quantize: Whether to write a dynamically quantized int8 model.
+
+    Returns:
+        Path of the model file to load.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    sample = tokenizer(["passage: export"], return_tensors="pt")
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    tmp_path = fp32_path + ".%d.tmp" % os.getpid()
+    axes = {0: "batch", 1: "tokens"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            tmp_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": axes,
+                "attention_mask": axes,
+                "last_hidden_state": axes,
+            },
+            opset_version=14,
+            dynamo=False,
+        )
+    os.replace(tmp_path, fp32_path)
+    tokenizer.save_pretrained(output_dir)
+
+    if not quantize:
+        return fp32_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    int8_path = os.path.join(output_dir, INT8_FILE)
+    tmp_path = int8_path + ".%d.tmp" % os.getpid()
+    quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, int8_path)
+    logger.info("Exported %s to %s", model_name, int8_path)
+    return int8_path
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings computed with ONNX Runtime on CPU.
+
+    The model is exported on first use and cached on disk; later starts only
+    load the (quantized) ONNX file and the tokenizer.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        onnx_dir: Optional[str] = None,
+        quantize: bool = True,
+        threads: Optional[int] = None,
+        prompt: str = "passage: ",
+        max_length: int = 512,
+        batch_size: int = 32,
+    ) -> None:
+        """
+        Load (exporting if needed) the ONNX model.
+
+        Args:
+            model_name: Hugging Face model id or local directory.
+            onnx_dir: Export directory (default: ``EMBEDDING_ONNX_DIR``).
+            quantize: Use the dynamically quantized int8 model.
+            threads: Intra-op CPU threads (None lets ONNX Runtime decide).
+            prompt: Prefix prepended to every text, as in ``get_embedding``.
+            max_length: Token limit per text.
+            batch_size: Texts per forward pass in ``embed_documents``.
+        """
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.onnx_dir = onnx_dir or default_onnx_dir(model_name)
+        self.prompt = prompt
+        self.max_length = max_length
+        self.batch_size = batch_size
+
+        model_path = os.path.join(self.onnx_dir, INT8_FILE if quantize else FP32_FILE)
+        if not os.path.exists(model_path):
+            model_path = export_onnx(model_name, self.onnx_dir, quantize=quantize)
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(self.onnx_dir)
+        # Fast tokenizers raise "Already borrowed" when used concurrently
+        self._tokenizer_lock = threading.Lock()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Embed one batch of texts in a single forward pass."""
+        with self._tokenizer_lock:
+            tokens = self.tokenizer(
+                [self.prompt + text for text in texts],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+        inputs = {
+            name: value.astype(np.int64)
+            for name, value in tokens.items()
+            if name in self.input_names
+        }
+        hidden = self.session.run(None, inputs)[0]
+        return mean_pool(hidden, tokens["attention_mask"])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents in batches.
+
+        Args:
+            texts: Texts to embed.
+
+        Returns:
+            One normalized embedding per text.
+        """
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            embeddings.extend(self._encode(texts[start : start + self.batch_size]).tolist())
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a single query.
+
+        Args:
+            text: Query text.
+
+        Returns:
+            Normalized embedding.
+        """
+        return self._encode([text])[0].tolist()
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """
+    Coalesce concurrent ``embed_query`` calls into batched forward passes.
+
+    Request threads enqueue their text and wait on a future. A background
+    worker collects texts until ``max_batch_size`` is reached or
+    ``max_wait`` seconds passed since the first one, embeds them with one
+    ``embed_documents`` call and resolves the futures. This relies on the
+    wrapped model embedding queries and documents identically, which holds
+    for both backends of ``get_embedding`` (same "passage: " prompt).
+    """
+
+    def __init__(
+        self, embedding: Embeddings, max_batch_size: int = 16, max_wait: float = 0.005
+    ) -> None:
+        """
+        Wrap an embedding model.
+
+        Args:
+            embedding: Model doing the actual work.
+            max_batch_size: Maximum texts per forward pass.
+            max_wait: Seconds to wait for more texts after the first one.
+        """
+        self.embedding = embedding
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._stats = {"batches": 0, "texts": 0}
+
+    def _ensure_worker(self) -> None:
+        """Start the worker thread (again after a fork)."""
+        if self._worker is not None and self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is None or self._worker_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker_pid = os.getpid()
+                self._worker.start()
+
+    def _run(self) -> None:
+        """Worker loop collecting and processing micro-batches."""
+        pending = self._queue
+        while True:
+            batch = [pending.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch: List[Any]) -> None:
+        """Embed a batch (identical texts once) and resolve its futures."""
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = dict(zip(texts, self.embedding.embed_documents(texts)))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self._stats["batches"] += 1
+        self._stats["texts"] += len(batch)
+        for text, future in batch:
+            future.set_result(list(vectors[text]))
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query as part of the next micro-batch.
+
+        Args:
+            text: Query text.
+
+        Returns:
+            Embedding of the text.
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents directly; they are batched already.
+
+        Args:
+            texts: Texts to embed.
+
+        Returns:
+            One embedding per text.
+        """
+        return self.embedding.embed_documents(texts)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return batching counters.
+
+        Returns:
+            Dictionary with processed batches, texts and the mean batch size.
+        """
+        stats = dict(self._stats)
+        stats["mean_batch_size"] = (
+            stats["texts"] / stats["batches"] if stats["batches"] else 0.0
+        )
+        return stats
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LRU cache of query embeddings in front of an embedding model.
+
+    Queries repeat across features (semantic cache, precedents, suggestion
+    search) and across users uploading the same module description. The
+    cache can be snapshotted and restored (see ``recog_ai.warmstart``).
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        max_entries: int = 1024,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        """
+        Wrap an embedding model.
+
+        Args:
+            embedding: Model doing the actual work.
+            max_entries: Maximum number of cached query embeddings.
+            max_bytes: Memory budget of the cached embeddings.
+        """
+        self.embedding = embedding
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def _key(text: str) -> str:
+        """Cache key of a query text."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query, reusing a cached embedding of the same text.
+
+        Args:
+            text: Query text.
+
+        Returns:
+            Embedding of the text.
+        """
+        key = self._key(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return list(vector)
+            self._stats["misses"] += 1
+        vector = self.embedding.embed_query(text)
+        self._put(key, vector)
+        return list(vector)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents directly; they are not cached.
+
+        Args:
+            texts: Texts to embed.
+
+        Returns:
+            One embedding per text.
+        """
+        return self.embedding.embed_documents(texts)
+
+    def _put(self, key: str, vector: List[float]) -> None:
+        """Insert an embedding, evicting the least recently used ones."""
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key).nbytes
+            self._entries[key] = vector
+            self._bytes += vector.nbytes
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the cached embeddings, least recently used first.
+
+        Returns:
+            Dictionary with the keys and a matching list of vectors.
+        """
+        with self._lock:
+            keys = list(self._entries)
+            vectors = [self._entries[key].tolist() for key in keys]
+        return {"keys": keys, "vectors": vectors}
+
+    def restore(self, state: Dict[str, Any]) -> int:
+        """
+        Load embeddings from a snapshot.
+
+        Args:
+            state: Result of ``snapshot``.
+
+        Returns:
+            Number of restored embeddings.
+        """
+        for key, vector in zip(state["keys"], state["vectors"]):
+            self._put(key, vector)
+        with self._lock:
+            return min(len(state["keys"]), len(self._entries))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit counters.
+
+        Returns:
+            Dictionary with hits, misses, size and hit rate.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def memory(self) -> Dict[str, Any]:
+        """
+        Return the memory held by cached embeddings (vector buffers).
+
+        Returns:
+            Dictionary with ``bytes``, ``max_bytes`` and ``entries``.
+        """
+        with self._lock:
+            return {
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "entries": len(self._entries),
+            }
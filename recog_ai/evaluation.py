@@ -0,0 +1,369 @@
+"""Offline evaluation of module suggestion quality and latency."""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from recog_ai.retrieval import RetrievalPolicy
+from recog_ai.utils import build_suggestion_query
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KS = (1, 5, 10)
+# Configuration keys selecting the index and embedding rather than search parameters
+INDEX_KEYS = ("name", "vectorstore", "index", "pooling", "embedding")
+# Configuration keys passed to get_module_suggestions
+SEARCH_KEYS = ("institution", "limit")
+# Configuration keys overriding the RETRIEVAL_* settings of the policy
+POLICY_KEYS = (
+    "overfetch",
+    "max_fetch",
+    "min_similarity",
+    "score_gap",
+    "min_results",
+    "latency_budget",
+)
+DEFAULT_CONFIGS = [
+    {"name": "limit=5", "limit": 5},
+    {"name": "limit=10", "limit": 10},
+]
+
+
+@dataclass
+class EvalCase:
+    """One labelled external module and the internal modules accepted for it."""
+
+    query: str
+    accepted: List[str]
+    accepted_ids: List[str] = field(default_factory=list)
+
+
+def _normalize_title(title: Any) -> str:
+    """Normalize a module title for comparison."""
+    return " ".join(str(title or "").split()).lower()
+
+
+def load_cases(path: str) -> List[EvalCase]:
+    """
+    Load labelled pairs from a JSONL file.
+
+    Each line holds either a ready ``query`` string or an extracted
+    ``external_module`` (title, learninggoals, level) plus ``accepted_ids``,
+    the vector store ids of the internal modules that were recognized for
+    it, or ``accepted``, their titles (used if no ids are given).
+
+    Args:
+        path: Path to the JSONL file.
+
+    Returns:
+        List of evaluation cases.
+
+    Raises:
+        ValueError: If a line has no query or no accepted modules.
+    """
+    cases = []
+    with open(path, "r", encoding="utf-8") as file:
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            query = row.get("query")
+            if not query and row.get("external_module"):
+                query = build_suggestion_query(row["external_module"])
+            accepted = row.get("accepted") or []
+            if isinstance(accepted, str):
+                accepted = [accepted]
+            accepted_ids = row.get("accepted_ids") or []
+            if isinstance(accepted_ids, (str, int)):
+                accepted_ids = [accepted_ids]
+            if not query or not (accepted or accepted_ids):
+                raise ValueError(
+                    f"Line {number}: query and accepted or accepted_ids are required"
+                )
+            cases.append(
+                EvalCase(
+                    query,
+                    [_normalize_title(a) for a in accepted],
+                    [str(module_id) for module_id in accepted_ids],
+                )
+            )
+    return cases
+
+
+def first_relevant_rank(
+    suggestions: Sequence[Dict[str, Any]],
+    accepted: Iterable[str],
+    accepted_ids: Iterable[str] = (),
+) -> Optional[int]:
+    """
+    Return the 1-based rank of the first accepted suggestion.
+
+    Suggestions are matched by module id if ids are given, otherwise by
+    title (several modules may share a title).
+
+    Args:
+        suggestions: Suggestions as returned by ``get_module_suggestions``.
+        accepted: Normalized titles of accepted modules.
+        accepted_ids: Vector store ids of accepted modules.
+
+    Returns:
+        Rank of the first match or None if no suggestion was accepted.
+    """
+    accepted_ids = set(accepted_ids)
+    accepted = set(accepted)
+    for rank, suggestion in enumerate(suggestions, 1):
+        if accepted_ids:
+            if suggestion.get("id") in accepted_ids:
+                return rank
+        elif _normalize_title(suggestion.get("title")) in accepted:
+            return rank
+    return None
+
+
+def check_config(config: Dict[str, Any]) -> None:
+    """
+    Reject configuration keys the evaluation does not know.
+
+    Raises:
+        ValueError: If a key is neither an index, search nor policy key.
+    """
+    unknown = set(config) - set(INDEX_KEYS + SEARCH_KEYS + POLICY_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown configuration keys: {', '.join(sorted(unknown))}")
+
+
+def retrieval_policy(config: Dict[str, Any]) -> RetrievalPolicy:
+    """
+    Build a fresh retrieval policy for one configuration.
+
+    Settings not in the configuration come from ``RETRIEVAL_*``; filter pass
+    rates start over, so configurations do not influence each other.
+
+    Args:
+        config: Evaluation configuration.
+
+    Returns:
+        RetrievalPolicy instance.
+    """
+    defaults = RetrievalPolicy.from_env()
+    settings = {
+        key: config.get(key, getattr(defaults, key))
+        for key in POLICY_KEYS + ("limit",)
+    }
+    return RetrievalPolicy(**settings)
+
+
+@contextlib.contextmanager
+def _environment(overrides: Dict[str, Any]):
+    """Temporarily set environment variables."""
+    previous = {key: os.environ.get(key) for key in overrides}
+    os.environ.update({key: str(value) for key, value in overrides.items()})
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def summarize(
+    ranks: Sequence[Optional[int]],
+    latencies: Sequence[float],
+    ks: Sequence[int] = DEFAULT_KS,
+) -> Dict[str, Any]:
+    """
+    Aggregate per-query ranks and latencies into metrics.
+
+    Args:
+        ranks: First relevant rank per query (None for misses).
+        latencies: Latency per query in seconds.
+        ks: Cut-offs for recall@k.
+
+    Returns:
+        Dictionary with ``recall@k`` values, ``mrr`` and latency percentiles
+        in milliseconds.
+    """
+    count = len(ranks)
+    metrics = {"queries": count}
+    for k in ks:
+        hits = sum(1 for rank in ranks if rank is not None and rank <= k)
+        metrics[f"recall@{k}"] = hits / count if count else 0.0
+    metrics["mrr"] = sum(1 / rank for rank in ranks if rank) / count if count else 0.0
+
+    millis = np.array(latencies, dtype=float) * 1000
+    if len(millis):
+        metrics["latency_ms"] = {
+            "mean": float(millis.mean()),
+            "p50": float(np.percentile(millis, 50)),
+            "p95": float(np.percentile(millis, 95)),
+            "max": float(millis.max()),
+        }
+    else:
+        metrics["latency_ms"] = {"mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    return metrics
+
+
+def evaluate(
+    assistant: Any,
+    cases: Sequence[EvalCase],
+    config: Dict[str, Any],
+    ks: Sequence[int] = DEFAULT_KS,
+    warmup: int = 1,
+) -> Dict[str, Any]:
+    """
+    Run all cases through ``get_module_suggestions`` with one configuration.
+
+    Note that recall@k cannot exceed what the configured ``limit`` returns.
+
+    Args:
+        assistant: RecognitionAssistant (or anything with get_module_suggestions),
+            built with ``retrieval_policy(config)`` if the configuration has
+            policy keys.
+        cases: Labelled cases.
+        config: Configuration; ``name``, ``vectorstore``, ``index``,
+            ``pooling`` and ``embedding`` select what is searched (see
+            ``main``), ``institution`` and ``limit`` are passed to
+            ``get_module_suggestions`` and ``POLICY_KEYS`` configure the
+            retrieval policy.
+        ks: Cut-offs for recall@k.
+        warmup: Number of untimed queries run first (model load, caches).
+
+    Returns:
+        Report with the configuration, metrics and per-query results.
+
+    Raises:
+        ValueError: If the configuration has unknown keys.
+    """
+    check_config(config)
+    kwargs = {k: v for k, v in config.items() if k in SEARCH_KEYS}
+    for case in cases[:warmup]:
+        assistant.get_module_suggestions(case.query, **kwargs)
+
+    ranks, latencies, per_query = [], [], []
+    for index, case in enumerate(cases):
+        start = time.perf_counter()
+        suggestions = assistant.get_module_suggestions(case.query, **kwargs)
+        latency = time.perf_counter() - start
+        rank = first_relevant_rank(suggestions, case.accepted, case.accepted_ids)
+        ranks.append(rank)
+        latencies.append(latency)
+        per_query.append(
+            {"index": index, "rank": rank, "latency_ms": round(latency * 1000, 3)}
+        )
+
+    name = config.get("name") or json.dumps(
+        {k: v for k, v in config.items() if k != "name"}, sort_keys=True
+    )
+    report = {"name": name, "config": config}
+    report.update(summarize(ranks, latencies, ks))
+    report["per_query"] = per_query
+    return report
+
+
+def format_table(reports: Sequence[Dict[str, Any]], ks: Sequence[int] = DEFAULT_KS) -> str:
+    """
+    Render reports side by side as a plain text table.
+
+    Args:
+        reports: Reports returned by ``evaluate``.
+        ks: Cut-offs shown as recall columns.
+
+    Returns:
+        Table string.
+    """
+    headers = ["config"] + [f"R@{k}" for k in ks] + ["MRR", "p50 ms", "p95 ms"]
+    rows = [
+        [report["name"]]
+        + [f"{report[f'recall@{k}']:.3f}" for k in ks]
+        + [
+            f"{report['mrr']:.3f}",
+            f"{report['latency_ms']['p50']:.1f}",
+            f"{report['latency_ms']['p95']:.1f}",
+        ]
+        for report in reports
+    ]
+    widths = [max(len(row[i]) for row in [headers] + rows) for i in range(len(headers))]
+    lines = [
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths))
+        for row in [headers] + rows
+    ]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point: ``python -m recog_ai.evaluation``."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dataset", required=True, help="JSONL file of labelled pairs")
+    parser.add_argument(
+        "--configs",
+        help="JSON list of configurations (inline or path to a JSON file)",
+    )
+    parser.add_argument("--vectorstore", help="Vector store root directory")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed warm-up queries")
+    args = parser.parse_args(argv)
+
+    # Never reach out to the model hub; the embedding model must be cached
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    from recog_ai.assistant import RecognitionAssistant
+    from recog_ai.chunking import ChunkedModuleIndex
+    from recog_ai.config import default_vectorstore_path, get_embedding
+    from recog_ai.config import get_module_database
+    from recog_ai.sync import resolve_snapshot
+
+    configs = DEFAULT_CONFIGS
+    if args.configs:
+        if os.path.exists(args.configs):
+            with open(args.configs, "r", encoding="utf-8") as file:
+                configs = json.load(file)
+        else:
+            configs = json.loads(args.configs)
+
+    for config in configs:
+        check_config(config)
+    cases = load_cases(args.dataset)
+    embeddings = {}
+    databases = {}
+    reports = []
+    for config in configs:
+        # "embedding" holds EMBEDDING_* overrides, e.g. {"EMBEDDING_BACKEND": "onnx"};
+        # the model must match the one the vector store was built with
+        overrides = config.get("embedding") or {}
+        embedding_key = json.dumps(overrides, sort_keys=True)
+        if embedding_key not in embeddings:
+            with _environment(overrides):
+                embeddings[embedding_key] = get_embedding()
+        root = config.get("vectorstore") or args.vectorstore or default_vectorstore_path()
+        if (root, embedding_key) not in databases:
+            databases[root, embedding_key] = get_module_database(
+                embeddings[embedding_key], resolve_snapshot(root)
+            )
+        index = databases[root, embedding_key]
+        if config.get("index") == "chunked":
+            index = ChunkedModuleIndex(index, pooling=config.get("pooling", "max"))
+        # Suggestions only use the vector store; the LLM client is never called
+        assistant = RecognitionAssistant(index, retrieval_policy=retrieval_policy(config))
+        logger.info("Evaluating %s on %d cases", config.get("name"), len(cases))
+        reports.append(evaluate(assistant, cases, config, warmup=args.warmup))
+
+    print(format_table(reports))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(reports, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,200 @@
+"""Map-reduce extraction of long module descriptions."""
+
+import difflib
+import logging
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STRATEGY_SINGLE = "single"
+STRATEGY_MAP_REDUCE = "map_reduce"
+
+# Fields taken from the first section that has a value
+SCALAR_FIELDS = (
+    "title",
+    "credits",
+    "workload",
+    "assessmenttype",
+    "level",
+    "program",
+    "institution",
+)
+
+GOAL_PREFIX_PATTERN = re.compile(r"^[\s\-–•*·\d.)]+")
+GOAL_PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def split_sections(text: str, section_chars: int = 2500, max_sections: int = 6) -> List[str]:
+    """
+    Split a document into sections at paragraph or line boundaries.
+
+    Paragraphs are packed into sections of up to ``section_chars``
+    characters; longer paragraphs are split at line breaks and, as a last
+    resort, hard. If more than ``max_sections`` sections result, the section
+    size grows so the document still fits.
+
+    Args:
+        text: Document text.
+        section_chars: Target maximum characters per section.
+        max_sections: Maximum number of sections.
+
+    Returns:
+        Non-empty sections in document order.
+    """
+    text = text.strip()
+    if not text:
+        return []
+    size = max(section_chars, -(-len(text) // max_sections))
+
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        if len(paragraph) <= size:
+            pieces.append(paragraph)
+            continue
+        for line in paragraph.splitlines():
+            pieces.extend(line[i : i + size] for i in range(0, len(line), size))
+
+    sections, current = [], ""
+    for piece in pieces:
+        piece = piece.strip()
+        if not piece:
+            continue
+        if current and len(current) + len(piece) + 2 > size:
+            sections.append(current)
+            current = ""
+        current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        sections.append(current)
+
+    # Packing may leave one section more than the cap; merge the smallest pair
+    while len(sections) > max_sections:
+        sizes = [len(a) + len(b) for a, b in zip(sections, sections[1:])]
+        i = sizes.index(min(sizes))
+        sections[i : i + 2] = [sections[i] + "\n\n" + sections[i + 1]]
+    return sections
+
+
+def normalize_goal(goal: str) -> str:
+    """Comparison key of a learning goal (case, bullets, punctuation ignored)."""
+    goal = GOAL_PREFIX_PATTERN.sub("", goal)
+    goal = GOAL_PUNCTUATION_PATTERN.sub(" ", goal.casefold())
+    return WHITESPACE_PATTERN.sub(" ", goal).strip()
+
+
+def merge_goals(goal_lists: Iterable[Iterable[Any]], similarity: float = 0.9) -> List[str]:
+    """
+    Concatenate learning goals in order, dropping duplicates.
+
+    A goal is a duplicate if its normalized form equals, or is at least
+    ``similarity`` similar to, a goal kept before it, so the result only
+    depends on the order of the sections.
+
+    Args:
+        goal_lists: Learning goals per section, in document order.
+        similarity: Ratio above which two goals count as the same.
+
+    Returns:
+        Deduplicated goals; the first wording of a goal is kept.
+    """
+    merged, keys = [], []
+    for goals in goal_lists:
+        for goal in goals or []:
+            if isinstance(goal, dict):
+                goal = " ".join(str(value) for value in goal.values())
+            goal = str(goal).strip()
+            key = normalize_goal(goal)
+            if not key:
+                continue
+            if any(
+                key == kept or difflib.SequenceMatcher(None, key, kept).ratio() >= similarity
+                for kept in keys
+            ):
+                continue
+            merged.append(goal)
+            keys.append(key)
+    return merged
+
+
+def merge_modules(parts: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Merge per-section extractions into one module.
+
+    Scalar fields come from the first section that has a value, learning
+    goals from all sections (deduplicated). Failed sections are None.
+
+    Args:
+        parts: Extraction result per section, in document order.
+
+    Returns:
+        Merged module dictionary.
+    """
+    parts = [part for part in parts if isinstance(part, dict)]
+    module = {}
+    for field in SCALAR_FIELDS:
+        module[field] = next(
+            (part[field] for part in parts if part.get(field) not in (None, "", [])), ""
+        )
+    module["learninggoals"] = merge_goals(part.get("learninggoals") for part in parts)
+    return module
+
+
+class ExtractionStrategy:
+    """Chooses between single-shot and map-reduce extraction by length."""
+
+    def __init__(
+        self,
+        mode: str = "auto",
+        min_chars: int = 4000,
+        section_chars: int = 2500,
+        max_sections: int = 6,
+        section_max_tokens: int = 768,
+    ) -> None:
+        """
+        Initialize the strategy.
+
+        Args:
+            mode: "auto", "single" or "map_reduce".
+            min_chars: Documents from this length are extracted map-reduce
+                in "auto" mode.
+            section_chars: Target section length.
+            max_sections: Maximum parallel extraction calls per document.
+            section_max_tokens: Generation limit of a section call.
+        """
+        if mode not in ("auto", STRATEGY_SINGLE, STRATEGY_MAP_REDUCE):
+            raise ValueError(f"Unknown extraction mode: {mode}")
+        self.mode = mode
+        self.min_chars = min_chars
+        self.section_chars = section_chars
+        self.max_sections = max_sections
+        self.section_max_tokens = section_max_tokens
+
+    @classmethod
+    def from_env(cls) -> "ExtractionStrategy":
+        """Create a strategy configured through ``EXTRACTION_*`` variables."""
+        return cls(
+            mode=os.getenv("EXTRACTION_MODE", "auto"),
+            min_chars=int(os.getenv("EXTRACTION_MAP_REDUCE_CHARS", "4000")),
+            section_chars=int(os.getenv("EXTRACTION_SECTION_CHARS", "2500")),
+            max_sections=int(os.getenv("EXTRACTION_MAX_SECTIONS", "6")),
+            section_max_tokens=int(os.getenv("EXTRACTION_SECTION_MAX_TOKENS", "768")),
+        )
+
+    def sections(self, doc: str) -> List[str]:
+        """
+        Return the sections to extract separately, or [] for single-shot.
+
+        Args:
+            doc: Flattened module document.
+
+        Returns:
+            Sections for map-reduce extraction; empty if one call is used.
+        """
+        if self.mode == STRATEGY_SINGLE:
+            return []
+        if self.mode == "auto" and len(doc) < self.min_chars:
+            return []
+        sections = split_sections(doc, self.section_chars, self.max_sections)
+        return sections if len(sections) > 1 else []
@@ -1,36 +1,245 @@
 """LLM client for interfacing with OpenAI-compatible APIs."""
 
 import asyncio
+import contextlib
+import contextvars
+import copy
+import hashlib
+import json
 import logging
 import os
-from typing import List, Any, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+from langchain_core.load import dumpd, load
 from langchain_openai import ChatOpenAI
 
+from recog_ai.circuit_breaker import get_breaker
+from recog_ai.recorder import get_recorder
+from recog_ai.singleflight import SingleFlight
+
 logger = logging.getLogger(__name__)
 
+_singleflight = None
+
+# Token usage of the LLM calls made in the current context (see track_usage)
+_usage = contextvars.ContextVar("llm_usage", default=None)
+
+
+@contextlib.contextmanager
+def track_usage() -> Iterator[Dict[str, int]]:
+    """
+    Sum the token usage of all LLM calls made within the block.
+
+    Tasks and threads started inside the block (``asyncio.gather``,
+    ``asyncio.to_thread``) copy the context and add to the same totals. A
+    call coalesced with an identical one in flight is only counted by the
+    caller whose request reached the upstream.
+
+    Yields:
+        Dictionary with ``calls``, ``input_tokens`` and ``output_tokens``.
+    """
+    usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
+
+
+def _add_usage(response: Any, usage: Optional[Dict[str, int]]) -> None:
+    """Add a response's token usage to tracked totals (None: not tracked)."""
+    if usage is None:
+        return
+    metadata = getattr(response, "usage_metadata", None) or {}
+    usage["calls"] += 1
+    usage["input_tokens"] += metadata.get("input_tokens") or 0
+    usage["output_tokens"] += metadata.get("output_tokens") or 0
+
+
+def _get_singleflight() -> SingleFlight:
+    """Return the process-wide coalescer for identical LLM calls."""
+    global _singleflight
+    if _singleflight is None:
+        _singleflight = SingleFlight(
+            lock_dir=os.getenv("LLM_COALESCE_DIR") or None,
+            result_ttl=float(os.getenv("LLM_COALESCE_TTL", "0")),
+            dumps=lambda response: json.dumps(dumpd(response)),
+            loads=lambda data: load(json.loads(data), allowed_objects="messages"),
+        )
+    return _singleflight
+
+
+def _run_sync(coroutine: Any) -> Any:
+    """
+    Run a coroutine to completion from synchronous code.
+
+    ``asyncio.run`` cannot be nested inside a running event loop (e.g. an async
+    view calling a sync helper), so in that case the coroutine runs on a
+    separate thread with its own loop.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
 
 class LLMClient:
     """Wrapper for ChatOpenAI client with fallback to async invocation."""
 
-    def __init__(self, model: Optional[str] = None, max_tokens: int = 1024) -> None:
-        """Initialize LLM client with optional model override."""
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        max_tokens: int = 1024,
+        url: Optional[str] = None,
+        api_key: Optional[str] = None,
+    ) -> None:
+        """Initialize LLM client with optional model and endpoint overrides."""
         self.model = model or os.getenv("LLM_MODEL")
+        self.url = url or os.getenv("LLM_URL")
+        self.api_key = api_key or os.getenv("LLM_API_KEY")
         self.max_tokens = max_tokens
+        self.temperature = 0.1
         self._client = None
+        # Shared by all clients of the same upstream, so it survives requests
+        self.breaker = get_breaker(self.url, self.model)
+
+    @classmethod
+    def for_task(cls, task: str, max_tokens: int = 1024) -> Optional["LLMClient"]:
+        """
+        Create a client for a task-specific model, if one is configured.
+
+        Reads ``LLM_MODEL_<TASK>``, ``LLM_URL_<TASK>`` and ``LLM_API_KEY_<TASK>``
+        (e.g. ``LLM_MODEL_EXTRACTION``); URL and key default to the general
+        settings so a second model on the same endpoint only needs the name.
+
+        Args:
+            task: Task name, e.g. "extraction" or "examination".
+            max_tokens: Maximum tokens to generate.
+
+        Returns:
+            A configured LLMClient, or None if no model is set for the task.
+        """
+        suffix = "_" + task.upper()
+        model = os.getenv("LLM_MODEL" + suffix)
+        if not model:
+            return None
+        return cls(
+            model=model,
+            max_tokens=max_tokens,
+            url=os.getenv("LLM_URL" + suffix),
+            api_key=os.getenv("LLM_API_KEY" + suffix),
+        )
+
+    def with_max_tokens(self, max_tokens: int) -> "LLMClient":
+        """
+        Return a copy of this client that generates at most ``max_tokens``.
+
+        The copy shares the upstream's circuit breaker; the limit never grows
+        beyond this client's own.
+
+        Args:
+            max_tokens: Maximum tokens to generate.
+
+        Returns:
+            The client itself if its limit is already as low, else a copy.
+        """
+        if max_tokens >= self.max_tokens:
+            return self
+        client = copy.copy(self)
+        client.max_tokens = max_tokens
+        client._client = None
+        return client
 
     def _get_client(self) -> ChatOpenAI:
         """Lazily initialize the ChatOpenAI client."""
         if self._client is None:
             self._client = ChatOpenAI(
                 model=self.model,
-                openai_api_base=os.getenv("LLM_URL"),
-                openai_api_key=os.getenv("LLM_API_KEY"),
-                temperature=0.1,
+                openai_api_base=self.url,
+                openai_api_key=self.api_key,
+                temperature=self.temperature,
                 max_tokens=self.max_tokens,
+                timeout=float(os.getenv("LLM_TIMEOUT", "0")) or None,
             )
         return self._client
 
+    def available(self) -> bool:
+        """Whether the upstream is expected to accept calls (circuit not open)."""
+        return not self.breaker.is_open()
+
+    def _request_key(self, messages: List[Any]) -> str:
+        """Canonical identity of a request, used to coalesce duplicates."""
+        payload = json.dumps(
+            {
+                "messages": [
+                    [getattr(m, "type", type(m).__name__), m.content] for m in messages
+                ],
+                "model": self.model,
+                "url": self.url,
+                "max_tokens": self.max_tokens,
+                "temperature": self.temperature,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
     def invoke(self, messages: List[Any]) -> Any:
+        """
+        Invoke the LLM, sharing the response between identical concurrent calls.
+
+        Concurrent calls with the same messages, model and parameters wait for
+        a single upstream request (see ``SingleFlight``). That request passes
+        the upstream's circuit breaker.
+
+        Args:
+            messages: List of LangChain message objects.
+
+        Returns:
+            The LLM response object.
+
+        Raises:
+            CircuitOpenError: If the upstream's circuit is open.
+        """
+        # Usage is counted by the caller whose call reached the upstream
+        usage = _usage.get()
+
+        def call() -> Any:
+            response = self.breaker.call(lambda: self._call_recorded(messages))
+            _add_usage(response, usage)
+            return response
+
+        return _get_singleflight().do(self._request_key(messages), call)
+
+    def _record(self, messages: List[Any], response: Any, latency: float) -> None:
+        """Append the exchange to ``LLM_RECORD_FILE`` when recording is enabled."""
+        recorder = get_recorder()
+        if recorder is None:
+            return
+        try:
+            recorder.record(messages, response, latency, self.model)
+        except OSError:
+            logger.warning("Could not record LLM exchange", exc_info=True)
+
+    def _call_recorded(self, messages: List[Any]) -> Any:
+        """Call the upstream and record the exchange."""
+        start = time.monotonic()
+        response = self._invoke(messages)
+        self._record(messages, response, time.monotonic() - start)
+        return response
+
+    async def _acall_recorded(self, messages: List[Any]) -> Any:
+        """Async variant of ``_call_recorded``."""
+        start = time.monotonic()
+        response = await self._get_client().ainvoke(messages)
+        self._record(messages, response, time.monotonic() - start)
+        return response
+
+    def _invoke(self, messages: List[Any]) -> Any:
         """
         Invoke the LLM with fallback to async if sync client unavailable.
 
@@ -52,4 +261,26 @@ class LLMClient:
             logger.info("Sync client unavailable, invoking async model")
             if not hasattr(client, "ainvoke"):
                 raise
-            return asyncio.run(client.ainvoke(messages))
+            return _run_sync(client.ainvoke(messages))
+
+    async def ainvoke(self, messages: List[Any]) -> Any:
+        """
+        Invoke the LLM natively asynchronously.
+
+        Args:
+            messages: List of LangChain message objects.
+
+        Returns:
+            The LLM response object.
+
+        Raises:
+            CircuitOpenError: If the upstream's circuit is open.
+        """
+        usage = _usage.get()
+
+        async def call() -> Any:
+            response = await self.breaker.acall(lambda: self._acall_recorded(messages))
+            _add_usage(response, usage)
+            return response
+
+        return await _get_singleflight().ado(self._request_key(messages), call)
@@ -0,0 +1,202 @@
+"""Memory accounting of the serving process per component."""
+
+import logging
+import os
+import resource
+import sys
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MB = 2**20
+
+
+def megabytes(name: str, default: float) -> Optional[int]:
+    """
+    Read a memory budget in MB from the environment.
+
+    Args:
+        name: Variable name.
+        default: Budget in MB when the variable is unset.
+
+    Returns:
+        Budget in bytes, or None if the budget is 0 (unlimited).
+    """
+    value = float(os.getenv(name, str(default)))
+    return int(value * MB) if value > 0 else None
+
+
+def deep_sizeof(obj: Any) -> int:
+    """
+    Estimate the memory held by an object and everything it references.
+
+    Containers, instance dictionaries and numpy buffers are followed; shared
+    objects are counted once.
+
+    Args:
+        obj: Object to measure.
+
+    Returns:
+        Size in bytes.
+    """
+    seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        if isinstance(current, np.ndarray):
+            # Views do not own their buffer; count the base once
+            size += sys.getsizeof(current)
+            if current.base is not None:
+                stack.append(current.base)
+            continue
+        size += sys.getsizeof(current)
+        if isinstance(current, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        elif hasattr(current, "__dict__") and not isinstance(current, type):
+            stack.append(vars(current))
+    return size
+
+
+def process_rss() -> Dict[str, Optional[int]]:
+    """
+    Return the resident set size of this process.
+
+    Returns:
+        Dictionary with current (Linux only, else None) and peak RSS in bytes.
+    """
+    current = None
+    try:
+        with open("/proc/self/statm") as file:
+            current = int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = peak if sys.platform == "darwin" else peak * 1024
+    return {"rss_bytes": current, "peak_rss_bytes": peak}
+
+
+def embedding_model_memory(embedding: Any) -> Dict[str, Any]:
+    """
+    Estimate the memory of an embedding model's weights.
+
+    Wrappers (caching, micro-batching) are unwrapped through their
+    ``embedding`` attribute.
+
+    Args:
+        embedding: Embedding model as returned by ``get_embedding``.
+
+    Returns:
+        Dictionary with ``bytes`` and the model ``type``.
+    """
+    while hasattr(embedding, "embedding"):
+        embedding = embedding.embedding
+    result = {"type": type(embedding).__name__, "bytes": 0}
+    client = getattr(embedding, "_client", None)
+    if client is not None and hasattr(client, "parameters"):
+        tensors = list(client.parameters()) + list(client.buffers())
+        result["bytes"] = sum(t.numel() * t.element_size() for t in tensors)
+    elif hasattr(embedding, "session"):
+        # ONNX Runtime keeps the initializers of the model file in memory
+        path = getattr(embedding.session, "_model_path", None)
+        if path and os.path.exists(path):
+            result["bytes"] = os.path.getsize(path)
+    return result
+
+
+def vector_index_memory(path: Optional[str]) -> Dict[str, Any]:
+    """
+    Estimate the memory of a Chroma store from its files.
+
+    HNSW segments (``*.bin``) are loaded completely once searched; the
+    SQLite file is paged in on demand and reported separately.
+
+    Args:
+        path: Directory of the vector store snapshot.
+
+    Returns:
+        Dictionary with HNSW ``bytes`` and ``sqlite_bytes``.
+    """
+    hnsw = 0
+    sqlite = 0
+    for root, _, names in os.walk(path or ""):
+        for name in names:
+            size = os.path.getsize(os.path.join(root, name))
+            if name.endswith(".bin"):
+                hnsw += size
+            elif name.endswith(".sqlite3"):
+                sqlite += size
+    return {"bytes": hnsw, "sqlite_bytes": sqlite}
+
+
+class MemoryRegistry:
+    """
+    Components that report their memory, and a report over all of them.
+
+    Each component is a callable returning a dictionary with at least
+    ``bytes``; caches add their ``max_bytes`` budget and entry counts.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self._components: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, probe: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Add or replace a component.
+
+        Args:
+            name: Component name in the report.
+            probe: Callable returning the component's memory dictionary.
+        """
+        with self._lock:
+            self._components[name] = probe
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Measure all components.
+
+        Returns:
+            Dictionary with process RSS, per-component figures, their sum
+            and the part of the RSS no component accounts for.
+        """
+        with self._lock:
+            components = dict(self._components)
+        report = process_rss()
+        report["components"] = {}
+        for name, probe in components.items():
+            try:
+                report["components"][name] = probe()
+            except Exception as e:
+                logger.warning("Memory probe %s failed: %s", name, e)
+                report["components"][name] = {"bytes": 0, "error": str(e)}
+        accounted = sum(c.get("bytes", 0) for c in report["components"].values())
+        report["accounted_bytes"] = accounted
+        if report["rss_bytes"] is not None:
+            report["unaccounted_bytes"] = report["rss_bytes"] - accounted
+        return report
+
+
+_registry = None
+
+
+def get_memory_registry() -> MemoryRegistry:
+    """Return the process-wide memory registry."""
+    global _registry
+    if _registry is None:
+        _registry = MemoryRegistry()
+    return _registry
@@ -0,0 +1,183 @@
+"""Ingest-time normalization of module metadata into typed columns."""
+
+import argparse
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from recog_ai.utils import collect_programs, distance_to_similarity, workload_hours
+
+logger = logging.getLogger(__name__)
+
+# Normalized columns stored alongside the original metadata in the vector store
+TITLE_KEY = "norm_title"
+CREDITS_KEY = "norm_credits"
+WORKLOAD_HOURS_KEY = "norm_workload_hours"
+WORKLOAD_ESTIMATED_KEY = "norm_workload_estimated"
+PROGRAMS_KEY = "norm_programs"
+INSTITUTION_KEY = "norm_institution"
+CARD_KEY = "card_json"
+
+
+def format_workload(hours: Optional[int], estimated: bool) -> str:
+    """
+    Format workload hours the way suggestion cards display them.
+
+    Args:
+        hours: Workload in hours or None if unknown.
+        estimated: Whether the hours were estimated from credits.
+
+    Returns:
+        Formatted workload string (e.g., "90 Stunden", "~150 Stunden") or "".
+    """
+    if hours is None:
+        return ""
+    return ("~" if estimated else "") + str(hours) + " Stunden"
+
+
+def _card(metadata: Dict[str, Any], page_content: str, workload: str, program: str):
+    """Suggestion card as rendered in the module suggestions template."""
+    return {
+        "title": metadata.get("title") or metadata.get("name") or "",
+        "credits": metadata.get("credits"),
+        "workload": workload,
+        "description": metadata.get("description")
+        or metadata.get("learning_outcomes")
+        or "",
+        "level": metadata.get("level"),
+        "program": program,
+        "institution": metadata.get("institution"),
+        "content": page_content,
+    }
+
+
+def normalize_metadata(metadata: Dict[str, Any], page_content: str) -> Dict[str, Any]:
+    """
+    Compute the normalized columns for one module.
+
+    Args:
+        metadata: Original module metadata.
+        page_content: Indexed module text.
+
+    Returns:
+        Dictionary of normalized columns. Unknown values are omitted because
+        Chroma metadata cannot hold None.
+    """
+    hours, estimated = workload_hours(metadata)
+    program = collect_programs(metadata)
+    card = _card(metadata, page_content, format_workload(hours, estimated), program)
+
+    columns = {
+        TITLE_KEY: card["title"],
+        WORKLOAD_ESTIMATED_KEY: estimated,
+        # Chroma metadata cannot hold lists, so programs are stored joined
+        PROGRAMS_KEY: program,
+        CARD_KEY: json.dumps(card),
+    }
+    if hours is not None:
+        columns[WORKLOAD_HOURS_KEY] = hours
+    try:
+        columns[CREDITS_KEY] = float(metadata.get("credits"))
+    except (TypeError, ValueError):
+        pass
+    institution = metadata.get("institution")
+    if institution:
+        columns[INSTITUTION_KEY] = institution.strip().lower()
+    return columns
+
+
+def build_suggestions(
+    hits: Iterable[Tuple[Any, float]], institution: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Assemble suggestion cards from search hits.
+
+    Hits carrying precomputed columns are assembled without parsing; hits from
+    stores that were indexed before normalization are normalized on the fly.
+
+    Args:
+        hits: (document, score) pairs from the vector store.
+        institution: Optional institution filter ("all" disables filtering).
+
+    Returns:
+        List of module suggestion dictionaries with a serialized ``json`` card,
+        the vector store ``id`` and the cosine ``similarity`` to the query.
+    """
+    wanted = None
+    if institution and institution.lower() != "all":
+        wanted = institution.strip().lower()
+
+    suggestions = []
+    for module, score in hits:
+        metadata = module.metadata
+        if CARD_KEY not in metadata:
+            metadata = {**metadata, **normalize_metadata(metadata, module.page_content)}
+
+        module_institution = metadata.get(INSTITUTION_KEY)
+        if wanted and module_institution and module_institution != wanted:
+            continue
+
+        suggestion = _card(
+            metadata,
+            module.page_content,
+            format_workload(
+                metadata.get(WORKLOAD_HOURS_KEY), metadata[WORKLOAD_ESTIMATED_KEY]
+            ),
+            metadata[PROGRAMS_KEY],
+        )
+        suggestion["json"] = metadata[CARD_KEY]
+        suggestion["id"] = getattr(module, "id", None)
+        suggestion["similarity"] = round(distance_to_similarity(score), 4)
+        suggestions.append(suggestion)
+    return suggestions
+
+
+def backfill_normalized_columns(moduledb: Any, batch_size: int = 256) -> int:
+    """
+    Add normalized columns to documents indexed without them.
+
+    Only metadata is updated; embeddings are left untouched.
+
+    Args:
+        moduledb: Chroma vector database instance.
+        batch_size: Number of documents updated per call.
+
+    Returns:
+        Number of updated documents.
+    """
+    stored = moduledb.get(include=["metadatas", "documents"])
+    ids, metadatas = [], []
+    for doc_id, metadata, content in zip(
+        stored["ids"], stored["metadatas"], stored["documents"]
+    ):
+        metadata = metadata or {}
+        if CARD_KEY in metadata:
+            continue
+        ids.append(doc_id)
+        metadatas.append({**metadata, **normalize_metadata(metadata, content or "")})
+
+    for start in range(0, len(ids), batch_size):
+        moduledb._collection.update(
+            ids=ids[start : start + batch_size],
+            metadatas=metadatas[start : start + batch_size],
+        )
+    logger.info("Backfilled normalized columns for %d modules", len(ids))
+    return len(ids)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point: ``python -m recog_ai.normalize``."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectorstore", help="Vector store root directory")
+    args = parser.parse_args(argv)
+
+    from recog_ai.config import get_embedding
+    from recog_ai.sync import update_snapshot
+
+    # Written to a new snapshot; serving processes swap to it atomically
+    print(update_snapshot(backfill_normalized_columns, get_embedding(), args.vectorstore))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,305 @@
+"""Index of confirmed recognition decisions for known external modules."""
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from recog_ai.audit import module_key
+from recog_ai.cache import normalize_document, overlap, shingles
+
+logger = logging.getLogger(__name__)
+
+
+def default_precedent_path() -> str:
+    """Return the location of the precedent database (env ``PRECEDENT_DB``)."""
+    return os.getenv("PRECEDENT_DB") or os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "data", "precedents.sqlite3"
+    )
+
+
+def fingerprint(document: str) -> str:
+    """
+    Fingerprint of an external module description.
+
+    Documents that only differ in whitespace, case or page headers share a
+    fingerprint (see ``normalize_document``).
+
+    Args:
+        document: Raw module description.
+
+    Returns:
+        Hex digest.
+    """
+    return hashlib.sha256(normalize_document(document).encode("utf-8")).hexdigest()
+
+
+class PrecedentIndex:
+    """
+    Confirmed (external module → internal module, verdict) decisions.
+
+    Decisions are persisted in SQLite and held in memory as a dictionary by
+    fingerprint plus an embedding matrix with one row per external module, so
+    a lookup is a hash probe or a single matrix product. As in
+    ``SemanticCache``, a similar document must also share ``min_overlap`` of
+    its word n-grams, since modules written from one template embed almost
+    identically. Other processes' confirmations are picked up on the next
+    lookup.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        embed_fn: Callable[[str], List[float]],
+        threshold: float = 0.95,
+        max_results: int = 5,
+        min_overlap: float = 0.8,
+    ) -> None:
+        """
+        Initialize the index and create its table if needed.
+
+        Args:
+            path: SQLite database file.
+            embed_fn: Function embedding a text into a vector.
+            threshold: Minimum cosine similarity for a similar-document match.
+            max_results: Maximum number of precedents returned.
+            min_overlap: Minimum Jaccard overlap of word 3-grams for a
+                similar-document match.
+        """
+        self.path = path
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_results = max_results
+        self.min_overlap = min_overlap
+        self._lock = threading.Lock()
+        self._by_fingerprint = {}
+        self._vectors = {}
+        self._shingles = {}
+        self._matrix = None
+        self._matrix_keys = []
+        self._version = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS precedents ("
+                "fingerprint TEXT NOT NULL, module_key TEXT NOT NULL, "
+                "embedding BLOB NOT NULL, external_module TEXT NOT NULL, "
+                "module_title TEXT, module_json TEXT NOT NULL, verdict TEXT NOT NULL, "
+                "result TEXT, confirmations INTEGER NOT NULL, confirmed_at REAL NOT NULL, "
+                "shingles BLOB, PRIMARY KEY (fingerprint, module_key))"
+            )
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(precedents)")]
+            if "shingles" not in columns:
+                # Rows confirmed before only match exactly
+                connection.execute("ALTER TABLE precedents ADD COLUMN shingles BLOB")
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Open a connection for one operation, committed and closed afterwards.
+
+        One connection per operation keeps the index thread-safe.
+        """
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _embed(self, document: str) -> np.ndarray:
+        """Embed and L2-normalize a normalized document."""
+        vector = np.asarray(self.embed_fn(normalize_document(document)), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _refresh(self) -> None:
+        """Reload the in-memory index if the table changed (caller holds the lock)."""
+        with self._connect() as connection:
+            version = connection.execute(
+                "SELECT COUNT(*), MAX(confirmed_at), SUM(confirmations) FROM precedents"
+            ).fetchone()
+            if version == self._version:
+                return
+            rows = connection.execute(
+                "SELECT fingerprint, module_key, embedding, external_module, module_title, "
+                "module_json, verdict, result, confirmations, confirmed_at, shingles "
+                "FROM precedents"
+            ).fetchall()
+        by_fingerprint = {}
+        vectors = {}
+        grams = {}
+        for row in rows:
+            by_fingerprint.setdefault(row[0], []).append(
+                {
+                    "module_key": row[1],
+                    "external_module": json.loads(row[3]),
+                    "module_title": row[4],
+                    "module_json": row[5],
+                    "verdict": row[6],
+                    "result": row[7],
+                    "confirmations": row[8],
+                    "confirmed_at": row[9],
+                }
+            )
+            vectors[row[0]] = np.frombuffer(row[2], dtype=np.float32)
+            if row[10] is not None:
+                grams[row[0]] = np.frombuffer(row[10], dtype=np.uint64)
+        self._by_fingerprint = by_fingerprint
+        self._vectors = vectors
+        self._shingles = grams
+        self._matrix = None
+        self._version = version
+
+    def _index(self):
+        """Return the (lazily rebuilt) embedding matrix and its fingerprints."""
+        if self._matrix is None:
+            self._matrix_keys = list(self._vectors)
+            if self._matrix_keys:
+                self._matrix = np.stack([self._vectors[key] for key in self._matrix_keys])
+            else:
+                self._matrix = np.empty((0, 0), dtype=np.float32)
+        return self._matrix, self._matrix_keys
+
+    def confirm(
+        self,
+        document: str,
+        external_module: Dict[str, Any],
+        internal_module_json: str,
+        verdict: str,
+        result: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Record a confirmed decision, counting repeated confirmations.
+
+        Args:
+            document: Raw external module description.
+            external_module: Extracted external module, reused on exact matches.
+            internal_module_json: Card of the internal module (suggestion ``json``).
+            verdict: One of the VERDICTS keys.
+            result: Examination result shown to staff, if any.
+
+        Returns:
+            The stored precedent.
+        """
+        key = module_key(internal_module_json)
+        try:
+            title = json.loads(internal_module_json).get("title")
+        except (ValueError, AttributeError):
+            title = None
+        stored_module = {
+            k: v for k, v in external_module.items() if k not in ("original_doc", "raw_document")
+        }
+        vector = self._embed(document)
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO precedents (fingerprint, module_key, embedding, external_module, "
+                "module_title, module_json, verdict, result, confirmations, confirmed_at, "
+                "shingles) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT (fingerprint, module_key) DO UPDATE SET "
+                "verdict = excluded.verdict, result = COALESCE(excluded.result, result), "
+                "external_module = excluded.external_module, shingles = excluded.shingles, "
+                "confirmations = confirmations + 1, confirmed_at = excluded.confirmed_at",
+                (
+                    fingerprint(document),
+                    key,
+                    vector.tobytes(),
+                    json.dumps(stored_module, ensure_ascii=False),
+                    title,
+                    internal_module_json,
+                    verdict,
+                    result,
+                    time.time(),
+                    shingles(normalize_document(document)).tobytes(),
+                ),
+            )
+        logger.info("Confirmed precedent %s → %s (%s)", stored_module.get("title"), title, verdict)
+        return {"module_key": key, "module_title": title, "verdict": verdict}
+
+    def match(self, document: str) -> List[Dict[str, Any]]:
+        """
+        Return confirmed decisions for a document or near-duplicates of it.
+
+        An exact fingerprint match is answered without embedding; otherwise
+        documents with a cosine similarity of at least ``threshold`` that
+        share ``min_overlap`` of their word 3-grams match.
+
+        Args:
+            document: Raw external module description.
+
+        Returns:
+            Precedents (copies) with ``match`` ("exact" or "similar") and
+            ``similarity``, best first and one per internal module.
+        """
+        key = fingerprint(document)
+        with self._lock:
+            self._refresh()
+            if not self._by_fingerprint:
+                return []
+            if key in self._by_fingerprint:
+                hits = [(1.0, "exact", p) for p in self._by_fingerprint[key]]
+            else:
+                hits = None
+        if hits is None:
+            vector = self._embed(document)
+            grams = shingles(normalize_document(document))
+            with self._lock:
+                matrix, keys = self._index()
+                hits = []
+                if len(keys) and matrix.shape[1] == vector.shape[0]:
+                    similarities = matrix @ vector
+                    for position in np.argsort(-similarities):
+                        if similarities[position] < self.threshold:
+                            break
+                        stored = self._shingles.get(keys[position])
+                        if stored is None or overlap(grams, stored) < self.min_overlap:
+                            continue
+                        hits.extend(
+                            (float(similarities[position]), "similar", p)
+                            for p in self._by_fingerprint[keys[position]]
+                        )
+
+        hits.sort(key=lambda hit: (-hit[0], -hit[2]["confirmations"]))
+        precedents = {}
+        for similarity, kind, precedent in hits:
+            if precedent["module_key"] not in precedents:
+                precedents[precedent["module_key"]] = {
+                    **precedent,
+                    "external_module": dict(precedent["external_module"]),
+                    "match": kind,
+                    "similarity": similarity,
+                }
+        return list(precedents.values())[: self.max_results]
+
+
+_precedent_index = None
+
+
+def get_precedent_index(embed_fn: Callable[[str], List[float]]) -> Optional[PrecedentIndex]:
+    """
+    Return the process-wide precedent index, or None if ``PRECEDENTS=0``.
+
+    ``PRECEDENT_DB`` sets the SQLite file, ``PRECEDENT_THRESHOLD`` the
+    similarity and ``PRECEDENT_MIN_OVERLAP`` the word 3-gram overlap needed
+    for a near-duplicate match.
+    """
+    global _precedent_index
+    if os.getenv("PRECEDENTS", "1") == "0":
+        return None
+    if _precedent_index is None:
+        _precedent_index = PrecedentIndex(
+            default_precedent_path(),
+            embed_fn,
+            threshold=float(os.getenv("PRECEDENT_THRESHOLD", "0.95")),
+            min_overlap=float(os.getenv("PRECEDENT_MIN_OVERLAP", "0.8")),
+        )
+    return _precedent_index
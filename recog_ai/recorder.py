@@ -0,0 +1,135 @@
+"""Recording of LLM exchanges for replay by the load-test stub server."""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# LangChain message types mapped to OpenAI chat roles
+ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+def message_pairs(messages: Iterable[Any]) -> List[Tuple[str, str]]:
+    """
+    Convert LangChain messages to (role, content) pairs.
+
+    Args:
+        messages: LangChain message objects.
+
+    Returns:
+        List of (OpenAI role, content) tuples.
+    """
+    pairs = []
+    for message in messages:
+        kind = getattr(message, "type", "human")
+        pairs.append((ROLES.get(kind, kind), str(message.content)))
+    return pairs
+
+
+def exchange_key(pairs: Sequence[Tuple[str, str]]) -> str:
+    """
+    Identity of a request independent of model and endpoint.
+
+    Args:
+        pairs: (role, content) pairs as sent to the chat endpoint.
+
+    Returns:
+        Hex digest used to look up a recorded response.
+    """
+    payload = json.dumps([list(pair) for pair in pairs], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def prompt_key(pairs: Sequence[Tuple[str, str]]) -> str:
+    """
+    Identity of the system prompt, grouping requests of the same task.
+
+    Args:
+        pairs: (role, content) pairs as sent to the chat endpoint.
+
+    Returns:
+        Hex digest of the first system message (empty if there is none).
+    """
+    system = next((content for role, content in pairs if role == "system"), "")
+    return hashlib.sha256(system.encode("utf-8")).hexdigest()
+
+
+class ExchangeRecorder:
+    """Append LLM requests and responses to a JSONL file, one per line."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Initialize the recorder.
+
+        Args:
+            path: JSONL file the exchanges are appended to.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(
+        self, messages: Iterable[Any], response: Any, latency: float, model: str
+    ) -> Dict[str, Any]:
+        """
+        Append one exchange.
+
+        Args:
+            messages: LangChain messages that were sent.
+            response: Response message returned by the model.
+            latency: Seconds the upstream call took.
+            model: Model name.
+
+        Returns:
+            The recorded entry.
+        """
+        pairs = message_pairs(messages)
+        usage = getattr(response, "usage_metadata", None) or {}
+        entry = {
+            "key": exchange_key(pairs),
+            "prompt_key": prompt_key(pairs),
+            "model": model,
+            "messages": [{"role": role, "content": content} for role, content in pairs],
+            "response": str(getattr(response, "content", response)),
+            "latency": round(latency, 3),
+            "output_tokens": usage.get("output_tokens"),
+            "recorded_at": time.time(),
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+        return entry
+
+
+def load_exchanges(path: str) -> List[Dict[str, Any]]:
+    """
+    Read recorded exchanges.
+
+    Args:
+        path: JSONL file written by ``ExchangeRecorder``.
+
+    Returns:
+        List of recorded entries.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+_recorder = None
+
+
+def get_recorder() -> Optional[ExchangeRecorder]:
+    """Return the recorder configured by ``LLM_RECORD_FILE``, if any."""
+    global _recorder
+    path = os.getenv("LLM_RECORD_FILE")
+    if not path:
+        return None
+    if _recorder is None or _recorder.path != path:
+        logger.info("Recording LLM exchanges to %s", path)
+        _recorder = ExchangeRecorder(path)
+    return _recorder
@@ -0,0 +1,238 @@
+"""Retrieval depth policy: over-fetch, similarity cut-offs and early stopping."""
+
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from recog_ai.normalize import build_suggestions
+
+logger = logging.getLogger(__name__)
+
+# Reasons a retrieval returned fewer candidates than the store could supply
+TRUNCATED_LIMIT = "limit"
+TRUNCATED_MIN_SIMILARITY = "min_similarity"
+TRUNCATED_SCORE_GAP = "score_gap"
+TRUNCATED_LATENCY_BUDGET = "latency_budget"
+TRUNCATED_EXHAUSTED = "exhausted"
+
+
+@dataclass
+class Retrieval:
+    """Suggestions of one query with the scores and why the list ends."""
+
+    suggestions: List[Dict[str, Any]]
+    truncated: Optional[str] = None
+    fetched: int = 0
+    rounds: int = 0
+    elapsed_ms: float = 0.0
+    scores: List[float] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Summary without the suggestions, e.g. for templates and logs."""
+        return {
+            "scores": self.scores,
+            "truncated": self.truncated,
+            "fetched": self.fetched,
+            "rounds": self.rounds,
+            "elapsed_ms": round(self.elapsed_ms, 1),
+        }
+
+
+def filter_active(institution: Optional[str]) -> bool:
+    """Whether suggestions are restricted to one institution."""
+    return bool(institution) and institution.lower() != "all"
+
+
+class RetrievalPolicy:
+    """
+    Decide how deep to search and where to cut the candidate list.
+
+    Institution filters are applied to search hits, so a filtered query
+    fetches more hits than it returns. The factor adapts per filter to the
+    share of hits that passed it recently. Candidates below
+    ``min_similarity`` are dropped, and a drop of at least ``score_gap``
+    between neighbours ends the list early when there is a clear winner.
+    Refetching stops once ``latency_budget`` is spent.
+    """
+
+    def __init__(
+        self,
+        limit: int = 5,
+        overfetch: float = 3.0,
+        max_fetch: int = 50,
+        min_similarity: float = 0.0,
+        score_gap: float = 0.0,
+        min_results: int = 1,
+        latency_budget: Optional[float] = None,
+    ) -> None:
+        """
+        Initialize the policy.
+
+        Args:
+            limit: Maximum number of candidates returned.
+            overfetch: Initial fetch factor for filtered queries.
+            max_fetch: Maximum hits fetched in one search.
+            min_similarity: Cosine similarity below which candidates are
+                dropped (0 disables the cut-off).
+            score_gap: Similarity drop between neighbours that ends the list
+                (0 disables early stopping).
+            min_results: Candidates always kept before a score gap applies.
+            latency_budget: Seconds after which no further search round is
+                started (None for no budget).
+        """
+        self.limit = limit
+        self.overfetch = max(1.0, overfetch)
+        self.max_fetch = max(limit, max_fetch)
+        self.min_similarity = min_similarity
+        self.score_gap = score_gap
+        self.min_results = max(1, min_results)
+        self.latency_budget = latency_budget
+        self._pass_rates: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "RetrievalPolicy":
+        """Create a policy configured through ``RETRIEVAL_*`` variables."""
+        budget = os.getenv("RETRIEVAL_LATENCY_BUDGET")
+        return cls(
+            limit=int(os.getenv("RETRIEVAL_LIMIT", "5")),
+            overfetch=float(os.getenv("RETRIEVAL_OVERFETCH", "3")),
+            max_fetch=int(os.getenv("RETRIEVAL_MAX_FETCH", "50")),
+            min_similarity=float(os.getenv("RETRIEVAL_MIN_SIMILARITY", "0")),
+            score_gap=float(os.getenv("RETRIEVAL_SCORE_GAP", "0")),
+            min_results=int(os.getenv("RETRIEVAL_MIN_RESULTS", "1")),
+            latency_budget=float(budget) if budget else None,
+        )
+
+    def fetch_size(self, institution: Optional[str], limit: int) -> int:
+        """
+        Number of hits to request for a query.
+
+        Args:
+            institution: Institution filter of the query.
+            limit: Candidates wanted.
+
+        Returns:
+            Hits to fetch in the first search round.
+        """
+        if not filter_active(institution):
+            return limit
+        with self._lock:
+            rate = self._pass_rates.get(institution.strip().lower(), 1 / self.overfetch)
+        return min(self.max_fetch, max(limit, math.ceil(limit / max(rate, 0.01))))
+
+    def _observe(self, institution: str, hits: int, passed: int) -> None:
+        """Update the moving share of hits that pass an institution filter."""
+        if not hits:
+            return
+        key = institution.strip().lower()
+        with self._lock:
+            previous = self._pass_rates.get(key)
+            rate = passed / hits
+            self._pass_rates[key] = rate if previous is None else 0.7 * previous + 0.3 * rate
+
+    def cut(self, scores: List[float], limit: int) -> Tuple[int, Optional[str]]:
+        """
+        Apply similarity cut-off, score gap and limit to ranked scores.
+
+        Args:
+            scores: Similarities, best first.
+            limit: Maximum number of candidates.
+
+        Returns:
+            (number of candidates kept, truncation reason or None).
+        """
+        keep = len(scores)
+        reason = None
+        if self.min_similarity > 0:
+            above = sum(1 for score in scores if score >= self.min_similarity)
+            if above < keep:
+                keep, reason = above, TRUNCATED_MIN_SIMILARITY
+        if self.score_gap > 0:
+            for position in range(self.min_results, min(keep, limit)):
+                if scores[position - 1] - scores[position] >= self.score_gap:
+                    keep, reason = position, TRUNCATED_SCORE_GAP
+                    break
+        if keep > limit:
+            keep, reason = limit, TRUNCATED_LIMIT
+        return keep, reason
+
+    def retrieve(
+        self,
+        db: Any,
+        query: str,
+        institution: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Retrieval:
+        """
+        Search ``db`` and return the candidates the policy admits.
+
+        Args:
+            db: Vector store (or index) with ``similarity_search_with_score``.
+            query: Query text.
+            institution: Optional institution filter ("all" disables it).
+            limit: Maximum candidates (default: the policy's limit).
+
+        Returns:
+            Retrieval with suggestion cards, each with its ``similarity``.
+        """
+        limit = limit or self.limit
+        start = time.perf_counter()
+        fetch = self.fetch_size(institution, limit)
+        rounds = 0
+        budget_spent = False
+        while True:
+            hits = db.similarity_search_with_score(query, fetch)
+            rounds += 1
+            suggestions = build_suggestions(hits, institution)
+            exhausted = len(hits) < fetch
+            if (
+                not filter_active(institution)
+                or len(suggestions) >= limit
+                or exhausted
+                or fetch >= self.max_fetch
+            ):
+                break
+            if (
+                self.latency_budget is not None
+                and time.perf_counter() - start >= self.latency_budget
+            ):
+                budget_spent = True
+                break
+            # Too few hits passed the filter: fetch deeper, sized by the
+            # pass rate observed in this round
+            rate = len(suggestions) / len(hits) if hits else 0
+            wanted = math.ceil(limit / rate) if rate else fetch * self.overfetch
+            fetch = min(self.max_fetch, max(fetch * 2, int(wanted)))
+        if filter_active(institution):
+            self._observe(institution, len(hits), len(suggestions))
+
+        scores = [suggestion["similarity"] for suggestion in suggestions]
+        keep, reason = self.cut(scores, limit)
+        if reason is None and keep < limit:
+            reason = TRUNCATED_LATENCY_BUDGET if budget_spent else TRUNCATED_EXHAUSTED
+        retrieval = Retrieval(
+            suggestions=suggestions[:keep],
+            truncated=reason,
+            fetched=len(hits),
+            rounds=rounds,
+            elapsed_ms=(time.perf_counter() - start) * 1000,
+            scores=scores[:keep],
+        )
+        logger.debug("Retrieval: %s", retrieval.as_dict())
+        return retrieval
+
+
+_policy = None
+
+
+def get_retrieval_policy() -> RetrievalPolicy:
+    """Return the process-wide policy, so filter pass rates are shared."""
+    global _policy
+    if _policy is None:
+        _policy = RetrievalPolicy.from_env()
+    return _policy
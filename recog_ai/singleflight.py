@@ -0,0 +1,303 @@
+"""Single-flight deduplication of identical concurrent calls."""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from typing import IO, Any, Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Marks the absence of a reusable result file
+_MISSING = object()
+
+# Seconds result files are kept for processes that waited for them
+RESULT_GRACE = 60.0
+
+
+class _Call:
+    """State of an in-flight call shared between waiters."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _AsyncCall:
+    """An in-flight coroutine call and the number of callers awaiting it."""
+
+    def __init__(self, future: concurrent.futures.Future) -> None:
+        self.future = future
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution.
+
+    Within a process, threads calling ``do`` with the same key while a call is
+    in flight wait for it and share its result; ``ado`` does the same for
+    coroutines on any event loop of the process. With ``lock_dir`` set, the
+    leader additionally holds an exclusive lock file so leaders in other worker
+    processes wait and reuse the result it wrote while they waited.
+    """
+
+    def __init__(
+        self,
+        lock_dir: Optional[str] = None,
+        result_ttl: float = 0.0,
+        dumps: Optional[Callable[[Any], str]] = None,
+        loads: Optional[Callable[[str], Any]] = None,
+    ) -> None:
+        """
+        Initialize the coalescer.
+
+        Args:
+            lock_dir: Directory for cross-process lock and result files;
+                None coalesces within this process only.
+            result_ttl: Seconds a finished result of another process is also
+                reused by calls that started after it (a short result cache);
+                0 only shares results with calls that waited for them.
+            dumps: Serializer for results shared across processes.
+            loads: Deserializer for results shared across processes.
+        """
+        if lock_dir and fcntl is None:
+            logger.warning("File locking unavailable, coalescing within process only")
+            lock_dir = None
+        if lock_dir and not (dumps and loads):
+            raise ValueError("Cross-process coalescing requires dumps and loads")
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+        self.lock_dir = lock_dir
+        self.result_ttl = result_ttl
+        self.dumps = dumps
+        self.loads = loads
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        # Shared by all event loops: Flask runs each async view on its own loop
+        self._async_calls: Dict[str, _AsyncCall] = {}
+        self._loop = None
+        self._loop_pid = None
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run ``fn`` once for all concurrent callers with the same key.
+
+        Args:
+            key: Identity of the call.
+            fn: Function producing the result.
+
+        Returns:
+            The (shared) result of ``fn``.
+
+        Raises:
+            Exception: Whatever ``fn`` raised, re-raised for every waiter.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            logger.debug("Joining in-flight call %s", key[:12])
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.lock_dir:
+                call.result = self._run_locked(key, fn)
+            else:
+                call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        """Return the lock and result file paths of a key."""
+        return (
+            os.path.join(self.lock_dir, key + ".lock"),
+            os.path.join(self.lock_dir, key + ".result"),
+        )
+
+    @staticmethod
+    def _acquire(lock_path: str) -> IO[str]:
+        """
+        Open and exclusively lock ``lock_path`` (blocking).
+
+        Holders unlink the file before unlocking, so a lock taken on a file
+        that no longer is the one at ``lock_path`` is retried.
+        """
+        while True:
+            lock_file = open(lock_path, "a")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                    return lock_file
+            except FileNotFoundError:
+                pass
+            lock_file.close()
+
+    @staticmethod
+    def _release(lock_path: str, lock_file: IO[str]) -> None:
+        """Remove the lock file, then unlock it."""
+        try:
+            os.unlink(lock_path)
+        except FileNotFoundError:
+            pass
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+    def _read_result(self, result_path: str, since: float) -> Any:
+        """
+        Return a result of another process, else ``_MISSING``.
+
+        A result is used if it was written after ``since`` (while this call
+        waited for the lock) or less than ``result_ttl`` seconds ago.
+        """
+        try:
+            written = os.path.getmtime(result_path)
+            if written >= since or time.time() - written < self.result_ttl:
+                with open(result_path, "r", encoding="utf-8") as file:
+                    return self.loads(file.read())
+        except FileNotFoundError:
+            pass
+        return _MISSING
+
+    def _write_result(self, result_path: str, result: Any) -> None:
+        """Atomically write a result for other processes."""
+        tmp_path = result_path + ".%d.%d.tmp" % (os.getpid(), threading.get_ident())
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(self.dumps(result))
+        os.replace(tmp_path, result_path)
+
+    def _run_locked(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run ``fn`` under a cross-process lock, reusing a result written meanwhile."""
+        lock_path, result_path = self._paths(key)
+        since = time.time()
+        lock_file = self._acquire(lock_path)
+        try:
+            result = self._read_result(result_path, since)
+            if result is not _MISSING:
+                logger.debug("Reusing result of other process %s", key[:12])
+                return result
+            result = fn()
+            self._write_result(result_path, result)
+            return result
+        finally:
+            self._release(lock_path, lock_file)
+            self._prune()
+
+    async def _arun_locked(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of ``_run_locked``; waiting for the lock blocks a thread."""
+        lock_path, result_path = self._paths(key)
+        since = time.time()
+        lock_file = await asyncio.to_thread(self._acquire, lock_path)
+        try:
+            result = self._read_result(result_path, since)
+            if result is not _MISSING:
+                logger.debug("Reusing result of other process %s", key[:12])
+                return result
+            result = await fn()
+            self._write_result(result_path, result)
+            return result
+        finally:
+            self._release(lock_path, lock_file)
+            self._prune()
+
+    def _prune(self) -> None:
+        """Remove result files no call can reuse any more."""
+        # Waiters read a result right after the leader unlocks
+        keep = max(self.result_ttl, RESULT_GRACE)
+        now = time.time()
+        for name in os.listdir(self.lock_dir):
+            if not name.endswith(".result"):
+                continue
+            path = os.path.join(self.lock_dir, name)
+            try:
+                if now - os.path.getmtime(path) > keep:
+                    os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        """Return the loop running shared coroutine calls (caller holds the lock)."""
+        if self._loop is None or self._loop_pid != os.getpid():
+            self._loop = asyncio.new_event_loop()
+            self._loop_pid = os.getpid()
+            threading.Thread(
+                target=self._loop.run_forever, name="singleflight", daemon=True
+            ).start()
+        return self._loop
+
+    async def _arun(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Execute a shared call on the background loop."""
+        if self.lock_dir:
+            return await self._arun_locked(key, fn)
+        return await fn()
+
+    def _finish(self, key: str, call: _AsyncCall) -> None:
+        """Forget a finished call so the next one executes again."""
+        with self._lock:
+            if self._async_calls.get(key) is call:
+                del self._async_calls[key]
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async variant of ``do``.
+
+        The shared call runs on a background event loop owned by the
+        coalescer, so callers on any event loop of the process can await it
+        and none of them owns it: a cancelled caller only stops waiting. The
+        call itself is cancelled once no caller waits for it any more.
+        ``lock_dir`` applies as in ``do``.
+
+        Args:
+            key: Identity of the call.
+            fn: Coroutine function producing the result.
+
+        Returns:
+            The (shared) result of ``fn``.
+
+        Raises:
+            Exception: Whatever ``fn`` raised, re-raised for every waiter.
+        """
+        with self._lock:
+            call = self._async_calls.get(key)
+            leader = call is None
+            if leader:
+                future = asyncio.run_coroutine_threadsafe(
+                    self._arun(key, fn), self._background_loop()
+                )
+                call = self._async_calls[key] = _AsyncCall(future)
+            call.waiters += 1
+        if leader:
+            call.future.add_done_callback(lambda _: self._finish(key, call))
+        else:
+            logger.debug("Joining in-flight call %s", key[:12])
+
+        try:
+            # Shielded so a cancelled caller does not cancel the shared call
+            return await asyncio.shield(asyncio.wrap_future(call.future))
+        finally:
+            with self._lock:
+                call.waiters -= 1
+                abandoned = call.waiters == 0 and not call.future.done()
+            if abandoned:
+                logger.debug("Cancelling abandoned call %s", key[:12])
+                call.future.cancel()
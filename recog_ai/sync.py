@@ -0,0 +1,580 @@
+"""Incremental synchronisation of the module vector store from a source feed."""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from recog_ai.chunking import delete_chunks, get_chunk_database, has_chunk_index
+from recog_ai.chunking import index_chunks
+from recog_ai.normalize import normalize_metadata
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+HASH_KEY = "content_hash"
+CURRENT_POINTER = "CURRENT"
+SNAPSHOT_DIR = "snapshots"
+# Held exclusively while a snapshot is copied, updated, published and pruned
+SYNC_LOCK = "sync.lock"
+# Written into a snapshot when it stops being the active one
+RETIRED_MARKER = "RETIRED"
+# Seconds a retired snapshot is kept for workers that still serve it
+RETIRE_GRACE = 600.0
+
+
+@dataclass
+class ModuleRecord:
+    """A single module as delivered by the source of truth."""
+
+    id: str
+    page_content: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def content_hash(self) -> str:
+        """Stable hash over content and metadata used for change detection."""
+        payload = json.dumps(
+            {"page_content": self.page_content, "metadata": self.metadata},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class SyncPlan:
+    """Result of diffing the source feed against the vector store."""
+
+    added: List[ModuleRecord] = field(default_factory=list)
+    changed: List[ModuleRecord] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def is_empty(self) -> bool:
+        """Whether applying the plan would modify the store."""
+        return not (self.added or self.changed or self.removed)
+
+    def summary(self) -> Dict[str, int]:
+        """Counts per change type, suitable for logging."""
+        return {
+            "added": len(self.added),
+            "changed": len(self.changed),
+            "removed": len(self.removed),
+            "unchanged": self.unchanged,
+        }
+
+
+def _to_record(row: Dict[str, Any]) -> ModuleRecord:
+    """Convert a raw source row into a ModuleRecord."""
+    row = dict(row)
+    record_id = row.pop("id", None)
+    if record_id is None:
+        raise ValueError("Source record without 'id'")
+    content = row.pop("page_content", None)
+    if content is None:
+        content = row.pop("content", "")
+    metadata = row.pop("metadata", None)
+    if metadata is None:
+        metadata = row
+    return ModuleRecord(id=str(record_id), page_content=content or "", metadata=metadata)
+
+
+def load_jsonl_source(path: str) -> Iterator[ModuleRecord]:
+    """
+    Read module records from a JSONL file.
+
+    Each line must contain an ``id`` and either ``page_content`` or ``content``.
+    Metadata is taken from a ``metadata`` object or, if absent, from all
+    remaining keys.
+
+    Args:
+        path: Path to the JSONL file.
+
+    Yields:
+        ModuleRecord instances.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield _to_record(json.loads(line))
+
+
+def load_postgres_source(dsn: str, query: str) -> Iterator[ModuleRecord]:
+    """
+    Read module records from a Postgres-compatible database.
+
+    The query must return an ``id`` column, a ``page_content`` (or ``content``)
+    column and either a ``metadata`` JSON column or plain metadata columns.
+
+    Args:
+        dsn: libpq connection string.
+        query: SQL query returning one row per module.
+
+    Yields:
+        ModuleRecord instances.
+    """
+    import psycopg2
+    import psycopg2.extras
+
+    with psycopg2.connect(dsn) as connection:
+        with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(query)
+            for row in cur:
+                yield _to_record(row)
+
+
+def _store_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten metadata to the scalar types Chroma accepts."""
+    flat = {}
+    for key, value in metadata.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ", ".join(str(item) for item in value)
+        elif isinstance(value, dict):
+            value = json.dumps(value, ensure_ascii=False)
+        flat[key] = value
+    return flat
+
+
+def existing_hashes(moduledb: Any) -> Dict[str, Optional[str]]:
+    """
+    Read the content hash of every document currently in the store.
+
+    Args:
+        moduledb: Chroma vector database instance.
+
+    Returns:
+        Mapping of document id to stored content hash (None if unknown).
+    """
+    stored = moduledb.get(include=["metadatas"])
+    return {
+        doc_id: (metadata or {}).get(HASH_KEY)
+        for doc_id, metadata in zip(stored["ids"], stored["metadatas"])
+    }
+
+
+def plan_sync(
+    records: Iterable[ModuleRecord], current: Dict[str, Optional[str]]
+) -> SyncPlan:
+    """
+    Diff source records against the stored content hashes.
+
+    Args:
+        records: Records from the source of truth.
+        current: Mapping of stored document ids to content hashes.
+
+    Returns:
+        SyncPlan describing which documents to embed and delete.
+    """
+    plan = SyncPlan()
+    seen = set()
+    for record in records:
+        if record.id in seen:
+            logger.warning("Duplicate module id %s in source, keeping first", record.id)
+            continue
+        seen.add(record.id)
+        if record.id not in current:
+            plan.added.append(record)
+        elif current[record.id] != record.content_hash:
+            plan.changed.append(record)
+        else:
+            plan.unchanged += 1
+    plan.removed = [doc_id for doc_id in current if doc_id not in seen]
+    return plan
+
+
+def apply_sync(
+    moduledb: Any, plan: SyncPlan, batch_size: int = 64, chunkdb: Any = None
+) -> None:
+    """
+    Apply a sync plan, re-embedding only added and changed documents.
+
+    Normalized columns (see ``recog_ai.normalize``) are computed here, once
+    per ingested module, instead of per query.
+
+    Args:
+        moduledb: Chroma vector database instance.
+        plan: Plan produced by ``plan_sync``.
+        batch_size: Number of documents embedded per call.
+        chunkdb: Optional chunk database (see ``recog_ai.chunking``) kept in
+            step with the modules.
+    """
+    # Changed modules are deleted too: upserts merge metadata, which would
+    # keep keys that were dropped from the source
+    stale = plan.removed + [record.id for record in plan.changed]
+    if stale:
+        moduledb.delete(ids=stale)
+    if chunkdb is not None:
+        delete_chunks(chunkdb, stale)
+
+    upserts = plan.added + plan.changed
+    for start in range(0, len(upserts), batch_size):
+        batch = upserts[start : start + batch_size]
+        metadatas = []
+        for record in batch:
+            metadata = _store_metadata(record.metadata)
+            metadata.update(normalize_metadata(record.metadata, record.page_content))
+            metadata[HASH_KEY] = record.content_hash
+            metadatas.append(metadata)
+        moduledb.add_texts(
+            texts=[record.page_content for record in batch],
+            metadatas=metadatas,
+            ids=[record.id for record in batch],
+        )
+        if chunkdb is not None:
+            index_chunks(
+                chunkdb,
+                ((r.id, r.metadata, r.page_content) for r in batch),
+                batch_size,
+            )
+
+
+def resolve_snapshot(root: str) -> str:
+    """
+    Return the directory of the active vector store snapshot.
+
+    Falls back to ``root`` itself when no snapshot pointer exists, so plain
+    (unsynced) vector store directories keep working.
+
+    Args:
+        root: Vector store root directory.
+
+    Returns:
+        Path of the active snapshot.
+    """
+    pointer = os.path.join(root, CURRENT_POINTER)
+    try:
+        with open(pointer, "r", encoding="utf-8") as file:
+            name = file.read().strip()
+    except FileNotFoundError:
+        return root
+    return os.path.join(root, SNAPSHOT_DIR, name)
+
+
+@contextlib.contextmanager
+def _sync_lock(root: str) -> Iterator[None]:
+    """Serialize snapshot updates of ``root`` across processes."""
+    os.makedirs(root, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(root, SYNC_LOCK), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _retired_at(path: str) -> float:
+    """Return when a snapshot was retired; unpublished ones count from their creation."""
+    try:
+        with open(os.path.join(path, RETIRED_MARKER), "r", encoding="utf-8") as file:
+            return float(file.read())
+    except (OSError, ValueError):
+        pass
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+def _publish_snapshot(root: str, name: str) -> None:
+    """Atomically point the store root at a new snapshot and retire the previous one."""
+    previous = resolve_snapshot(root)
+    tmp_pointer = os.path.join(root, CURRENT_POINTER + ".tmp")
+    with open(tmp_pointer, "w", encoding="utf-8") as file:
+        file.write(name)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_pointer, os.path.join(root, CURRENT_POINTER))
+    if previous != root and os.path.isdir(previous):
+        with open(os.path.join(previous, RETIRED_MARKER), "w", encoding="utf-8") as file:
+            file.write(repr(time.time()))
+
+
+def _prune_snapshots(root: str, keep: int, retire_grace: float = RETIRE_GRACE) -> None:
+    """
+    Remove old snapshots, keeping the newest ``keep`` directories.
+
+    Workers swap to a new snapshot on their next request and keep the
+    previous database open until the swap after that, so older snapshots are
+    only removed once they have been retired for ``retire_grace`` seconds.
+    """
+    snapshot_root = os.path.join(root, SNAPSHOT_DIR)
+    active = os.path.basename(resolve_snapshot(root))
+    names = sorted(os.listdir(snapshot_root))
+    now = time.time()
+    for name in names[:-keep] if keep > 0 else names:
+        path = os.path.join(snapshot_root, name)
+        if name != active and now - _retired_at(path) >= retire_grace:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def sync_vectorstore(
+    records: Iterable[ModuleRecord],
+    embedding: Any,
+    vectorstore_path: Optional[str] = None,
+    keep_snapshots: int = 2,
+    dry_run: bool = False,
+    chunked: bool = False,
+    retire_grace: float = RETIRE_GRACE,
+) -> SyncPlan:
+    """
+    Synchronise the vector store with a source feed into a new snapshot.
+
+    The active snapshot is copied, the diff is applied to the copy and the
+    ``CURRENT`` pointer is swapped atomically. Readers that use a
+    ``ModuleDatabaseHandle`` pick up the new snapshot on their next request.
+
+    Args:
+        records: Records from the source of truth.
+        embedding: Embedding model used for added and changed documents.
+        vectorstore_path: Vector store root directory.
+        keep_snapshots: Number of snapshots kept on disk after publishing.
+        dry_run: Only compute the plan without writing anything.
+        chunked: Maintain the chunk collection for multi-vector search; it is
+            always maintained once the store has one.
+        retire_grace: Seconds a replaced snapshot is kept for workers still
+            serving it.
+
+    Returns:
+        The applied SyncPlan.
+    """
+    from recog_ai.config import default_vectorstore_path, get_module_database
+
+    root = vectorstore_path or default_vectorstore_path()
+    active = resolve_snapshot(root)
+
+    active_db = get_module_database(embedding, active)
+    # The first chunked sync chunks every module of the feed
+    new_chunk_index = chunked and not has_chunk_index(active_db)
+    if new_chunk_index:
+        records = list(records)
+    plan = plan_sync(records, existing_hashes(active_db))
+    logger.info("Vector store sync plan: %s", plan.summary())
+    if dry_run or (plan.is_empty and not new_chunk_index):
+        return plan
+
+    def update(moduledb: Any) -> None:
+        chunkdb = None
+        if new_chunk_index or has_chunk_index(moduledb):
+            chunkdb = get_chunk_database(moduledb)
+        apply_sync(moduledb, plan, chunkdb=chunkdb)
+        if new_chunk_index:
+            # Unchanged modules keep their vectors; only their chunks are new
+            upserted = {record.id for record in plan.added + plan.changed}
+            index_chunks(
+                chunkdb,
+                (
+                    (r.id, r.metadata, r.page_content)
+                    for r in records
+                    if r.id not in upserted
+                ),
+            )
+
+    update_snapshot(update, embedding, root, keep_snapshots, retire_grace)
+    return plan
+
+
+def update_snapshot(
+    update: Callable[[Any], Any],
+    embedding: Any,
+    vectorstore_path: Optional[str] = None,
+    keep_snapshots: int = 2,
+    retire_grace: float = RETIRE_GRACE,
+) -> Any:
+    """
+    Apply a change to a copy of the active snapshot and publish the copy.
+
+    Every write to the vector store goes through here, so readers never see
+    a half-applied change and the previous snapshot stays intact. Updates
+    of the same store, also from other processes, run one after another, so
+    none copies a snapshot another is about to replace.
+
+    Args:
+        update: Callable receiving the module database of the copy.
+        embedding: Embedding model of the module database.
+        vectorstore_path: Vector store root directory.
+        keep_snapshots: Number of snapshots kept on disk after publishing.
+        retire_grace: Seconds a replaced snapshot is kept for workers still
+            serving it.
+
+    Returns:
+        Whatever ``update`` returned.
+    """
+    from recog_ai.config import (
+        close_module_database,
+        default_vectorstore_path,
+        get_module_database,
+    )
+
+    root = vectorstore_path or default_vectorstore_path()
+    with _sync_lock(root):
+        active = resolve_snapshot(root)
+        now = time.time()
+        name = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + "%06d" % (now % 1 * 1e6)
+        target = os.path.join(root, SNAPSHOT_DIR, name)
+        ignore = shutil.ignore_patterns(
+            SNAPSHOT_DIR, CURRENT_POINTER, CURRENT_POINTER + ".tmp", SYNC_LOCK, RETIRED_MARKER
+        )
+        if os.path.isdir(active):
+            shutil.copytree(active, target, ignore=ignore)
+        else:
+            os.makedirs(target)
+
+        moduledb = get_module_database(embedding, target)
+        try:
+            result = update(moduledb)
+        except BaseException:
+            close_module_database(moduledb)
+            shutil.rmtree(target, ignore_errors=True)
+            raise
+        close_module_database(moduledb)
+        _publish_snapshot(root, name)
+        _prune_snapshots(root, keep_snapshots, retire_grace)
+    logger.info("Published vector store snapshot %s", name)
+    return result
+
+
+class ModuleDatabaseHandle:
+    """
+    Hands out the module database of the currently published snapshot.
+
+    After a swap the previous database stays open for requests still using
+    it; it is closed at the following swap.
+    """
+
+    def __init__(
+        self,
+        embedding: Any,
+        vectorstore_path: Optional[str] = None,
+        factory: Optional[Callable[[Any, str], Any]] = None,
+        check_interval: float = 2.0,
+        close: Optional[Callable[[Any], None]] = None,
+    ) -> None:
+        """
+        Initialize the handle.
+
+        Args:
+            embedding: Embedding model passed to the database factory.
+            vectorstore_path: Vector store root directory.
+            factory: Callable creating a database for a snapshot path;
+                defaults to ``get_module_database``.
+            check_interval: Minimum seconds between pointer checks.
+            close: Callable releasing a retired database; defaults to
+                ``close_module_database``.
+        """
+        from recog_ai.config import (
+            close_module_database,
+            default_vectorstore_path,
+            get_module_database,
+        )
+
+        self.embedding = embedding
+        self.root = vectorstore_path or default_vectorstore_path()
+        self.factory = factory or get_module_database
+        self.close = close or close_module_database
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._path = None
+        self._db = None
+        self._retired = None
+        self._checked_at = 0.0
+
+    @property
+    def path(self) -> Optional[str]:
+        """Path of the snapshot currently served."""
+        return self._path
+
+    def get(self) -> Any:
+        """
+        Return the database for the active snapshot, swapping if it changed.
+
+        Returns:
+            Chroma vector database instance.
+        """
+        now = time.monotonic()
+        if self._db is not None and now - self._checked_at < self.check_interval:
+            return self._db
+
+        path = resolve_snapshot(self.root)
+        if path != self._path:
+            with self._lock:
+                if path != self._path:
+                    db = self.factory(self.embedding, path)
+                    if self._retired is not None:
+                        try:
+                            self.close(self._retired)
+                        except Exception:
+                            logger.warning("Could not close retired database", exc_info=True)
+                    self._retired = self._db
+                    self._db, self._path = db, path
+                    logger.info("Serving module database snapshot %s", path)
+        self._checked_at = now
+        return self._db
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point: ``python -m recog_ai.sync``."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--jsonl", help="Path to a JSONL module feed")
+    source.add_argument("--dsn", help="Postgres connection string")
+    parser.add_argument(
+        "--query",
+        default="SELECT id, page_content, metadata FROM modules",
+        help="Query used with --dsn",
+    )
+    parser.add_argument("--vectorstore", help="Vector store root directory")
+    parser.add_argument("--keep", type=int, default=2, help="Snapshots to keep")
+    parser.add_argument(
+        "--retire-grace",
+        type=float,
+        default=RETIRE_GRACE,
+        help="Seconds older snapshots are kept after being replaced",
+    )
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument(
+        "--chunks", action="store_true", help="Maintain the multi-vector chunk index"
+    )
+    args = parser.parse_args(argv)
+
+    from recog_ai.config import get_embedding
+
+    records = (
+        load_jsonl_source(args.jsonl)
+        if args.jsonl
+        else load_postgres_source(args.dsn, args.query)
+    )
+    plan = sync_vectorstore(
+        records,
+        get_embedding(),
+        vectorstore_path=args.vectorstore,
+        keep_snapshots=args.keep,
+        retire_grace=args.retire_grace,
+        dry_run=args.dry_run,
+        chunked=args.chunks,
+    )
+    print(json.dumps(plan.summary()))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
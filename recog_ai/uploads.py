@@ -0,0 +1,365 @@
+"""Streaming upload reading and splitting of combined module documents."""
+
+import asyncio
+import codecs
+import logging
+import re
+import shutil
+import tempfile
+import xml.etree.ElementTree as ElementTree
+from typing import IO, Any, Awaitable, Callable, Iterable, Iterator, List, Optional, Tuple
+
+import pdfplumber
+from werkzeug.datastructures import FileStorage
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK = 64 * 1024
+
+# Field labels that start a module description, e.g. "Modulbezeichnung:".
+# A combined document starts a new module where the label of the current
+# module's first heading occurs again.
+HEADING_PATTERN = re.compile(
+    r"^\s*(modul(?:bezeichnung|name|titel)?|module(?:\s+title|\s+name)?"
+    r"|lehrveranstaltung|course(?:\s+title)?)(?:\s+\d+)?\s*[:：]",
+    re.IGNORECASE,
+)
+
+
+class UnsupportedFileType(ValueError):
+    """Raised for uploads that are neither PDF, TXT nor XML."""
+
+
+def iter_text_chunks(stream: IO[bytes], chunk_size: int = READ_CHUNK) -> Iterator[str]:
+    """
+    Decode a UTF-8 byte stream chunk by chunk.
+
+    Multi-byte characters split across chunks are decoded correctly; invalid
+    bytes are replaced.
+
+    Args:
+        stream: Binary file object.
+        chunk_size: Bytes read at a time.
+
+    Yields:
+        Decoded text chunks.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        text = decoder.decode(data)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_pdf_pages(stream: IO[bytes]) -> Iterator[str]:
+    """
+    Extract the text of a PDF page by page, releasing each page afterwards.
+
+    Args:
+        stream: Binary file object of the PDF.
+
+    Yields:
+        Text of each page followed by a newline.
+    """
+    with pdfplumber.open(stream) as pdf:
+        for page in pdf.pages:
+            yield (page.extract_text() or "") + "\n"
+            page.close()
+
+
+def iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Re-split text chunks into lines.
+
+    Args:
+        chunks: Text chunks with arbitrary boundaries.
+
+    Yields:
+        Lines including their line break (the last one possibly without).
+    """
+    rest = ""
+    for chunk in chunks:
+        lines = (rest + chunk).splitlines(keepends=True)
+        rest = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        yield from lines
+    if rest:
+        yield rest
+
+
+def heading_key(line: str) -> Optional[str]:
+    """Return the normalized label if ``line`` is a module heading."""
+    match = HEADING_PATTERN.match(line)
+    if not match:
+        return None
+    return re.sub(r"\s+", " ", match.group(1).lower())
+
+
+def split_modules(
+    lines: Iterable[str], min_chars: int = 200, max_chars: int = 10000
+) -> Iterator[str]:
+    """
+    Split a combined document into module sections as lines arrive.
+
+    A section ends where the label of its first heading (e.g.
+    "Modulbezeichnung:") appears again, provided the section already holds
+    ``min_chars`` characters; text before the first heading belongs to the
+    first section. Sections are truncated to ``max_chars``.
+
+    Args:
+        lines: Lines of the document.
+        min_chars: Minimum section length before a split is accepted.
+        max_chars: Maximum characters kept per section.
+
+    Yields:
+        Section texts.
+    """
+    parts = []
+    size = 0
+    key = None
+    for line in lines:
+        line_key = heading_key(line)
+        if line_key and line_key == key and size >= min_chars:
+            yield "".join(parts).strip()
+            parts, size, key = [], 0, None
+        if line_key and key is None:
+            key = line_key
+        if size < max_chars:
+            parts.append(line[: max_chars - size])
+            size += len(parts[-1])
+    text = "".join(parts).strip()
+    if text:
+        yield text
+
+
+def _local_name(tag: Any) -> str:
+    """Tag without namespace."""
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _element_text(element: Any, max_chars: int) -> str:
+    """Flatten an element to "tag: text" lines of its text-bearing descendants."""
+    lines = []
+    size = 0
+    for node in element.iter():
+        text = (node.text or "").strip()
+        if text:
+            line = f"{_local_name(node.tag)}: {text}"
+            lines.append(line)
+            size += len(line) + 1
+            if size >= max_chars:
+                break
+    return "\n".join(lines)[:max_chars]
+
+
+def _release(element: Any, parent: Any) -> None:
+    """Free a processed record and detach it from its parent."""
+    element.clear()
+    if parent is not None:
+        try:
+            parent.remove(element)
+        except ValueError:
+            pass
+
+
+def iter_xml_modules(
+    stream: IO[bytes], max_chars: int = 10000, min_fields: int = 3
+) -> Iterator[str]:
+    """
+    Stream module sections from an XML export with ``iterparse``.
+
+    Records are elements one or two levels below the root with at least
+    ``min_fields`` children whose tag repeats among their siblings (e.g.
+    ``<modules><module>...</module><module>...``). Once detected, every
+    record is yielded and freed when its end tag is read, so memory stays
+    bounded by a single record. Documents without repeated records yield
+    one section.
+
+    Args:
+        stream: Binary file object of the XML document.
+        max_chars: Maximum characters per section.
+        min_fields: Minimum child elements of a record.
+
+    Yields:
+        Section texts as "tag: text" lines.
+    """
+    root = None
+    parents = []
+    record = None  # (level, tag) of module records once detected
+    pending = []  # candidate records seen before the record level was known
+    try:
+        for event, element in ElementTree.iterparse(stream, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = element
+                parents.append(element)
+                continue
+            parents.pop()
+            level = len(parents) + 1
+            if level not in (2, 3) or len(element) < min_fields:
+                continue
+            key = (level, _local_name(element.tag))
+            parent = parents[-1] if parents else None
+            if record == key:
+                yield _element_text(element, max_chars)
+                _release(element, parent)
+            elif record is None:
+                if any(seen == key and owner is parent for seen, _, owner in pending):
+                    record = key
+                    for seen, earlier, owner in pending:
+                        if seen == key:
+                            yield _element_text(earlier, max_chars)
+                            _release(earlier, owner)
+                    pending = []
+                    yield _element_text(element, max_chars)
+                    _release(element, parent)
+                else:
+                    pending.append((key, element, parent))
+    except ElementTree.ParseError as e:
+        # Keep what was read so far; the rest of the document is unusable
+        logger.warning("Malformed XML upload: %s", e)
+    if record is None and root is not None:
+        text = _element_text(root, max_chars).strip()
+        if text:
+            yield text
+
+
+def detach_uploads(files: Iterable[Any], spool_size: int = 2**20) -> List[FileStorage]:
+    """
+    Copy uploads into temporary files owned by the caller.
+
+    Request files are closed when the request ends, but a streamed response
+    keeps reading after that. Copies stay in memory up to ``spool_size``
+    bytes and move to disk beyond. Close them when done.
+
+    Args:
+        files: Uploaded files; empty fields are skipped.
+        spool_size: Bytes kept in memory per file.
+
+    Returns:
+        File objects with the original names.
+    """
+    detached = []
+    for upload in files:
+        if not upload or not upload.filename:
+            continue
+        spooled = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        shutil.copyfileobj(upload.stream, spooled, READ_CHUNK)
+        spooled.seek(0)
+        detached.append(FileStorage(stream=spooled, filename=upload.filename))
+    return detached
+
+
+def iter_upload_sections(
+    files: Iterable[Any],
+    text: Optional[str] = None,
+    max_sections: int = 20,
+    max_chars: int = 10000,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Read uploads and pasted text lazily and split them into module sections.
+
+    Args:
+        files: Uploaded files (werkzeug ``FileStorage``); empty fields are skipped.
+        text: Pasted text, used in addition to the files.
+        max_sections: Maximum number of sections produced overall.
+        max_chars: Maximum characters per section.
+
+    Yields:
+        (source name, section text) pairs.
+
+    Raises:
+        UnsupportedFileType: For files other than PDF, TXT and XML.
+    """
+    files = [upload for upload in files if upload and upload.filename]
+    # Checked up front so a stream is not interrupted by a later file
+    for upload in files:
+        if upload.filename.lower().rsplit(".", 1)[-1] not in ("pdf", "txt", "xml"):
+            raise UnsupportedFileType(f"File type not supported: {upload.filename}")
+
+    def sources() -> Iterator[Tuple[str, Iterator[str]]]:
+        for upload in files:
+            name = upload.filename
+            suffix = name.lower().rsplit(".", 1)[-1]
+            if suffix == "pdf":
+                lines = iter_lines(iter_pdf_pages(upload.stream))
+                yield name, split_modules(lines, max_chars=max_chars)
+            elif suffix == "txt":
+                lines = iter_lines(iter_text_chunks(upload.stream))
+                yield name, split_modules(lines, max_chars=max_chars)
+            else:
+                yield name, iter_xml_modules(upload.stream, max_chars=max_chars)
+        if text and text.strip():
+            yield "Text", split_modules(iter_lines([text]), max_chars=max_chars)
+
+    produced = 0
+    for name, sections in sources():
+        for section in sections:
+            if not section:
+                continue
+            yield name, section
+            produced += 1
+            if produced >= max_sections:
+                logger.info("Upload truncated after %d module sections", produced)
+                return
+
+
+def stream_completed(
+    fn: Callable[[Any], Awaitable[Any]], items: Iterable[Any], concurrency: int = 4
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Run ``fn`` over items concurrently and yield results as they complete.
+
+    Meant for streamed responses consumed outside of an event loop: the
+    generator drives its own loop, pulls the next item only when a slot is
+    free (so lazily read uploads stay bounded) and cancels outstanding work
+    when it is closed early, e.g. on client disconnect.
+
+    Args:
+        fn: Coroutine function applied to each item.
+        items: Items, consumed lazily.
+        concurrency: Maximum number of items processed at once.
+
+    Yields:
+        (index, result) pairs in completion order.
+    """
+    loop = asyncio.new_event_loop()
+    iterator = iter(items)
+    pending = set()
+    count = 0
+
+    async def indexed(index: int, item: Any) -> Tuple[int, Any]:
+        return index, await fn(item)
+
+    def fill() -> None:
+        nonlocal count
+        while len(pending) < max(1, concurrency):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            pending.add(loop.create_task(indexed(count, item)))
+            count += 1
+
+    try:
+        fill()
+        while pending:
+            done, _ = loop.run_until_complete(
+                asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            )
+            for task in done:
+                pending.discard(task)
+            fill()
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
@@ -1,11 +1,19 @@
 """Utility functions for JSON parsing and metadata extraction."""
 
 import json
+import re
 import isodate
 import logging
+from typing import Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+VERDICTS = {
+    "full": "Vollständige Anerkennung",
+    "partial": "Teilweise Anerkennung",
+    "none": "Keine Anerkennung",
+}
+
 
 def extract_json(text: str) -> dict:
     """
@@ -33,33 +41,54 @@ def extract_json(text: str) -> dict:
         raise
 
 
-def parse_workload(metadata: dict) -> str:
+def workload_hours(metadata: dict) -> Tuple[Optional[int], bool]:
     """
-    Extract and format workload from module metadata.
+    Determine the workload of a module in hours.
 
     Attempts to parse duration in ISO format (e.g., "P0Y1M0DT0H0M0S"),
-    falls back to credits-based estimate, or returns empty string.
+    falls back to a credits-based estimate (30 hours per credit).
 
     Args:
         metadata: Module metadata dictionary.
 
     Returns:
-        Formatted workload string (e.g., "90 Stunden") or empty string.
+        Tuple of (hours or None if unknown, whether the value is estimated).
     """
     try:
         workload_iso = metadata.get("duration") or metadata.get("workload")
         if workload_iso:
             duration = isodate.parse_duration(workload_iso)
-            hours = int(duration.total_seconds() / 3600)
-            return str(hours) + " Stunden"
+            return int(duration.total_seconds() / 3600), False
     except Exception:
         pass
 
     credits = metadata.get("credits")
     if credits:
-        return "~" + str(int(credits) * 30) + " Stunden"
+        try:
+            return int(credits) * 30, True
+        except (TypeError, ValueError):
+            pass
+
+    return None, False
 
-    return ""
+
+def parse_workload(metadata: dict) -> str:
+    """
+    Extract and format workload from module metadata.
+
+    Attempts to parse duration in ISO format (e.g., "P0Y1M0DT0H0M0S"),
+    falls back to credits-based estimate, or returns empty string.
+
+    Args:
+        metadata: Module metadata dictionary.
+
+    Returns:
+        Formatted workload string (e.g., "90 Stunden") or empty string.
+    """
+    hours, estimated = workload_hours(metadata)
+    if hours is None:
+        return ""
+    return ("~" if estimated else "") + str(hours) + " Stunden"
 
 
 def collect_programs(metadata: dict) -> str:
@@ -76,3 +105,70 @@ def collect_programs(metadata: dict) -> str:
     if isinstance(programs, (list, tuple)):
         return ", ".join(programs)
     return programs or ""
+
+
+def parse_verdict(result: str) -> Optional[str]:
+    """
+    Extract the recommended verdict from an examination result.
+
+    The examination prompt lists all three outcomes, so the verdict mentioned
+    last (the closing recommendation) wins.
+
+    Args:
+        result: Examination result as markdown or HTML.
+
+    Returns:
+        One of the VERDICTS keys ("full", "partial", "none") or None.
+    """
+    text = re.sub(r"<[^>]+>|[*_]", "", result or "").lower()
+    positions = {label: text.rfind(phrase.lower()) for label, phrase in VERDICTS.items()}
+    label, position = max(positions.items(), key=lambda item: item[1])
+    return label if position >= 0 else None
+
+
+def build_suggestion_query(module: dict, fallback: str = "") -> str:
+    """
+    Build the similarity search query from an extracted module.
+
+    Uses title, learning goals and level; falls back to the raw document
+    (truncated to 10000 characters) if none of them were extracted.
+
+    Args:
+        module: Extracted module dictionary.
+        fallback: Text used when the module carries no searchable fields.
+
+    Returns:
+        Query string for ``get_module_suggestions``.
+    """
+    query = ""
+    if module.get("title"):
+        query += "Titel: \n"
+        query += module["title"]
+        query += "\n"
+    if module.get("learninggoals"):
+        query += "Lernziele: \n"
+        query += "\n".join(module["learninggoals"])
+        query += "\n"
+    if module.get("level"):
+        query += "Niveau: \n"
+        query += module["level"]
+        query += "\n"
+    if not query.strip():
+        query = module.get("raw_document", fallback)[:10000]
+    return query
+
+
+def distance_to_similarity(distance: float) -> float:
+    """
+    Convert a Chroma distance to cosine similarity.
+
+    Chroma's default space is squared L2; on normalized embeddings
+    ``d = 2 - 2 * cos``.
+
+    Args:
+        distance: Distance returned by a Chroma similarity search.
+
+    Returns:
+        Cosine similarity in [-1, 1].
+    """
+    return 1.0 - distance / 2.0
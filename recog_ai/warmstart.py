@@ -0,0 +1,264 @@
+"""Warm start: cache snapshots across restarts and warm-up before readiness."""
+
+import argparse
+import atexit
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bump when the snapshot layout changes; older files are ignored
+SNAPSHOT_VERSION = 1
+
+
+def default_snapshot_path() -> str:
+    """Return the snapshot file (env ``WARM_SNAPSHOT``)."""
+    return os.getenv("WARM_SNAPSHOT") or os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "data", "warm_snapshot.json.gz"
+    )
+
+
+def read_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Read a snapshot file.
+
+    Args:
+        path: Snapshot file.
+
+    Returns:
+        The snapshot, or None if it is missing, unreadable or of another version.
+    """
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            snapshot = json.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable warm-start snapshot %s: %s", path, e)
+        return None
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        logger.info("Ignoring warm-start snapshot of version %s", snapshot.get("version"))
+        return None
+    return snapshot
+
+
+def touch_index(db: Any, vectors: Iterable[List[float]], k: int = 10) -> int:
+    """
+    Run searches so the vector index and its metadata pages are resident.
+
+    Args:
+        db: Chroma vector store.
+        vectors: Query embeddings to search with.
+        k: Hits per search.
+
+    Returns:
+        Number of searches run.
+    """
+    searches = 0
+    for vector in vectors:
+        db.similarity_search_by_vector_with_relevance_scores(vector, k=k)
+        searches += 1
+    return searches
+
+
+class WarmStart:
+    """
+    Snapshot hot caches to disk and restore them with a warm-up at startup.
+
+    Caches are registered under a name with the parts of the fingerprint
+    (e.g. embedding model, vector store snapshot) their contents depend on;
+    a cache is only restored if those parts are unchanged. After restoring,
+    warm-up steps run in order (loading the model, touching the index) and
+    ``ready`` is set, which the readiness probe reports.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fingerprint: Optional[Dict[str, str]] = None,
+        interval: float = 300.0,
+    ) -> None:
+        """
+        Initialize the warm start.
+
+        Args:
+            path: Snapshot file.
+            fingerprint: Identifies what cached values were computed from.
+            interval: Seconds between periodic snapshots (0 disables them;
+                a snapshot is still written at exit).
+        """
+        self.path = path
+        self.fingerprint = fingerprint or {}
+        self.interval = interval
+        self.ready = threading.Event()
+        self.status: Dict[str, Any] = {"restored": {}, "steps": {}, "saved_at": None}
+        self._caches: Dict[str, Tuple[Any, Tuple[str, ...]]] = {}
+        self._steps: List[Tuple[str, Callable[[], Any]]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._saver = None
+
+    @classmethod
+    def from_env(cls, fingerprint: Optional[Dict[str, str]] = None) -> "WarmStart":
+        """Create a warm start configured through ``WARM_*`` variables."""
+        return cls(
+            default_snapshot_path(),
+            fingerprint=fingerprint,
+            interval=float(os.getenv("WARM_SNAPSHOT_INTERVAL", "300")),
+        )
+
+    def register_cache(self, name: str, cache: Any, depends_on: Iterable[str] = ()) -> None:
+        """
+        Include a cache in snapshots.
+
+        Args:
+            name: Section name in the snapshot file.
+            cache: Object with ``snapshot()`` and ``restore(state)``.
+            depends_on: Fingerprint keys the cached values depend on.
+        """
+        self._caches[name] = (cache, tuple(depends_on))
+
+    def add_step(self, name: str, step: Callable[[], Any]) -> None:
+        """
+        Add a warm-up step, run after the caches are restored.
+
+        Args:
+            name: Step name reported by the readiness probe.
+            step: Callable; its return value is reported as the step result.
+        """
+        self._steps.append((name, step))
+
+    def save(self) -> bool:
+        """
+        Write a snapshot of all registered caches atomically.
+
+        Returns:
+            Whether the snapshot was written.
+        """
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "created_at": time.time(),
+            "fingerprint": self.fingerprint,
+            "caches": {name: cache.snapshot() for name, (cache, _) in self._caches.items()},
+        }
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with gzip.open(temporary, "wt", encoding="utf-8", compresslevel=1) as file:
+                    json.dump(snapshot, file)
+                os.replace(temporary, self.path)
+            except OSError as e:
+                logger.warning("Could not write warm-start snapshot %s: %s", self.path, e)
+                return False
+        self.status["saved_at"] = snapshot["created_at"]
+        return True
+
+    def restore(self) -> Dict[str, int]:
+        """
+        Restore registered caches from the snapshot file.
+
+        Returns:
+            Restored entries per cache; caches whose fingerprint changed are
+            skipped.
+        """
+        snapshot = read_snapshot(self.path)
+        restored = {}
+        if snapshot is None:
+            return restored
+        stored = snapshot.get("fingerprint", {})
+        for name, (cache, depends_on) in self._caches.items():
+            state = snapshot.get("caches", {}).get(name)
+            if state is None:
+                continue
+            changed = [key for key in depends_on if stored.get(key) != self.fingerprint.get(key)]
+            if changed:
+                logger.info("Not restoring %s: %s changed", name, ", ".join(changed))
+                continue
+            try:
+                restored[name] = cache.restore(state)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning("Could not restore %s: %s", name, e)
+        return restored
+
+    def warm_up(self) -> None:
+        """Restore caches, run the warm-up steps and mark the process ready."""
+        started = time.perf_counter()
+        self.status["restored"] = self.restore()
+        for name, step in self._steps:
+            step_started = time.perf_counter()
+            try:
+                result = step()
+            except Exception as e:
+                # A failed step leaves a cold path, not a broken process
+                logger.warning("Warm-up step %s failed: %s", name, e)
+                result = {"error": str(e)}
+            self.status["steps"][name] = {
+                "result": result,
+                "ms": round((time.perf_counter() - step_started) * 1000, 1),
+            }
+        self.status["warmup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info("Warm-up finished: %s", self.status)
+        self.ready.set()
+
+    def _run_saver(self) -> None:
+        """Write snapshots periodically until stopped."""
+        while not self._stop.wait(self.interval):
+            self.save()
+
+    def start(self, background: bool = True) -> None:
+        """
+        Warm up and schedule snapshots (periodically and at exit).
+
+        Args:
+            background: Run the warm-up in a thread so the server can accept
+                requests (and report not ready) meanwhile.
+        """
+        if background:
+            threading.Thread(target=self.warm_up, name="warm-up", daemon=True).start()
+        else:
+            self.warm_up()
+        if self.interval > 0 and self._saver is None:
+            self._saver = threading.Thread(
+                target=self._run_saver, name="warm-snapshot", daemon=True
+            )
+            self._saver.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Stop periodic snapshots and write a final one."""
+        self._stop.set()
+        if self.ready.is_set():
+            self.save()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point: ``python -m recog_ai.warmstart``."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--snapshot", help="Snapshot file (default: WARM_SNAPSHOT)")
+    args = parser.parse_args(argv)
+
+    path = args.snapshot or default_snapshot_path()
+    snapshot = read_snapshot(path)
+    if snapshot is None:
+        print(f"No usable snapshot at {path}")
+        return
+    summary = {
+        "created_at": snapshot["created_at"],
+        "fingerprint": snapshot["fingerprint"],
+        "caches": {
+            name: {key: len(value) for key, value in state.items() if isinstance(value, list)}
+            for name, state in snapshot["caches"].items()
+        },
+    }
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,230 @@
+"""Server-side workspace store for extracted modules and their candidates."""
+
+import contextlib
+import copy
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional
+
+from recog_ai.memory import deep_sizeof, megabytes
+
+logger = logging.getLogger(__name__)
+
+
+def new_token() -> str:
+    """Return a short, unguessable workspace token."""
+    return secrets.token_urlsafe(12)
+
+
+class InMemoryWorkspaceStore:
+    """
+    Workspaces kept in process memory with TTL and size-bound eviction.
+
+    Workspaces are copied on write and on read, so like the SQLite store a
+    caller's changes only take effect through ``update``.
+    """
+
+    def __init__(
+        self, ttl: float = 3600, max_entries: int = 1000, max_bytes: Optional[int] = None
+    ) -> None:
+        """
+        Initialize the store.
+
+        Args:
+            ttl: Seconds a workspace stays valid after its last write.
+            max_entries: Maximum number of workspaces; oldest are evicted first.
+            max_bytes: Memory budget of all workspaces, measured at each write.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _purge(self, now: float) -> None:
+        """Drop expired and surplus workspaces (caller holds the lock)."""
+        while self._entries:
+            token, (expires, _, size) = next(iter(self._entries.items()))
+            if (
+                expires > now
+                and len(self._entries) <= self.max_entries
+                and (self.max_bytes is None or self._bytes <= self.max_bytes)
+            ):
+                break
+            del self._entries[token]
+            self._bytes -= size
+
+    def create(self, data: Dict[str, Any]) -> str:
+        """
+        Store a new workspace.
+
+        Args:
+            data: Workspace content.
+
+        Returns:
+            Token identifying the workspace.
+        """
+        token = new_token()
+        self.update(token, data)
+        return token
+
+    def update(self, token: str, data: Dict[str, Any]) -> None:
+        """
+        Replace the content of a workspace and renew its TTL.
+
+        Args:
+            token: Workspace token.
+            data: Workspace content.
+        """
+        now = time.time()
+        data = copy.deepcopy(data)
+        size = deep_sizeof(data)
+        with self._lock:
+            if token in self._entries:
+                self._bytes -= self._entries.pop(token)[2]
+            self._entries[token] = (now + self.ttl, data, size)
+            self._bytes += size
+            self._purge(now)
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a workspace.
+
+        Args:
+            token: Workspace token.
+
+        Returns:
+            Workspace content or None if unknown or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[token]
+                self._bytes -= entry[2]
+                return None
+            data = entry[1]
+        return copy.deepcopy(data)
+
+    def memory(self) -> Dict[str, Any]:
+        """
+        Return the memory held by the workspaces as of their last write.
+
+        Returns:
+            Dictionary with ``bytes``, ``max_bytes`` and ``entries``.
+        """
+        with self._lock:
+            return {
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "entries": len(self._entries),
+            }
+
+
+class SQLiteWorkspaceStore:
+    """Workspaces persisted in SQLite, shared by all workers on one host."""
+
+    def __init__(self, path: str, ttl: float = 3600) -> None:
+        """
+        Initialize the store and create its table if needed.
+
+        Args:
+            path: SQLite database file.
+            ttl: Seconds a workspace stays valid after its last write.
+        """
+        self.path = path
+        self.ttl = ttl
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS workspaces "
+                "(token TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS workspaces_expires ON workspaces (expires)"
+            )
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Open a connection for one operation, committed and closed afterwards.
+
+        One connection per operation keeps the store thread-safe.
+        """
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def create(self, data: Dict[str, Any]) -> str:
+        """
+        Store a new workspace.
+
+        Args:
+            data: JSON-serializable workspace content.
+
+        Returns:
+            Token identifying the workspace.
+        """
+        token = new_token()
+        self.update(token, data)
+        return token
+
+    def update(self, token: str, data: Dict[str, Any]) -> None:
+        """
+        Replace the content of a workspace and renew its TTL.
+
+        Args:
+            token: Workspace token.
+            data: JSON-serializable workspace content.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("DELETE FROM workspaces WHERE expires <= ?", (now,))
+            connection.execute(
+                "INSERT OR REPLACE INTO workspaces (token, data, expires) VALUES (?, ?, ?)",
+                (token, json.dumps(data), now + self.ttl),
+            )
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a workspace.
+
+        Args:
+            token: Workspace token.
+
+        Returns:
+            Workspace content or None if unknown or expired.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT data FROM workspaces WHERE token = ? AND expires > ?",
+                (token, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def get_workspace_store():
+    """
+    Create the workspace store configured by the environment.
+
+    ``WORKSPACE_DB`` selects the SQLite backend (needed with several worker
+    processes); otherwise workspaces are kept in memory. ``WORKSPACE_TTL``
+    sets the lifetime in seconds and ``WORKSPACE_MAX_MB`` the memory budget
+    of the in-memory store.
+    """
+    ttl = float(os.getenv("WORKSPACE_TTL", "3600"))
+    path = os.getenv("WORKSPACE_DB")
+    if path:
+        logger.info("Using SQLite workspace store at %s", path)
+        return SQLiteWorkspaceStore(path, ttl=ttl)
+    return InMemoryWorkspaceStore(ttl=ttl, max_bytes=megabytes("WORKSPACE_MAX_MB", 128))
@@ -0,0 +1,128 @@
+"""Tests for admission control of LLM-bound endpoints."""
+
+import threading
+import time
+
+import pytest
+
+from recog_ai.admission import (
+    PRIORITY_ANONYMOUS,
+    PRIORITY_STAFF,
+    AdmissionController,
+    AdmissionRejected,
+    TokenBucket,
+)
+
+
+def test_token_bucket_reports_wait_time():
+    bucket = TokenBucket(rate=2, burst=1)
+    assert bucket.try_acquire() == 0.0
+    wait = bucket.try_acquire()
+    assert 0 < wait <= 0.5
+
+
+def test_per_client_rate_limit_and_staff_exemption():
+    controller = AdmissionController(client_rate=0.01, client_burst=1)
+    controller.release(controller.acquire("student"))
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.acquire("student")
+    assert excinfo.value.retry_after >= 1
+    # Other clients and staff are unaffected
+    controller.release(controller.acquire("other"))
+    controller.release(controller.acquire("student", PRIORITY_STAFF))
+    assert controller.stats()["rate_limited"] == 1
+
+
+def test_client_limit_is_opt_in_and_refunded_when_globally_limited():
+    controller = AdmissionController(global_rate=0.01, global_burst=2)
+    for _ in range(2):
+        controller.release(controller.acquire("proxy"))
+    assert not controller._clients
+
+    controller = AdmissionController(
+        global_rate=0.01, global_burst=1, client_rate=0.01, client_burst=2
+    )
+    controller.release(controller.acquire("a"))
+    with pytest.raises(AdmissionRejected):
+        controller.acquire("b")
+    assert controller._clients["b"].tokens == pytest.approx(2, abs=0.01)
+
+
+def test_global_rate_limit():
+    controller = AdmissionController(global_rate=0.01, global_burst=2)
+    controller.acquire("a")
+    controller.acquire("b")
+    with pytest.raises(AdmissionRejected):
+        controller.acquire("c", PRIORITY_STAFF)
+
+
+def start_waiter(controller, client, priority, order):
+    def run():
+        try:
+            ticket = controller.acquire(client, priority)
+            order.append(client)
+            controller.release(ticket)
+        except AdmissionRejected as e:
+            order.append(client + ":" + e.reason)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_staff_are_admitted_before_anonymous_waiters():
+    controller = AdmissionController(min_concurrency=1, max_concurrency=1)
+    ticket = controller.acquire("busy")
+    order = []
+    threads = [start_waiter(controller, "anon", PRIORITY_ANONYMOUS, order)]
+    time.sleep(0.05)
+    threads.append(start_waiter(controller, "staff", PRIORITY_STAFF, order))
+    time.sleep(0.05)
+    controller.release(ticket)
+    for thread in threads:
+        thread.join()
+    assert order == ["staff", "anon"]
+
+
+def test_full_queue_sheds_lowest_priority():
+    controller = AdmissionController(min_concurrency=1, max_concurrency=1, max_queue=1)
+    ticket = controller.acquire("busy")
+    order = []
+    anon = start_waiter(controller, "anon", PRIORITY_ANONYMOUS, order)
+    time.sleep(0.05)
+
+    # Another anonymous request is rejected immediately ...
+    with pytest.raises(AdmissionRejected):
+        controller.acquire("late")
+    # ... while staff displace the queued anonymous request
+    staff = start_waiter(controller, "staff", PRIORITY_STAFF, order)
+    anon.join()
+    controller.release(ticket)
+    staff.join()
+    assert order == ["anon:shed for higher priority", "staff"]
+    assert controller.stats()["shed"] == 2
+
+
+def test_queue_timeout():
+    controller = AdmissionController(
+        min_concurrency=1, max_concurrency=1, queue_timeout=0.05
+    )
+    controller.acquire("busy")
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.acquire("waiting")
+    assert excinfo.value.reason == "queue timeout"
+    assert controller.stats()["queued"] == 0
+
+
+def test_concurrency_limit_adapts_to_latency():
+    controller = AdmissionController(
+        min_concurrency=2, max_concurrency=10, latency_target=0.01
+    )
+    ticket = controller.acquire("a")
+    time.sleep(0.02)
+    controller.release(ticket)
+    assert controller.limit == 9
+
+    controller.latency_target = 10
+    controller.release(controller.acquire("a"))
+    assert 9 < controller.limit < 10
@@ -1,8 +1,44 @@
 """Tests for Flask routes in app.py"""
 
+import io
 import json
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock, PropertyMock
+
+from recog_ai.retrieval import Retrieval
+
+
+@pytest.fixture(autouse=True)
+def admission(monkeypatch):
+    """Start each test with full token buckets."""
+    import app as app_module
+    from recog_ai.admission import AdmissionController
+
+    monkeypatch.setattr(app_module, "admission", AdmissionController.from_env())
+
+
+@pytest.fixture(autouse=True)
+def decision_log(tmp_path, monkeypatch):
+    """Log decisions of each test to its own directory."""
+    import app as app_module
+    from recog_ai.audit import DecisionLog
+
+    log = DecisionLog(str(tmp_path / "audit"))
+    monkeypatch.setattr(app_module, "decision_log", log)
+    return log
+
+
+@pytest.fixture(autouse=True)
+def precedent_index(tmp_path, monkeypatch):
+    """Keep confirmed precedents of each test in its own database."""
+    import app as app_module
+    from recog_ai.precedents import PrecedentIndex
+
+    index = PrecedentIndex(
+        str(tmp_path / "precedents.sqlite3"), app_module.embedding.embed_query
+    )
+    monkeypatch.setattr(app_module, "precedent_index", index)
+    return index
 
 
 class TestIndexRoute:
@@ -21,6 +57,90 @@ class TestIndexRoute:
         assert b"Willkommen" in response.data
 
 
+class TestReadiness:
+    """Test the readiness probe."""
+
+    def test_readyz_reports_warm_up(self, monkeypatch):
+        import app as app_module
+        from recog_ai.warmstart import WarmStart
+
+        client = app_module.app.test_client()
+        assert app_module.warm_start.ready.wait(60)
+        response = client.get("/readyz")
+        assert response.status_code == 200
+        assert "vector_index" in response.get_json()["steps"]
+
+        monkeypatch.setattr(app_module, "warm_start", WarmStart("unused"))
+        response = client.get("/readyz")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+
+
+class TestMemoryDiagnostics:
+    """Test the memory diagnostics endpoint."""
+
+    def test_memory_report_lists_components(self, monkeypatch):
+        from app import app
+
+        client = app.test_client()
+        monkeypatch.delenv("STAFF_TOKEN", raising=False)
+        assert client.get("/diagnostics/memory").status_code == 404
+
+        monkeypatch.setenv("STAFF_TOKEN", "secret")
+        assert client.get("/diagnostics/memory").status_code == 403
+        headers = {"X-Staff-Token": "secret"}
+        report = client.get("/diagnostics/memory", headers=headers).get_json()
+        assert {"embedding_model", "vector_index", "visualization", "suggestion_cache"} <= set(
+            report["components"]
+        )
+        assert report["components"]["suggestion_cache"]["max_bytes"] > 0
+        assert report["accounted_bytes"] >= report["components"]["static_assets"]["bytes"]
+
+
+class TestStaticAssets:
+    """Test caching and compression of static files and pages."""
+
+    def test_static_files_are_revalidated_by_etag(self):
+        from app import app
+
+        client = app.test_client()
+        response = client.get("/static/style.css", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Cache-Control"] == "no-cache"
+
+        etag = response.headers["ETag"]
+        response = client.get("/static/style.css", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert client.get("/static/missing.css").status_code == 404
+
+    def test_visualize_bundle_is_cached_long(self):
+        from app import app
+
+        client = app.test_client()
+        page = client.get("/visualize")
+        assert page.status_code == 200
+        assert b"./assets/index-351494fc.js" in page.data
+
+        bundle = client.get("/assets/index-351494fc.js", headers={"Accept-Encoding": "gzip"})
+        assert bundle.mimetype == "text/javascript"
+        assert "immutable" in bundle.headers["Cache-Control"]
+        assert len(bundle.data) < 1008920
+
+    def test_rendered_pages_are_gzipped_and_conditional(self):
+        import gzip
+
+        from app import app
+
+        client = app.test_client()
+        response = client.get("/", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert b"Willkommen" in gzip.decompress(response.data)
+
+        etag = response.headers["ETag"]
+        assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+
+
 class TestFindModuleRoute:
     """Test the find_module route."""
 
@@ -54,35 +174,407 @@ class TestFindModuleRoute:
 class TestSelectModuleRoute:
     """Test the select_module route."""
 
-    def test_select_module_handles_missing_original_doc(self):
-        """Test that select_module handles external modules without original_doc."""
+    def test_select_module_requires_workspace(self):
+        """Test that modules posted as JSON instead of a workspace are refused."""
         from app import app
 
         app.config["TESTING"] = True
         client = app.test_client()
 
-        internal_module = {
-            "title": "Internal",
-            "learninggoals": [],
-        }
-        external_module = {
-            "title": "External",
-            "learninggoals": [],
-        }
+        response = client.post(
+            "/select_module",
+            data={
+                "selected_module": json.dumps({"title": "Internal"}),
+                "external_module": json.dumps({"title": "External"}),
+            },
+        )
+        assert response.status_code == 400
+
+    def test_select_module_rejects_negative_candidate_id(self):
+        """Test that candidate IDs cannot index from the end of the list."""
+        from app import app, workspace_store
 
+        app.config["TESTING"] = True
+        token = workspace_store.create(
+            {
+                "external_module": {"title": "External", "learninggoals": []},
+                "external_module_json": json.dumps({"title": "External"}),
+                "candidates": [{"title": "Internal", "json": '{"title": "Internal"}'}],
+                "internal_goals": {},
+            }
+        )
+        response = app.test_client().post(
+            "/select_module", data={"workspace": token, "candidate_id": "-1"}
+        )
+        assert response.status_code == 400
+
+
+class TestAssessCandidatesRoute:
+    """Test the assess_candidates route."""
+
+    def test_assess_candidates_renders_ranking(self):
+        """Test that ranked assessments are rendered."""
+        from app import app, workspace_store
+
+        app.config["TESTING"] = True
+        client = app.test_client()
+
+        candidate = {"title": "Internal"}
+        token = workspace_store.create(
+            {
+                "external_module": {"title": "External", "learninggoals": []},
+                "external_module_json": json.dumps({"title": "External"}),
+                "candidates": [candidate],
+                "internal_goals": {},
+            }
+        )
         with patch("app.RecognitionAssistant") as mock_assistant_class:
             mock_assistant = MagicMock()
-            mock_assistant.get_module_info.return_value = {"learninggoals": []}
-            mock_assistant.get_examination_result.return_value = "<p>Result</p>"
+            mock_assistant.assess_candidates = AsyncMock(
+                return_value=[
+                    {
+                        "rank": 1,
+                        "module": candidate,
+                        "verdict": "full",
+                        "result": "<p>Result</p>",
+                        "error": None,
+                        "elapsed": 1.0,
+                    }
+                ]
+            )
             mock_assistant_class.return_value = mock_assistant
 
             response = client.post(
-                "/select_module",
-                data={
-                    "selected_module": json.dumps(internal_module),
-                    "external_module": json.dumps(external_module),
+                "/assess_candidates",
+                data={"workspace": token, "stop_on_full": "on"},
+            )
+
+            assert response.status_code == 200
+            assert "Vollständige Anerkennung".encode() in response.data
+            kwargs = mock_assistant.assess_candidates.call_args.kwargs
+            assert kwargs["stop_on_full"] is True
+
+
+class TestWorkspaceFlow:
+    """Test that forms only carry workspace IDs."""
+
+    def test_select_module_uses_workspace(self):
+        """Test selecting a candidate by ID from a stored workspace."""
+        from app import app, workspace_store
+
+        app.config["TESTING"] = True
+        client = app.test_client()
+
+        token = workspace_store.create(
+            {
+                "external_module": {"title": "External", "learninggoals": []},
+                "external_module_json": json.dumps({"title": "External"}),
+                "candidates": [{"title": "Internal", "json": '{"title": "Internal"}'}],
+                "internal_goals": {},
+            }
+        )
+
+        with patch("app.RecognitionAssistant") as mock_assistant_class:
+            mock_assistant = MagicMock()
+            mock_assistant.aget_module_info = AsyncMock(
+                return_value={"learninggoals": ["Ziel"]}
+            )
+            mock_assistant.aget_examination_result = AsyncMock(
+                return_value="<p>Result</p>"
+            )
+            mock_assistant_class.return_value = mock_assistant
+
+            for _ in range(2):
+                response = client.post(
+                    "/select_module", data={"workspace": token, "candidate_id": "0"}
+                )
+                assert response.status_code == 200
+                assert b"Ziel" in response.data
+
+            # Learning goals of an already examined candidate are reused
+            assert mock_assistant.aget_module_info.await_count == 1
+            mock_assistant.aget_examination_result.assert_awaited_with(
+                '{"title": "Internal"}', json.dumps({"title": "External"})
+            )
+
+    def test_select_module_logs_and_reuses_decisions(self, decision_log, monkeypatch):
+        """Test that decisions are logged and identical examinations reused."""
+        from app import app, workspace_store
+
+        monkeypatch.setattr("app.AUDIT_REUSE_RESULTS", True)
+
+        app.config["TESTING"] = True
+        client = app.test_client()
+
+        def workspace():
+            return workspace_store.create(
+                {
+                    "external_module": {"title": "External", "learninggoals": []},
+                    "external_module_json": json.dumps({"title": "External"}),
+                    "candidates": [
+                        {"title": "Internal", "json": '{"title": "Internal"}'}
+                    ],
+                    "internal_goals": {},
+                }
+            )
+
+        with patch("app.RecognitionAssistant") as mock_assistant_class:
+            mock_assistant = MagicMock()
+            mock_assistant._llm_for.return_value.model = "exam-model"
+            mock_assistant.examination_prompt_key.return_value = "prompt-v1"
+            mock_assistant.aget_module_info = AsyncMock(
+                return_value={"learninggoals": ["Ziel"]}
+            )
+            mock_assistant.aget_examination_result = AsyncMock(
+                return_value="<p>*Vollständige Anerkennung*</p>"
+            )
+            mock_assistant_class.return_value = mock_assistant
+
+            for _ in range(2):
+                response = client.post(
+                    "/select_module", data={"workspace": workspace(), "candidate_id": "0"}
+                )
+                assert response.status_code == 200
+
+            # A changed prompt template is examined again
+            mock_assistant.examination_prompt_key.return_value = "prompt-v2"
+            response = client.post(
+                "/select_module", data={"workspace": workspace(), "candidate_id": "0"}
+            )
+            assert response.status_code == 200
+
+        assert mock_assistant.aget_examination_result.await_count == 2
+        assert decision_log.flush()
+        frame = decision_log.load()
+        assert list(frame["verdict"]) == ["full", "full", "full"]
+        assert list(frame["reused"]) == [False, True, False]
+        assert set(frame["model"]) == {"exam-model"}
+
+    def test_confirmed_decision_is_shown_without_llm(self, monkeypatch):
+        """Test that a confirmed decision is surfaced for the same document."""
+        from app import app, workspace_store
+
+        monkeypatch.setenv("STAFF_TOKEN", "secret")
+        app.config["TESTING"] = True
+        client = app.test_client()
+        doc = "Modul Statistik mit Regression"
+        token = workspace_store.create(
+            {
+                "external_module": {
+                    "title": "Statistik",
+                    "learninggoals": ["Regression"],
+                    "original_doc": doc,
                 },
+                "external_module_json": json.dumps({"title": "Statistik"}),
+                "candidates": [{"title": "Statistik I", "json": '{"title": "Statistik I"}'}],
+                "internal_goals": {},
+            }
+        )
+
+        response = client.post(
+            "/confirm_decision",
+            data={"workspace": token, "candidate_id": "0", "verdict": "partial"},
+            headers={"X-Staff-Token": "secret"},
+        )
+        assert response.status_code == 200
+
+        with patch("app.RecognitionAssistant") as mock_assistant_class, patch(
+            "app.suggestion_cache.lookup", return_value=None
+        ):
+            mock_assistant = MagicMock()
+            mock_assistant.aget_module_info = AsyncMock()
+            mock_assistant.aretrieve = AsyncMock(return_value=Retrieval([]))
+            mock_assistant_class.return_value = mock_assistant
+
+            response = client.post(
+                "/find_module",
+                data={"text": doc, "file": (io.BytesIO(b""), "")},
+            )
+
+        assert response.status_code == 200
+        assert "Bekannte Anerkennungen".encode() in response.data
+        assert "Teilweise Anerkennung".encode() in response.data
+        mock_assistant.aget_module_info.assert_not_awaited()
+        query = mock_assistant.aretrieve.await_args.args[0]
+        assert "Regression" in query
+
+    def test_confirm_decision_requires_staff_token(self, monkeypatch):
+        """Test that confirmations are refused without the staff token."""
+        from app import app
+
+        monkeypatch.setenv("STAFF_TOKEN", "secret")
+        app.config["TESTING"] = True
+        response = app.test_client().post(
+            "/confirm_decision",
+            data={"workspace": "x", "candidate_id": "0", "verdict": "full"},
+        )
+        assert response.status_code == 403
+
+    def test_confirm_decision_is_disabled_without_staff_token(self, monkeypatch):
+        """Test that nobody can confirm decisions when no staff token is set."""
+        from app import app
+
+        monkeypatch.delenv("STAFF_TOKEN", raising=False)
+        app.config["TESTING"] = True
+        response = app.test_client().post(
+            "/confirm_decision",
+            data={"workspace": "x", "candidate_id": "0", "verdict": "full"},
+        )
+        assert response.status_code == 404
+
+    def test_expired_workspace_returns_410(self):
+        """Test that an unknown workspace token is reported as expired."""
+        from app import app
+
+        app.config["TESTING"] = True
+        client = app.test_client()
+
+        response = client.post(
+            "/select_module", data={"workspace": "expired", "candidate_id": "0"}
+        )
+        assert response.status_code == 410
+
+
+class TestAdmissionControl:
+    """Test load shedding on LLM-bound routes."""
+
+    def test_shed_request_returns_503_with_retry_after(self):
+        """Test that rejected requests fail fast with Retry-After."""
+        from app import app
+        from recog_ai.admission import AdmissionRejected
+
+        app.config["TESTING"] = True
+        client = app.test_client()
+
+        with patch(
+            "app.admission.acquire", side_effect=AdmissionRejected("queue full", 4.2)
+        ):
+            response = client.post("/select_module", data={"workspace": "x"})
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+        # GET requests are not admission controlled
+        assert client.get("/find_module").status_code == 200
+
+
+class TestCombinedUploads:
+    """Test uploads containing several modules."""
+
+    def test_combined_upload_streams_one_result_per_module(self):
+        """Test that each module of a combined upload gets its own result."""
+        from app import app
+
+        app.config["TESTING"] = True
+        client = app.test_client()
+        filler = "Die Studierenden lernen Grundlagen und wenden sie an. " * 5
+        doc = "".join(
+            f"Modulbezeichnung: {title}\n{filler}\n" for title in ("Statistik", "Analysis")
+        )
+
+        with patch("app.RecognitionAssistant") as mock_assistant_class, patch(
+            "app.suggestion_cache.lookup", return_value=None
+        ):
+            mock_assistant = MagicMock()
+            mock_assistant.aget_module_info = AsyncMock(
+                side_effect=lambda text: {"title": text.split("\n")[0][18:]}
+            )
+            mock_assistant.aretrieve = AsyncMock(
+                return_value=Retrieval([{"title": "Intern", "json": '{"title": "Intern"}'}])
+            )
+            mock_assistant_class.return_value = mock_assistant
+
+            response = client.post(
+                "/find_module",
+                data={"file": [(io.BytesIO(doc.encode()), "handbuch.txt")]},
             )
+            assert response.is_streamed
+            body = response.get_data(as_text=True)
+
+        assert response.status_code == 200
+        assert body.count("module-result") == 2
+        assert "Statistik" in body and "Analysis" in body
+        assert mock_assistant.aget_module_info.await_count == 2
+
+    def test_unsupported_file_type_returns_415(self):
+        """Test that unknown file types are rejected."""
+        from app import app
+
+        app.config["TESTING"] = True
+        response = app.test_client().post(
+            "/find_module", data={"file": (io.BytesIO(b"x"), "module.docx")}
+        )
+        assert response.status_code == 415
+
+
+class TestSuggestionCache:
+    """Test that cached suggestions follow the vector store snapshot."""
+
+    def test_cache_namespace_changes_with_snapshot(self):
+        from app import cache_namespace, moduledb_handle, suggestion_cache
+
+        suggestion_cache.store("Modul Statistik", ["alt"], namespace=cache_namespace("all"))
+        assert suggestion_cache.lookup("Modul Statistik", namespace=cache_namespace("all"))
+        with patch.object(
+            type(moduledb_handle), "path", new_callable=PropertyMock, return_value="neu"
+        ):
+            namespace = cache_namespace("all")
+        assert suggestion_cache.lookup("Modul Statistik", namespace=namespace) is None
+        suggestion_cache.clear()
+
+
+class TestDegradedMode:
+    """Test behaviour while the LLM circuit is open."""
+
+    def test_find_module_shows_embedding_only_notice(self):
+        """Test that degraded extraction still renders suggestions with a notice."""
+        from app import app, suggestion_cache
+
+        app.config["TESTING"] = True
+        client = app.test_client()
+        suggestion_cache.clear()
+
+        with patch("app.RecognitionAssistant") as mock_assistant_class:
+            mock_assistant = MagicMock()
+            mock_assistant.aget_module_info = AsyncMock(
+                return_value={
+                    "title": "",
+                    "learninggoals": [],
+                    "level": "",
+                    "raw_document": "Statistik Grundlagen",
+                    "original_doc": "Statistik Grundlagen",
+                    "error": "Circuit open",
+                    "degraded": True,
+                }
+            )
+            mock_assistant.aretrieve = AsyncMock(
+                return_value=Retrieval([{"title": "Statistik", "json": "{}"}])
+            )
+            mock_assistant_class.return_value = mock_assistant
+
+            response = client.post(
+                "/find_module",
+                data={"text": "Statistik Grundlagen", "file": (io.BytesIO(b""), "")},
+            )
+
+        assert response.status_code == 200
+        assert "nicht erreichbar" in response.data.decode("utf-8")
+        assert b"assess_candidates" not in response.data
+        mock_assistant.aretrieve.assert_awaited_once()
+        assert (
+            mock_assistant.aretrieve.await_args.args[0]
+            == "Statistik Grundlagen"
+        )
+
+    def test_open_circuit_returns_503(self):
+        """Test that examinations fail fast while the circuit is open."""
+        from app import app
+        from recog_ai.circuit_breaker import CircuitOpenError
+
+        app.config["TESTING"] = True
+        client = app.test_client()
+
+        with patch("app.load_workspace", side_effect=CircuitOpenError("llm", 12.5)):
+            response = client.post("/select_module", data={"workspace": "x"})
 
-            # Should handle gracefully even if original_doc is missing
-            assert response.status_code in [200, 500]
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "13"
@@ -0,0 +1,76 @@
+"""Tests for in-memory static assets and response compression."""
+
+import gzip
+
+from flask import Response
+
+from recog_ai.assets import (
+    IMMUTABLE,
+    AssetCache,
+    compress_response,
+    negotiate_encoding,
+)
+
+SCRIPT = b"console.log('Modulanerkennung');\n" * 100
+
+
+def make_cache(tmp_path):
+    (tmp_path / "index-351494fc.js").write_bytes(SCRIPT)
+    (tmp_path / "index.html").write_bytes(b"<html>" + b"<p>Seite</p>" * 50 + b"</html>")
+    (tmp_path / "icon.png").write_bytes(b"\x89PNG" * 100)
+    (tmp_path / "server.py").write_text("secret = 1")
+    return AssetCache(str(tmp_path))
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip, deflate, br", ["gzip", "br"]) == "gzip"
+    assert negotiate_encoding("gzip;q=0.5, br", ["gzip", "br"]) == "br"
+    assert negotiate_encoding("gzip;q=0", ["gzip"]) is None
+    assert negotiate_encoding("*", ["gzip"]) == "gzip"
+    assert negotiate_encoding(None, ["gzip"]) is None
+
+
+def test_assets_are_precompressed_and_revalidated(tmp_path):
+    cache = make_cache(tmp_path)
+    assert "server.py" not in cache.assets
+    assert cache.response("server.py") is None
+
+    plain = cache.response("index-351494fc.js")
+    assert plain.get_data() == SCRIPT
+    assert plain.mimetype == "text/javascript"
+    assert plain.headers["Cache-Control"] == IMMUTABLE
+    assert "Accept-Encoding" in plain.vary
+
+    zipped = cache.response("index-351494fc.js", accept_encoding="gzip")
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(zipped.get_data()) == SCRIPT
+    assert zipped.get_etag()[0] != plain.get_etag()[0]
+
+    # Either representation's ETag validates the other
+    etag = zipped.headers["ETag"]
+    not_modified = cache.response("index-351494fc.js", if_none_match=etag)
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b""
+    assert cache.response("index-351494fc.js", if_none_match='"other"').status_code == 200
+
+    page = cache.response("index.html", accept_encoding="gzip")
+    assert page.headers["Cache-Control"] == "no-cache"
+    assert "Content-Encoding" in page.headers
+
+    image = cache.response("icon.png", accept_encoding="gzip")
+    assert image.mimetype == "image/png"
+    assert "Content-Encoding" not in image.headers
+
+
+def test_compress_response():
+    body = "<p>Modulvorschläge</p>" * 100
+    response = compress_response(Response(body), "gzip, br")
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.get_data()).decode() == body
+
+    assert "Content-Encoding" not in compress_response(Response(body), "identity").headers
+    assert "Content-Encoding" not in compress_response(Response("<p>kurz</p>"), "gzip").headers
+
+    streamed = compress_response(Response(iter([body])), "gzip")
+    assert streamed.is_streamed
+    assert "Content-Encoding" not in streamed.headers
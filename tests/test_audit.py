@@ -0,0 +1,149 @@
+"""Tests for the decision log and LLM token usage tracking."""
+
+import asyncio
+import glob
+import os
+import threading
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from recog_ai.audit import DecisionLog, inputs_hash
+from recog_ai.llm_client import LLMClient, track_usage
+
+
+def decision(verdict, tokens=100, **overrides):
+    record = {
+        "route": "select_module",
+        "inputs_hash": inputs_hash("internal", verdict, "model"),
+        "model": "model",
+        "verdict": verdict,
+        "total_ms": 1000.0,
+        "input_tokens": tokens,
+        "output_tokens": tokens // 2,
+        "result": f"<p>{verdict}</p>",
+    }
+    record.update(overrides)
+    return record
+
+
+def test_log_is_written_in_background_and_indexed(tmp_path):
+    log = DecisionLog(str(tmp_path), flush_interval=60)
+    assert log.log(decision("full"))
+    assert log.flush()
+    (segment,) = glob.glob(str(tmp_path / "decisions-*.jsonl"))
+
+    frame = log.load()
+    assert list(frame["verdict"]) == ["full"]
+    assert frame.loc[0, "timestamp"] > 0
+
+    # A fresh process rebuilds the lookup index from disk
+    reopened = DecisionLog(str(tmp_path))
+    previous = reopened.lookup(inputs_hash("internal", "full", "model"))
+    assert previous["result"] == "<p>full</p>"
+    assert reopened.lookup(inputs_hash("internal", "full", "other")) is None
+    reopened.log(decision("partial"))
+    assert reopened.lookup(inputs_hash("internal", "partial", "model"))["verdict"] == (
+        "partial"
+    )
+
+
+def test_lookup_expires_results_and_bounds_the_index(tmp_path):
+    log = DecisionLog(str(tmp_path), reuse_max_age=3600, max_index_entries=2)
+    log.log(decision("old", timestamp=time.time() - 7200))
+    log.log(decision("full"))
+    log.flush()
+
+    reopened = DecisionLog(str(tmp_path), reuse_max_age=3600, max_index_entries=2)
+    assert reopened.lookup(inputs_hash("internal", "old", "model")) is None
+    assert reopened.lookup(inputs_hash("internal", "full", "model"))["verdict"] == "full"
+    assert len(reopened._index) == 1
+
+    reopened.log(decision("partial"))
+    reopened.log(decision("none"))
+    assert reopened.lookup(inputs_hash("internal", "full", "model")) is None
+    assert reopened.lookup(inputs_hash("internal", "none", "model"))["verdict"] == "none"
+    assert inputs_hash("i", "e", "m", "prompt-v1") != inputs_hash("i", "e", "m", "prompt-v2")
+
+
+def test_compaction_to_columnar_and_aggregates(tmp_path):
+    log = DecisionLog(str(tmp_path))
+    yesterday = time.time() - 86400
+    log.log(decision("full", tokens=100, timestamp=yesterday))
+    log.log(decision("full", tokens=300, timestamp=yesterday + 1))
+    log.log(decision("none", tokens=50, reused=True))
+    log.flush()
+
+    (written,) = log.compact()
+    assert written.endswith((".parquet", ".csv.gz"))
+    assert len(glob.glob(str(tmp_path / "decisions-*.jsonl"))) == 1
+
+    rows = {row["verdict"]: row for row in log.aggregate(by=["verdict"])}
+    assert rows["full"]["count"] == 2
+    assert rows["full"]["input_tokens"] == 400
+    assert rows["full"]["share"] == 2 / 3
+    assert rows["none"]["reused"] == 1.0
+    assert [row["count"] for row in log.aggregate(since=yesterday + 2)] == [1]
+
+    # Compacting again merges into the existing columnar file
+    log.compact(include_active=True)
+    assert not glob.glob(str(tmp_path / "decisions-*.jsonl"))
+    assert len(log.load()) == 3
+    assert all(os.path.getsize(path) > 0 for path in glob.glob(str(tmp_path / "*")))
+
+
+def test_compaction_excludes_other_processes(tmp_path):
+    first, second = DecisionLog(str(tmp_path)), DecisionLog(str(tmp_path))
+    yesterday = time.time() - 86400
+    first.log(decision("full", timestamp=yesterday))
+    first.log(decision("none", result=None, timestamp=yesterday))
+    first.flush()
+
+    # Each instance has its own thread lock, as separate workers would
+    frames = []
+    with first._locked_files(exclusive=True):
+        reader = threading.Thread(target=lambda: frames.append(second.load()))
+        reader.start()
+        reader.join(0.2)
+        assert reader.is_alive()
+    reader.join()
+    assert len(frames[0]) == 2
+
+    assert len(first.compact()) == 1
+    assert second.compact() == []
+    assert len(second.load()) == 2
+
+    # The missing result reads back from the columnar file as NaN
+    reopened = DecisionLog(str(tmp_path))
+    assert reopened.lookup(inputs_hash("internal", "none", "model")) is None
+    assert reopened.lookup(inputs_hash("internal", "full", "model"))["verdict"] == "full"
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path, monkeypatch):
+    log = DecisionLog(str(tmp_path), max_queue=1)
+    monkeypatch.setattr(log, "_ensure_worker", lambda: None)
+    assert log.log(decision("full"))
+    assert not log.log(decision("full"))
+    assert log.stats()["dropped"] == 1
+
+
+def test_track_usage_sums_concurrent_calls():
+    client = LLMClient(model="usage-model")
+
+    def respond(messages):
+        return AIMessage(
+            content="ok",
+            usage_metadata={"input_tokens": 10, "output_tokens": 5, "total_tokens": 15},
+        )
+
+    client._invoke = respond
+
+    async def main():
+        return await asyncio.gather(
+            asyncio.to_thread(client.invoke, [HumanMessage(content="usage a")]),
+            asyncio.to_thread(client.invoke, [HumanMessage(content="usage b")]),
+        )
+
+    with track_usage() as usage:
+        asyncio.run(main())
+    assert usage == {"calls": 2, "input_tokens": 20, "output_tokens": 10}
@@ -0,0 +1,111 @@
+"""Tests for the semantic suggestion cache."""
+
+import zlib
+
+from recog_ai.cache import SemanticCache, normalize_document
+
+
+def trigram_embedding(text):
+    """Deterministic bag-of-trigrams embedding for tests."""
+    vector = [0.0] * 256
+    for i in range(len(text) - 2):
+        vector[zlib.crc32(text[i : i + 3].encode()) % 256] += 1.0
+    return vector
+
+
+class CountingEmbedding:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return trigram_embedding(text)
+
+
+DOC = (
+    "Modul Datenbanken. Lernziele: Die Studierenden können relationale Modelle "
+    "entwerfen, SQL-Anfragen formulieren und Transaktionen erklären. 5 ECTS."
+)
+
+
+def test_normalize_document_strips_page_headers_and_whitespace():
+    raw = "Seite 1 von 3\nModul   Datenbanken\n\n- 2 -\nLernziele"
+    assert normalize_document(raw) == "modul datenbanken lernziele"
+
+
+def test_formatting_differences_are_exact_hits_without_embedding():
+    embed = CountingEmbedding()
+    cache = SemanticCache(embed, threshold=0.95)
+    cache.store(DOC, {"title": "Datenbanken"})
+    calls = embed.calls
+
+    value = cache.lookup("Page 1 of 2\n" + DOC.replace(" ", "  ").upper())
+    assert value == {"title": "Datenbanken"}
+    assert embed.calls == calls
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_near_duplicates_are_semantic_hits():
+    cache = SemanticCache(trigram_embedding, threshold=0.9)
+    cache.store(DOC, ["suggestion"])
+    assert cache.lookup(DOC + " Prüfungsform: Klausur.") == ["suggestion"]
+    assert cache.lookup("Modul Kunstgeschichte der Renaissance in Italien.") is None
+    stats = cache.stats()
+    assert stats["semantic_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_namespaces_are_isolated():
+    cache = SemanticCache(trigram_embedding)
+    cache.store(DOC, "thl", namespace="Technische Hochschule Lübeck")
+    assert cache.lookup(DOC, namespace="Universität Bielefeld") is None
+    assert cache.lookup(DOC, namespace="Technische Hochschule Lübeck") == "thl"
+
+
+def test_miss_embedding_is_reused_on_store():
+    embed = CountingEmbedding()
+    cache = SemanticCache(embed)
+    assert cache.lookup(DOC) is None
+    cache.store(DOC, "value")
+    assert embed.calls == 1
+
+
+def test_lru_eviction_and_copy_semantics():
+    cache = SemanticCache(trigram_embedding, max_entries=2)
+    cache.store("erstes modul mathematik", {"n": 1})
+    cache.store("zweites modul physik", {"n": 2})
+    cache.lookup("erstes modul mathematik")["n"] = 99
+    cache.store("drittes modul chemie", {"n": 3})
+
+    assert cache.lookup("zweites modul physik") is None
+    assert cache.lookup("erstes modul mathematik") == {"n": 1}
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] == 2
+
+
+def test_disabled_cache_never_stores():
+    cache = SemanticCache(trigram_embedding, max_entries=0)
+    cache.store(DOC, "value")
+    assert cache.lookup(DOC) is None
+
+
+def test_shared_template_prefix_is_not_a_semantic_hit():
+    # Models truncating long input embed documents with a common start alike
+    def truncating_embedding(text):
+        return trigram_embedding(text[:80])
+
+    template = "Modulhandbuch Informatik. Modulbezeichnung, Verantwortliche, Turnus. "
+    cache = SemanticCache(truncating_embedding, threshold=0.9)
+    cache.store(template + DOC, ["datenbanken"])
+    other = template + "Modul Kunstgeschichte der Renaissance in Italien, 5 ECTS."
+    assert cache.lookup(other) is None
+    assert cache.lookup(template + DOC + " Prüfungsform: Klausur.") == ["datenbanken"]
+
+
+def test_snapshot_keeps_shingles():
+    cache = SemanticCache(trigram_embedding, threshold=0.9)
+    cache.store(DOC, "value")
+    restored = SemanticCache(trigram_embedding, threshold=0.9)
+    assert restored.restore(cache.snapshot()) == 1
+    assert restored.lookup(DOC + " Prüfungsform: Klausur.") == "value"
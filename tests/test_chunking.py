@@ -0,0 +1,169 @@
+"""Tests for multi-vector (chunked) module indexing."""
+
+import zlib
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from recog_ai.chunking import (
+    ChunkedModuleIndex,
+    MODULE_ID_KEY,
+    build_chunk_index,
+    get_chunk_database,
+    has_chunk_index,
+    split_module,
+)
+from recog_ai.config import get_module_database
+from recog_ai.sync import ModuleRecord, resolve_snapshot, sync_vectorstore
+from recog_ai.utils import distance_to_similarity
+
+
+class WordEmbeddings(Embeddings):
+    """Normalized bag-of-words hashing, so shared words mean similarity."""
+
+    def _embed(self, text):
+        vector = np.zeros(64)
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode()) % 64] += 1
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+FILLER = "\n\n".join(f"Abschnitt {i} über allgemeine Grundlagen und Methoden" for i in range(40))
+
+RECORDS = [
+    ModuleRecord(
+        "stats",
+        FILLER,
+        {
+            "title": "Statistik",
+            "learninggoals": ["Grundlagen kennen", "lineare Regression anwenden"],
+        },
+    ),
+    ModuleRecord(
+        "db",
+        "Relationale Datenbanken und SQL Abfragen",
+        {"title": "Datenbanken", "learninggoals": ["SQL Abfragen formulieren"]},
+    ),
+    ModuleRecord("prog", "Programmierung in Python", {"title": "Programmierung"}),
+]
+
+
+def test_split_module_yields_title_goals_and_content_windows():
+    sections = split_module(
+        {"title": "Statistik", "learning_outcomes": "- Tests anwenden\n- Daten plotten"},
+        FILLER,
+        max_chars=300,
+    )
+    kinds = [kind for kind, _ in sections]
+    assert kinds[:3] == ["title", "goal", "goal"]
+    assert sections[1][1] == "Tests anwenden"
+    assert kinds.count("content") > 1
+    assert all(len(text) <= 300 for _, text in sections)
+
+
+def test_distance_to_similarity_on_normalized_vectors():
+    a, b = np.array([1.0, 0.0]), np.array([0.6, 0.8])
+    assert distance_to_similarity(float(((a - b) ** 2).sum())) == pytest.approx(a @ b)
+
+
+@pytest.fixture
+def store(tmp_path):
+    root = str(tmp_path / "vs")
+    sync_vectorstore(RECORDS, WordEmbeddings(), vectorstore_path=root, chunked=True)
+    return root
+
+
+def test_late_learning_goal_is_found_and_modules_are_deduplicated(store):
+    moduledb = get_module_database(WordEmbeddings(), resolve_snapshot(store))
+    index = ChunkedModuleIndex(moduledb)
+
+    results = index.similarity_search_with_score("lineare Regression anwenden", k=3)
+    titles = [doc.metadata["title"] for doc, _ in results]
+    assert titles[0] == "Statistik"
+    assert len(titles) == len(set(titles))
+    assert results[0][1] == pytest.approx(0.0, abs=1e-4)
+
+
+def test_sum_pooling_rewards_several_matching_chunks(store):
+    moduledb = get_module_database(WordEmbeddings(), resolve_snapshot(store))
+    query = "SQL Abfragen Datenbanken"
+    best = ChunkedModuleIndex(moduledb, pooling="sum").similarity_search_with_score(query, 1)
+    assert best[0][0].metadata["title"] == "Datenbanken"
+    ranked = ChunkedModuleIndex(moduledb, pooling="sum").similarity_search_with_score(
+        "Grundlagen Datenbanken", 3
+    )
+    # Statistik ranks first on many weak chunks, Datenbanken has the closest one
+    assert [doc.metadata["title"] for doc, _ in ranked][:2] == ["Statistik", "Datenbanken"]
+    distances = [distance for _, distance in ranked]
+    assert distances == sorted(distances)
+    with pytest.raises(ValueError):
+        ChunkedModuleIndex(moduledb, pooling="mean")
+
+
+def test_sync_keeps_chunks_in_step(store):
+    changed = [
+        ModuleRecord("db", "NoSQL Datenbanken", {"title": "Datenbanken II"}),
+        RECORDS[2],
+    ]
+    sync_vectorstore(changed, WordEmbeddings(), vectorstore_path=store)
+
+    moduledb = get_module_database(WordEmbeddings(), resolve_snapshot(store))
+    chunks = get_chunk_database(moduledb).get(include=["metadatas", "documents"])
+    by_module = {}
+    for metadata, text in zip(chunks["metadatas"], chunks["documents"]):
+        by_module.setdefault(metadata[MODULE_ID_KEY], []).append(text)
+    assert set(by_module) == {"db", "prog"}
+    assert "Datenbanken II" in by_module["db"]
+    assert "SQL Abfragen formulieren" not in by_module["db"]
+
+    # A full rebuild produces the same chunks
+    assert build_chunk_index(moduledb) == len(chunks["ids"])
+
+
+def test_serving_never_creates_a_chunk_index(tmp_path):
+    root = str(tmp_path / "vs")
+    records = [
+        ModuleRecord(f"m{i}", f"Modul {i} Inhalt", {"title": f"Modul {i}"}) for i in range(6)
+    ]
+    sync_vectorstore(records, WordEmbeddings(), vectorstore_path=root)
+
+    # The app opens the index of the live snapshot, then an incremental sync runs
+    moduledb = get_module_database(WordEmbeddings(), resolve_snapshot(root))
+    index = ChunkedModuleIndex(moduledb)
+    assert index.chunkdb is None
+    assert not has_chunk_index(moduledb)
+    assert len(index.similarity_search_with_score("Modul Inhalt", k=6)) == 6
+
+    records[0] = ModuleRecord("m0", "Modul 0 neuer Inhalt", {"title": "Modul 0"})
+    sync_vectorstore(records, WordEmbeddings(), vectorstore_path=root)
+    moduledb = get_module_database(WordEmbeddings(), resolve_snapshot(root))
+    assert not has_chunk_index(moduledb)
+    results = ChunkedModuleIndex(moduledb).similarity_search_with_score("Modul Inhalt", k=6)
+    assert len(results) == 6
+
+
+def test_whole_module_fallback_keeps_the_filter():
+    calls = []
+
+    class EmptyChunks:
+        def similarity_search_by_vector_with_relevance_scores(self, embedding, k, **kwargs):
+            return []
+
+    class Modules:
+        embeddings = WordEmbeddings()
+
+        def similarity_search_by_vector_with_relevance_scores(self, embedding, k, **kwargs):
+            calls.append(kwargs)
+            return []
+
+    index = ChunkedModuleIndex(Modules(), chunkdb=EmptyChunks())
+    index.similarity_search_with_score("SQL", k=2, filter={"institution": "THL"})
+    assert calls == [{"filter": {"institution": "THL"}}]
@@ -0,0 +1,134 @@
+"""Tests for the LLM circuit breaker and degraded extraction."""
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from recog_ai.assistant import RecognitionAssistant
+from recog_ai.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+from recog_ai.llm_client import LLMClient
+
+
+def fail():
+    raise ConnectionError("upstream down")
+
+
+def trip(breaker, count):
+    for _ in range(count):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+
+@pytest.fixture(autouse=True)
+def isolated_breakers(monkeypatch):
+    monkeypatch.setattr("recog_ai.circuit_breaker._breakers", {})
+
+
+def test_opens_on_failure_rate_and_fails_fast():
+    breaker = CircuitBreaker(min_calls=4, failure_rate=0.5, cooldown=60)
+    breaker.call(lambda: "ok")
+    breaker.call(lambda: "ok")
+    trip(breaker, 1)
+    assert breaker.state == CLOSED
+    trip(breaker, 1)
+    assert breaker.state == OPEN
+
+    calls = []
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.call(lambda: calls.append(1))
+    assert not calls
+    assert error.value.retry_after > 1
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_slow_successes_count_as_failures():
+    breaker = CircuitBreaker(min_calls=2, slow_call_duration=0.01)
+    for _ in range(2):
+        breaker.call(lambda: time.sleep(0.02))
+    assert breaker.is_open()
+
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker(min_calls=1, cooldown=0.05)
+    trip(breaker, 1)
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+
+    # A failing probe opens the circuit for another cooldown
+    trip(breaker, 1)
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_only_one_probe_while_half_open():
+    breaker = CircuitBreaker(min_calls=1, cooldown=0.01)
+    trip(breaker, 1)
+    time.sleep(0.02)
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_cancellation_is_not_a_failure():
+    breaker = CircuitBreaker(min_calls=1)
+
+    async def main():
+        task = asyncio.create_task(breaker.acall(lambda: asyncio.sleep(1)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert breaker.state == CLOSED
+    assert breaker.stats()["failures"] == 0
+
+
+class FailingClient(LLMClient):
+    def __init__(self):
+        super().__init__(model="broken-model", url="http://upstream")
+        self.calls = 0
+
+    def _invoke(self, messages):
+        self.calls += 1
+        raise ConnectionError("timeout")
+
+
+def test_llm_client_shares_breaker_per_upstream(monkeypatch):
+    monkeypatch.setenv("LLM_BREAKER_MIN_CALLS", "2")
+    client = FailingClient()
+    assert client.breaker is LLMClient(model="broken-model", url="http://upstream").breaker
+    for index in range(2):
+        with pytest.raises(ConnectionError):
+            client.invoke([HumanMessage(content=f"doc {index}")])
+    assert not client.available()
+    with pytest.raises(CircuitOpenError):
+        client.invoke([HumanMessage(content="doc")])
+    assert client.calls == 2
+
+
+def test_extraction_degrades_to_raw_text_while_open():
+    client = FailingClient()
+    client.breaker.min_calls = 1
+    with pytest.raises(ConnectionError):
+        client.invoke([HumanMessage(content="probe")])
+
+    assistant = RecognitionAssistant(moduledb=None, llm_client=client)
+    module = assistant.get_module_info("Modulbeschreibung Statistik")
+    assert module["degraded"] is True
+    assert module["raw_document"] == "Modulbeschreibung Statistik"
+    assert client.calls == 1
+
+    healthy = RecognitionAssistant(moduledb=None, llm_client=LLMClient(model="healthy"))
+    healthy.llm._invoke = lambda messages: AIMessage(content="no json")
+    assert healthy.get_module_info("x").get("degraded") is not True
@@ -0,0 +1,153 @@
+"""Tests for the ONNX Runtime embedding backend and query micro-batching."""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from recog_ai.embeddings import MicroBatchingEmbeddings, OnnxEmbeddings, mean_pool
+
+SAMPLES = [
+    "Datenbanken: relationale Modellierung und SQL",
+    "Die Studierenden können statistische Tests anwenden",
+    "Grundlagen der Programmierung",
+]
+
+
+def cosine(a, b):
+    a, b = np.asarray(a), np.asarray(b)
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def test_mean_pool_ignores_padding():
+    hidden = np.array([[[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]]])
+    mask = np.array([[1, 1, 0]])
+    np.testing.assert_allclose(mean_pool(hidden, mask), [[1.0, 0.0]])
+
+
+class CountingEmbeddings:
+    """Embeds a text as [len(text), 1] and records the batches it saw."""
+
+    def __init__(self, delay=0.02, fail=False):
+        self.batches = []
+        self.delay = delay
+        self.fail = fail
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("model crashed")
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+def query_concurrently(embedding, texts):
+    results = [None] * len(texts)
+    errors = []
+
+    def worker(index):
+        try:
+            results[index] = embedding.embed_query(texts[index])
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_queries_share_forward_passes():
+    model = CountingEmbeddings()
+    embedding = MicroBatchingEmbeddings(model, max_batch_size=16, max_wait=0.01)
+    texts = ["x" * (i + 1) for i in range(32)]
+
+    results, _ = query_concurrently(embedding, texts)
+    assert results == [[float(i + 1), 1.0] for i in range(32)]
+    assert len(model.batches) < len(texts)
+    assert max(len(batch) for batch in model.batches) <= 16
+    assert embedding.stats()["texts"] == 32
+
+
+def test_identical_queries_are_embedded_once_per_batch():
+    model = CountingEmbeddings(delay=0.05)
+    embedding = MicroBatchingEmbeddings(model, max_wait=0.05)
+    results, _ = query_concurrently(embedding, ["same"] * 8)
+    assert results == [[4.0, 1.0]] * 8
+    assert all(batch.count("same") == 1 for batch in model.batches)
+
+
+def test_batch_errors_reach_every_caller():
+    embedding = MicroBatchingEmbeddings(CountingEmbeddings(fail=True), max_wait=0.01)
+    _, errors = query_concurrently(embedding, ["a", "b", "c"])
+    assert [str(e) for e in errors] == ["model crashed"] * 3
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """A small random BERT with a word-level vocabulary, saved locally."""
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("onnx")
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    path = tmp_path_factory.mktemp("tiny-model")
+    words = sorted({w.strip(":").lower() for s in SAMPLES for w in s.split()})
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "passage", ":"] + words
+    (path / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    tokenizer = BertTokenizerFast(vocab_file=str(path / "vocab.txt"))
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=128,
+    )
+    model = BertModel(config).eval()
+    model.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+
+    with torch.no_grad():
+        tokens = tokenizer(["passage: " + s for s in SAMPLES], padding=True, return_tensors="pt")
+        hidden = model(**tokens).last_hidden_state.numpy()
+    reference = mean_pool(hidden, tokens["attention_mask"].numpy())
+    return str(path), reference
+
+
+@pytest.mark.parametrize("quantize, min_cosine", [(False, 0.9999), (True, 0.99)])
+def test_onnx_export_matches_pytorch(tiny_model, tmp_path, quantize, min_cosine):
+    path, reference = tiny_model
+    embeddings = OnnxEmbeddings(path, onnx_dir=str(tmp_path), quantize=quantize)
+
+    documents = embeddings.embed_documents(SAMPLES)
+    for expected, actual in zip(reference, documents):
+        assert cosine(expected, actual) >= min_cosine
+    assert cosine(embeddings.embed_query(SAMPLES[0]), documents[0]) > 0.9999
+
+    # A second instance loads the cached export instead of exporting again
+    OnnxEmbeddings(path, onnx_dir=str(tmp_path), quantize=quantize)
+
+
+def test_quantized_e5_parity_with_reference(tmp_path):
+    """Bounds the cosine drift of the int8 export against the production model."""
+    from huggingface_hub import try_to_load_from_cache
+
+    from recog_ai.config import EMBEDDING_MODEL, EMBEDDING_PROMPT
+
+    pytest.importorskip("onnx")
+    if not isinstance(try_to_load_from_cache(EMBEDDING_MODEL, "config.json"), str):
+        pytest.skip("embedding model not available in the local cache")
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    reference = HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        encode_kwargs={"normalize_embeddings": True, "prompt": EMBEDDING_PROMPT},
+    )
+    onnx = OnnxEmbeddings(EMBEDDING_MODEL, onnx_dir=str(tmp_path), quantize=True)
+    for expected, actual in zip(
+        reference.embed_documents(SAMPLES), onnx.embed_documents(SAMPLES)
+    ):
+        assert cosine(expected, actual) >= 0.98
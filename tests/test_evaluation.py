@@ -0,0 +1,172 @@
+"""Tests for the offline suggestion evaluation harness."""
+
+import json
+import os
+
+import pytest
+
+from recog_ai.assistant import RecognitionAssistant
+from recog_ai.evaluation import (
+    evaluate,
+    first_relevant_rank,
+    retrieval_policy,
+    format_table,
+    load_cases,
+    main,
+    summarize,
+)
+
+
+class DummyModule:
+    def __init__(self, title, module_id=None):
+        self.metadata = {"title": title}
+        self.page_content = title
+        self.id = module_id or title.lower()
+
+
+class RankedDB:
+    """Returns modules in a fixed order per query."""
+
+    def __init__(self, results):
+        self.results = results
+
+    def similarity_search_with_score(self, query, k):
+        titles = self.results.get(query, [])
+        return [(DummyModule(t), float(i)) for i, t in enumerate(titles[:k])]
+
+
+def write_dataset(path, rows):
+    path.write_text("\n".join(json.dumps(row) for row in rows), encoding="utf-8")
+    return str(path)
+
+
+def test_load_cases_builds_query_from_external_module(tmp_path):
+    path = write_dataset(
+        tmp_path / "pairs.jsonl",
+        [
+            {"query": "Datenbanken SQL", "accepted": "Datenbanken"},
+            {
+                "external_module": {"title": "Statistik", "learninggoals": ["Tests"]},
+                "accepted": ["  Statistik  I "],
+            },
+        ],
+    )
+    cases = load_cases(path)
+    assert cases[0].accepted == ["datenbanken"]
+    assert cases[1].query.startswith("Titel: \nStatistik")
+    assert cases[1].accepted == ["statistik i"]
+
+
+def test_load_cases_requires_labels(tmp_path):
+    path = write_dataset(tmp_path / "pairs.jsonl", [{"query": "x"}])
+    with pytest.raises(ValueError):
+        load_cases(path)
+
+
+def test_first_relevant_rank_matches_titles_case_insensitively():
+    suggestions = [{"title": "Mathe"}, {"title": "Datenbanken "}]
+    assert first_relevant_rank(suggestions, ["datenbanken"]) == 2
+    assert first_relevant_rank(suggestions, ["physik"]) is None
+
+
+def test_first_relevant_rank_prefers_module_ids():
+    suggestions = [
+        {"title": "Datenbanken", "id": "hs-a-1"},
+        {"title": "Datenbanken", "id": "hs-b-7"},
+    ]
+    assert first_relevant_rank(suggestions, ["datenbanken"], ["hs-b-7"]) == 2
+    assert first_relevant_rank(suggestions, ["datenbanken"], ["hs-c-2"]) is None
+
+
+def test_load_cases_reads_accepted_ids(tmp_path):
+    path = write_dataset(tmp_path / "pairs.jsonl", [{"query": "q", "accepted_ids": 42}])
+    (case,) = load_cases(path)
+    assert case.accepted == [] and case.accepted_ids == ["42"]
+
+
+def test_configuration_builds_policy_and_rejects_unknown_keys(tmp_path):
+    policy = retrieval_policy({"limit": 3, "min_similarity": 0.5})
+    assert policy.limit == 3 and policy.min_similarity == 0.5
+
+    db = RankedDB({"q": ["A"]})
+    path = write_dataset(tmp_path / "p.jsonl", [{"query": "q", "accepted": "A"}])
+    (case,) = load_cases(path)
+    with pytest.raises(ValueError, match="threshold"):
+        evaluate(RecognitionAssistant(db), [case], {"threshold": 0.5})
+
+
+def test_summarize_computes_recall_and_mrr():
+    metrics = summarize([1, 3, None, 7], [0.01, 0.02, 0.03, 0.04])
+    assert metrics["recall@1"] == 0.25
+    assert metrics["recall@5"] == 0.5
+    assert metrics["recall@10"] == 0.75
+    assert metrics["mrr"] == pytest.approx((1 + 1 / 3 + 1 / 7) / 4)
+    assert metrics["latency_ms"]["max"] == pytest.approx(40)
+
+
+def test_evaluate_compares_limits(tmp_path):
+    db = RankedDB({"q1": ["A", "B", "C", "D", "E", "F"], "q2": ["X", "Y"]})
+    assistant = RecognitionAssistant(db)
+    path = write_dataset(
+        tmp_path / "pairs.jsonl",
+        [{"query": "q1", "accepted": ["F"]}, {"query": "q2", "accepted": ["X"]}],
+    )
+    cases = load_cases(path)
+
+    small = evaluate(assistant, cases, {"name": "small", "limit": 5})
+    large = evaluate(assistant, cases, {"name": "large", "limit": 10})
+    assert small["recall@10"] == 0.5
+    assert large["recall@10"] == 1.0
+    assert [q["rank"] for q in large["per_query"]] == [6, 1]
+
+    table = format_table([small, large])
+    assert "small" in table and "large" in table and "R@5" in table
+
+
+def test_main_writes_json_report(tmp_path, monkeypatch, capsys):
+    db = RankedDB({"q1": ["B", "A"]})
+    backends = []
+
+    def get_embedding():
+        backends.append(os.getenv("EMBEDDING_BACKEND"))
+        return None
+
+    monkeypatch.delenv("EMBEDDING_BACKEND", raising=False)
+    monkeypatch.setattr("recog_ai.config.get_embedding", get_embedding)
+    monkeypatch.setattr("recog_ai.config.get_module_database", lambda e, p: db)
+    dataset = write_dataset(
+        tmp_path / "pairs.jsonl", [{"query": "q1", "accepted_ids": ["a"]}]
+    )
+    output = tmp_path / "report.json"
+
+    main(
+        [
+            "--dataset",
+            dataset,
+            "--vectorstore",
+            str(tmp_path / "vs"),
+            "--configs",
+            json.dumps(
+                [
+                    {"name": "top1", "limit": 1},
+                    {
+                        "name": "onnx",
+                        "limit": 2,
+                        "embedding": {"EMBEDDING_BACKEND": "onnx"},
+                    },
+                    {"name": "gap", "limit": 2, "score_gap": 0.5},
+                ]
+            ),
+            "--output",
+            str(output),
+        ]
+    )
+    report = json.loads(output.read_text())
+    assert report[0]["name"] == "top1"
+    assert report[0]["recall@1"] == 0.0
+    assert report[1]["recall@5"] == 1.0
+    # The policy of this configuration ends the list after the clear winner
+    assert report[2]["recall@5"] == 0.0
+    assert backends == [None, "onnx"]
+    assert "EMBEDDING_BACKEND" not in os.environ
+    assert "top1" in capsys.readouterr().out
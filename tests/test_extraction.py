@@ -0,0 +1,154 @@
+"""Tests for map-reduce extraction of long module descriptions."""
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+from recog_ai.assistant import RecognitionAssistant
+from recog_ai.extraction import (
+    ExtractionStrategy,
+    merge_goals,
+    merge_modules,
+    split_sections,
+)
+from recog_ai.llm_client import LLMClient
+
+PARAGRAPHS = [
+    "Titel: Statistik I\nCredits: 6",
+    "Lernziele:\n- Hypothesen testen\n- Regressionen rechnen",
+    "Weitere Lernziele:\n- hypothesen testen.\n- Daten visualisieren",
+    "Prüfungsform: Klausur",
+]
+
+
+class Response:
+    def __init__(self, content):
+        self.content = content
+
+
+class SectionClient:
+    """Answers each section with the fields found in its text."""
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def answer(self, messages):
+        text = messages[1].content
+        with self.lock:
+            self.calls.append(text)
+        if self.fail_on and self.fail_on in text:
+            raise RuntimeError("upstream error")
+        module = {"title": "", "credits": "", "learninggoals": []}
+        for line in text.splitlines():
+            if line.startswith("Titel: "):
+                module["title"] = line[len("Titel: ") :]
+            elif line.startswith("Credits: "):
+                module["credits"] = int(line[len("Credits: ") :])
+            elif line.startswith("Prüfungsform: "):
+                module["assessmenttype"] = line[len("Prüfungsform: ") :]
+            elif line.startswith("- "):
+                module["learninggoals"].append(line[2:])
+        return Response(json.dumps(module))
+
+    def invoke(self, messages):
+        return self.answer(messages)
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(0.01)
+        return self.answer(messages)
+
+
+def map_reduce_assistant(llm):
+    strategy = ExtractionStrategy(min_chars=0, section_chars=70, max_sections=4)
+    return RecognitionAssistant(None, llm_client=llm, extraction_strategy=strategy)
+
+
+def test_split_sections_keeps_paragraphs_and_respects_the_cap():
+    text = "\n\n".join(PARAGRAPHS)
+    sections = split_sections(text, section_chars=70, max_sections=4)
+    assert len(sections) == 4
+    assert sections[1] == PARAGRAPHS[1]
+    assert "".join(sections).replace("\n", "") == text.replace("\n", "")
+
+    assert len(split_sections(text, section_chars=10, max_sections=2)) == 2
+    assert split_sections("x" * 250, section_chars=100) == ["x" * 100, "x" * 100, "x" * 50]
+    assert split_sections("  ") == []
+
+
+def test_merge_goals_deduplicates_in_document_order():
+    merged = merge_goals(
+        [
+            ["Hypothesen testen", "Regressionen rechnen"],
+            ["- hypothesen testen.", "Regressionen rechnen können", "Daten visualisieren"],
+            [{"goal": "Daten visualisieren"}, ""],
+        ]
+    )
+    assert merged == [
+        "Hypothesen testen",
+        "Regressionen rechnen",
+        "Regressionen rechnen können",
+        "Daten visualisieren",
+    ]
+
+
+def test_merge_modules_takes_first_value_per_field():
+    module = merge_modules(
+        [
+            None,
+            {"title": "", "credits": 6, "learninggoals": ["A"]},
+            {"title": "Statistik", "credits": 5, "learninggoals": ["a", "B"]},
+        ]
+    )
+    assert module["title"] == "Statistik"
+    assert module["credits"] == 6
+    assert module["learninggoals"] == ["A", "B"]
+    assert module["workload"] == ""
+
+
+def test_strategy_chooses_by_document_length():
+    strategy = ExtractionStrategy(min_chars=100, section_chars=70)
+    assert strategy.sections("kurz") == []
+    assert len(strategy.sections("\n\n".join(PARAGRAPHS))) > 1
+    assert ExtractionStrategy("single", min_chars=0).sections("\n\n".join(PARAGRAPHS)) == []
+    with pytest.raises(ValueError):
+        ExtractionStrategy("parallel")
+
+
+def test_long_documents_are_extracted_per_section_and_merged():
+    llm = SectionClient(fail_on="Prüfungsform")
+    doc = "\n\n".join(PARAGRAPHS)
+    module = map_reduce_assistant(llm).get_module_info(doc)
+    assert len(llm.calls) == 4
+    assert module["title"] == "Statistik I"
+    assert module["credits"] == 6
+    assert module["learninggoals"] == [
+        "Hypothesen testen",
+        "Regressionen rechnen",
+        "Daten visualisieren",
+    ]
+    assert module["raw_document"] == doc
+
+    llm = SectionClient()
+    module = asyncio.run(map_reduce_assistant(llm).aget_module_info(doc))
+    assert len(llm.calls) == 4
+    assert module["assessmenttype"] == "Klausur"
+
+
+def test_unusable_merge_falls_back_to_single_call():
+    llm = SectionClient(fail_on="Titel")
+    module = map_reduce_assistant(llm).get_module_info("\n\n".join(PARAGRAPHS))
+    # Four section calls, then the whole document in one call
+    assert len(llm.calls) == 5
+    assert module["error"] == "upstream error"
+
+
+def test_with_max_tokens_copies_only_to_lower_the_limit():
+    client = LLMClient(model="m", max_tokens=4096, url="http://localhost", api_key="k")
+    small = client.with_max_tokens(512)
+    assert small.max_tokens == 512 and client.max_tokens == 4096
+    assert small.breaker is client.breaker
+    assert client.with_max_tokens(8192) is client
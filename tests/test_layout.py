@@ -0,0 +1,169 @@
+"""Tests for the persistent visualization layout and query placement."""
+
+import json
+import threading
+
+import numpy as np
+from flask import Flask
+
+import visualize.visualize as visualize
+from visualize.layout import Layout
+
+
+def clustered_embeddings(per_cluster=15, dims=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = np.eye(dims)[:3] * 5
+    points = np.concatenate(
+        [center + rng.normal(scale=0.1, size=(per_cluster, dims)) for center in centers]
+    )
+    ids = [f"m{i}" for i in range(len(points))]
+    return ids, points
+
+
+def documents(ids, version=""):
+    return [f"doc {i}{version}" for i in ids]
+
+
+class DummyCollection:
+    def __init__(self, ids, embeddings, version=""):
+        self.ids = ids
+        self.embeddings = embeddings
+        self.version = version
+
+    def get(self, include):
+        return {
+            "ids": self.ids,
+            "embeddings": self.embeddings.tolist(),
+            "documents": documents(self.ids, self.version),
+            "metadatas": [{"title": f"Modul {i}"} for i in self.ids],
+        }
+
+
+def test_layout_roundtrip_and_staleness(tmp_path):
+    ids, embeddings = clustered_embeddings()
+    layout = Layout.compute(ids, embeddings, documents(ids), perplexity=5, iterations=250)
+    path = str(tmp_path / "layout.npz")
+    layout.save(path)
+
+    loaded = Layout.load(path)
+    assert loaded.ids == ids
+    np.testing.assert_allclose(loaded.positions, layout.positions)
+    assert loaded.matches(ids, documents(ids))
+    assert not loaded.matches(ids[:-1], documents(ids[:-1]))
+    # A sync that rewrites texts keeps the ids
+    assert not loaded.matches(ids, documents(ids, " v2"))
+
+
+def test_query_is_placed_among_its_neighbours():
+    ids, embeddings = clustered_embeddings()
+    layout = Layout.compute(ids, embeddings, documents(ids), perplexity=5, iterations=250)
+
+    placement = layout.place(embeddings[20] + 0.01, k=5)
+    neighbour_ids = [n["id"] for n in placement["neighbours"]]
+    assert neighbour_ids[0] == "m20"
+    assert all(15 <= int(i[1:]) < 30 for i in neighbour_ids)
+
+    cluster = layout.positions[15:30]
+    assert np.all(placement["position"] >= cluster.min(0) - 1e-3)
+    assert np.all(placement["position"] <= cluster.max(0) + 1e-3)
+
+
+def test_query_endpoint_reuses_persisted_layout(tmp_path, monkeypatch):
+    ids, embeddings = clustered_embeddings()
+    path = str(tmp_path / "layout.npz")
+    Layout.compute(ids, embeddings, documents(ids), perplexity=5, iterations=250).save(path)
+
+    def no_refit(*args, **kwargs):
+        raise AssertionError("persisted layout must be reused")
+
+    monkeypatch.setattr(Layout, "compute", no_refit)
+    visualize.initChromaviz(
+        DummyCollection(ids, embeddings), embed=lambda text: embeddings[3], path=path
+    )
+    app = Flask(__name__)
+    app.register_blueprint(visualize.visualize_bp)
+    client = app.test_client()
+
+    response = client.post("/visualize/query", json={"text": "Datenbanken", "k": 3})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body["position"]) == 3
+    assert body["neighbours"][0]["id"] == "m3"
+    assert body["neighbours"][0]["title"] == "Modul m3"
+
+    assert client.post("/visualize/query", json={}).status_code == 400
+    for embedding in (["a"] * 16, [1.0] * 8, [True] * 16, "0.5"):
+        response = client.post("/visualize/query", json={"embedding": embedding})
+        assert response.status_code == 400
+    assert len(json.loads(client.get("/data").data)["points"]) == len(ids)
+
+
+def test_collection_is_loaded_on_first_use_without_embeddings(tmp_path):
+    ids, embeddings = clustered_embeddings()
+    path = str(tmp_path / "layout.npz")
+    Layout.compute(ids, embeddings, documents(ids), perplexity=5, iterations=250).save(path)
+
+    class CountingCollection(DummyCollection):
+        def __init__(self, ids, embeddings):
+            super().__init__(ids, embeddings)
+            self.includes = []
+
+        def get(self, include):
+            self.includes.append(include)
+            return super().get(include)
+
+    collection = CountingCollection(ids, embeddings)
+    visualize.initChromaviz(collection, path=path)
+    assert collection.includes == []
+    assert visualize.memory_usage() == {"bytes": 0, "loaded": False}
+
+    assert len(visualize.get_data()["ids"]) == len(ids)
+    assert collection.includes == [["documents", "metadatas"]]
+    assert visualize.get_data()["embeddings"] is None
+    assert visualize.memory_usage()["loaded"]
+
+
+def test_visualization_follows_the_current_collection(tmp_path):
+    ids, embeddings = clustered_embeddings()
+    path = str(tmp_path / "layout.npz")
+    Layout.compute(ids, embeddings, documents(ids), perplexity=5, iterations=250).save(path)
+    current = {"collection": DummyCollection(ids, embeddings)}
+    visualize.initChromaviz(lambda: current["collection"], path=path)
+    assert len(visualize.get_data()["ids"]) == len(ids)
+
+    # A snapshot swap hands out another collection
+    current["collection"] = DummyCollection(ids[:30], embeddings[:30])
+    assert visualize.get_data()["ids"] == ids[:30]
+    assert visualize.get_layout(wait=True).ids == ids[:30]
+
+    # Rewritten texts under the same ids make the persisted layout stale
+    current["collection"] = DummyCollection(ids[:30], embeddings[:30], version=" v2")
+    layout, data = visualize.get_view(wait=True)
+    assert layout.matches(data["ids"], data["documents"])
+    assert Layout.load(path).matches(ids[:30], documents(ids[:30], " v2"))
+
+
+def test_missing_layout_is_computed_in_the_background(tmp_path, monkeypatch):
+    ids, embeddings = clustered_embeddings()
+    path = str(tmp_path / "layout.npz")
+    release = threading.Event()
+    compute = Layout.compute
+
+    def slow_compute(*args, **kwargs):
+        assert release.wait(10)
+        return compute(*args, perplexity=5, iterations=250)
+
+    monkeypatch.setattr(Layout, "compute", slow_compute)
+    visualize.initChromaviz(DummyCollection(ids, embeddings), path=path)
+    app = Flask(__name__)
+    app.register_blueprint(visualize.visualize_bp)
+    client = app.test_client()
+
+    # Requests are answered while the layout is fitted
+    response = client.get("/data")
+    assert response.status_code == 503 and response.headers["Retry-After"]
+    assert len(visualize.get_data()["ids"]) == len(ids)
+    release.set()
+    assert visualize.get_layout(wait=True).ids == ids
+    assert Layout.load(path).matches(ids, documents(ids))
+    assert client.get("/data").status_code == 200
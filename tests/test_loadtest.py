@@ -0,0 +1,133 @@
+"""Tests for LLM exchange recording, the replay stub and the load driver."""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from loadtest.driver import (
+    Sample,
+    TrafficMix,
+    find_saturation,
+    run_stage,
+    summarize_stage,
+)
+from loadtest.stub_server import ReplayBook, StubTiming, make_server, serve_in_thread
+from recog_ai.llm_client import LLMClient
+from recog_ai.recorder import load_exchanges
+
+MESSAGES = [
+    SystemMessage(content="Extrahiere die Lernziele."),
+    HumanMessage(content="Modul Statistik"),
+]
+
+
+@pytest.fixture
+def recording(tmp_path, monkeypatch):
+    path = tmp_path / "exchanges.jsonl"
+    monkeypatch.setenv("LLM_RECORD_FILE", str(path))
+    client = LLMClient(model="recorded-model", url="http://upstream")
+    client._invoke = lambda messages: AIMessage(content="Die Studierenden können rechnen.")
+    client.invoke(MESSAGES)
+    monkeypatch.delenv("LLM_RECORD_FILE")
+    return str(path)
+
+
+@pytest.fixture
+def stub(recording):
+    server = make_server(
+        ReplayBook.from_file(recording),
+        StubTiming(ttft=0.01, tokens_per_second=1000, jitter=0),
+        port=0,
+    )
+    serve_in_thread(server)
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+def test_recorder_captures_exchange(recording):
+    (entry,) = load_exchanges(recording)
+    assert entry["model"] == "recorded-model"
+    assert entry["messages"][0] == {
+        "role": "system",
+        "content": "Extrahiere die Lernziele.",
+    }
+    assert entry["response"] == "Die Studierenden können rechnen."
+
+
+def test_stub_replays_recording_plain_and_streamed(stub):
+    client = LLMClient(model="stub", url=stub, api_key="stub")
+    response = client.invoke(MESSAGES)
+    assert response.content == "Die Studierenden können rechnen."
+
+    chunks = list(client._get_client().stream(MESSAGES))
+    assert len(chunks) > 1
+    assert "".join(chunk.content for chunk in chunks) == response.content
+
+
+def test_unknown_request_replays_same_task(recording):
+    book = ReplayBook.from_file(recording)
+    content, entry = book.lookup(
+        [("system", "Extrahiere die Lernziele."), ("user", "Modul Analysis")]
+    )
+    assert content == "Die Studierenden können rechnen."
+    assert (book.hits, book.misses) == (0, 1)
+    assert ReplayBook().lookup([("user", "x")])[1] is None
+
+
+def test_saturation_point():
+    def stage(rps, latency, errors=0):
+        samples = [Sample("find_module", 200, latency) for _ in range(10 - errors)]
+        samples += [Sample("find_module", 503, 0.01) for _ in range(errors)]
+        return summarize_stage(rps, samples, wall_time=10 / rps)
+
+    stages = [stage(1, 0.5), stage(2, 1.0), stage(4, 0.8, errors=2), stage(8, 20)]
+    assert stages[2]["statuses"] == {"200": 8, "503": 2}
+    assert find_saturation(stages[:2]) is None
+    saturation = find_saturation(stages, slo_p95_ms=5000)
+    assert saturation["target_rps"] == 4
+    assert saturation["last_good_rps"] == 2
+    assert "error rate" in saturation["reason"]
+
+
+class FakeTraffic(TrafficMix):
+    def send(self, route, argument):
+        time.sleep(0.01)
+        if route == "find_module":
+            self._workspaces.append("token")
+        return 200
+
+
+def test_run_stage_holds_target_rate():
+    traffic = FakeTraffic("http://app", ["doc"], select_ratio=0.5)
+    samples, wall_time = run_stage(traffic, rps=40, duration=0.5)
+    assert len(samples) == 20
+    assert {sample.route for sample in samples} == {"find_module", "select_module"}
+    assert summarize_stage(40, samples, wall_time)["throughput"] > 30
+
+
+def test_driver_sends_the_staff_token():
+    headers = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            headers.append(self.headers.get("X-Staff-Token"))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}"
+        assert TrafficMix(url, ["doc"], staff_token="secret").send("find_module", "doc") == 200
+        TrafficMix(url, ["doc"]).send("select_module", "token")
+    finally:
+        server.shutdown()
+    assert headers == ["secret", None]
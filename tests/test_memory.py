@@ -0,0 +1,71 @@
+"""Tests for memory accounting and cache budgets."""
+
+import numpy as np
+
+from recog_ai.cache import SemanticCache
+from recog_ai.embeddings import CachedEmbeddings
+from recog_ai.memory import MemoryRegistry, deep_sizeof
+from recog_ai.workspace import InMemoryWorkspaceStore
+
+
+def embed(text):
+    vector = np.zeros(256, dtype=np.float32)
+    # One dimension per numbered text, so no two texts are similar
+    vector[int(text.split()[-1]) % 256] = 1.0
+    return vector.tolist()
+
+
+class Model:
+    def embed_query(self, text):
+        return embed(text)
+
+
+def test_deep_sizeof_follows_containers_and_counts_shared_objects_once():
+    array = np.zeros(1000, dtype=np.float64)
+    assert deep_sizeof(array) >= 8000
+    assert deep_sizeof([array, array]) < 2 * deep_sizeof(array)
+    assert deep_sizeof([array[:10]]) >= 8000
+
+    small = deep_sizeof({"title": "Statistik"})
+    large = deep_sizeof({"title": "Statistik", "content": "x" * 10000})
+    assert large - small >= 10000
+
+
+def test_caches_evict_beyond_their_memory_budget():
+    value = {"content": "x" * 10000}
+    cache = SemanticCache(embed, max_entries=100, max_bytes=35000)
+    for i in range(5):
+        cache.store(f"Modul {i}", value)
+    memory = cache.memory()
+    assert memory["entries"] == 3
+    assert memory["bytes"] <= 35000
+    assert cache.stats()["evictions"] == 2
+    assert cache.lookup("Modul 4") == value
+    assert cache.lookup("Modul 0") is None
+
+    embeddings = CachedEmbeddings(Model(), max_entries=100, max_bytes=2 * 1024)
+    for i in range(5):
+        embeddings.embed_query(f"query {i}")
+    assert embeddings.memory() == {"bytes": 2048, "max_bytes": 2048, "entries": 2}
+
+    store = InMemoryWorkspaceStore(max_bytes=25000)
+    tokens = [store.create({"candidates": [dict(value)]}) for _ in range(3)]
+    assert store.get(tokens[0]) is None
+    assert store.get(tokens[2]) is not None
+    assert store.memory()["bytes"] <= 25000
+
+
+def test_registry_report_sums_components():
+    registry = MemoryRegistry()
+    registry.register("model", lambda: {"bytes": 100})
+    registry.register("cache", lambda: {"bytes": 20, "max_bytes": 50})
+
+    def broken():
+        raise RuntimeError("unavailable")
+
+    registry.register("broken", broken)
+    report = registry.report()
+    assert report["accounted_bytes"] == 120
+    assert report["components"]["cache"]["max_bytes"] == 50
+    assert "error" in report["components"]["broken"]
+    assert report["peak_rss_bytes"] > 0
@@ -0,0 +1,94 @@
+"""Tests for ingest-time metadata normalization."""
+
+import json
+
+from recog_ai.normalize import (
+    CARD_KEY,
+    backfill_normalized_columns,
+    build_suggestions,
+    normalize_metadata,
+)
+from recog_ai.utils import workload_hours
+
+
+class DummyModule:
+    def __init__(self, metadata, content=""):
+        self.metadata = metadata
+        self.page_content = content
+
+
+METADATA = {
+    "title": "Datenbanken",
+    "credits": 5,
+    "duration": "P0Y0M0DT90H0M0S",
+    "description": "SQL",
+    "level": "Bachelor",
+    "programs": ["Informatik", "Medieninformatik"],
+    "institution": " Technische Hochschule Lübeck ",
+}
+
+
+def test_normalize_metadata_produces_typed_columns():
+    columns = normalize_metadata(METADATA, "Inhalt")
+    assert columns["norm_workload_hours"] == 90
+    assert columns["norm_workload_estimated"] is False
+    assert columns["norm_credits"] == 5.0
+    assert columns["norm_programs"] == "Informatik, Medieninformatik"
+    assert columns["norm_institution"] == "technische hochschule lübeck"
+    card = json.loads(columns[CARD_KEY])
+    assert card["workload"] == "90 Stunden"
+    assert card["content"] == "Inhalt"
+
+
+def test_workload_hours_estimates_from_credits():
+    assert workload_hours({"credits": 4}) == (120, True)
+    assert workload_hours({"credits": "n/a"}) == (None, False)
+    assert workload_hours({}) == (None, False)
+
+
+def test_precomputed_columns_match_legacy_assembly(monkeypatch):
+    legacy = build_suggestions([(DummyModule(METADATA, "Inhalt"), 0.1)])
+    stored = {**METADATA, **normalize_metadata(METADATA, "Inhalt")}
+
+    def fail(*args, **kwargs):
+        raise AssertionError("normalized hits must not be re-parsed")
+
+    monkeypatch.setattr("recog_ai.normalize.workload_hours", fail)
+    monkeypatch.setattr("recog_ai.normalize.collect_programs", fail)
+    fast = build_suggestions([(DummyModule(stored, "Inhalt"), 0.1)])
+    assert fast == legacy
+
+
+def test_build_suggestions_filters_on_normalized_institution():
+    stored = {**METADATA, **normalize_metadata(METADATA, "")}
+    other = {"title": "B", "institution": "Universität Bielefeld"}
+    hits = [(DummyModule(stored), 0.1), (DummyModule(other), 0.2)]
+    assert [s["title"] for s in build_suggestions(hits, "technische hochschule LÜBECK")] == [
+        "Datenbanken"
+    ]
+    assert len(build_suggestions(hits, "all")) == 2
+
+
+def test_backfill_only_updates_documents_without_columns():
+    class Collection:
+        def __init__(self):
+            self.updates = []
+
+        def update(self, ids, metadatas):
+            self.updates.append((ids, metadatas))
+
+    class Store:
+        _collection = Collection()
+
+        def get(self, include=None):
+            return {
+                "ids": ["a", "b"],
+                "metadatas": [METADATA, {CARD_KEY: "{}"}],
+                "documents": ["Inhalt", "B"],
+            }
+
+    store = Store()
+    assert backfill_normalized_columns(store) == 1
+    ids, metadatas = store._collection.updates[0]
+    assert ids == ["a"]
+    assert metadatas[0]["norm_workload_hours"] == 90
@@ -0,0 +1,93 @@
+"""Tests for the recognition precedent index."""
+
+import json
+import zlib
+
+import numpy as np
+import pytest
+
+from recog_ai.precedents import PrecedentIndex, fingerprint
+
+STATISTIK = "Modul Statistik\nLernziele: Regression, Hypothesentests und Varianzanalyse"
+
+
+class CountingEmbedding:
+    """Bag-of-words hashing embedding that counts its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        vector = np.zeros(64, dtype=np.float32)
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode()) % 64] += 1
+        return vector.tolist()
+
+
+def card(title):
+    return json.dumps({"title": title})
+
+
+@pytest.fixture
+def embed():
+    return CountingEmbedding()
+
+
+@pytest.fixture
+def index(tmp_path, embed):
+    return PrecedentIndex(str(tmp_path / "precedents.sqlite3"), embed, threshold=0.8)
+
+
+def test_exact_match_needs_no_embedding(index, embed):
+    external = {"title": "Statistik", "original_doc": STATISTIK}
+    index.confirm(STATISTIK, external, card("Statistik I"), "full", "<p>ok</p>")
+    calls = embed.calls
+
+    (precedent,) = index.match("  " + STATISTIK.upper().replace("\n", "  "))
+    assert embed.calls == calls
+    assert precedent["match"] == "exact"
+    assert precedent["module_title"] == "Statistik I"
+    assert precedent["verdict"] == "full"
+    assert precedent["result"] == "<p>ok</p>"
+    assert "original_doc" not in precedent["external_module"]
+    assert fingerprint(STATISTIK) == fingerprint(STATISTIK.upper())
+
+
+def test_similar_documents_and_repeated_confirmations(index):
+    index.confirm(STATISTIK, {"title": "Statistik"}, card("Statistik I"), "partial")
+    index.confirm(STATISTIK, {"title": "Statistik"}, card("Statistik I"), "full")
+    index.confirm(STATISTIK, {"title": "Statistik"}, card("Mathematik"), "none")
+
+    precedents = index.match(STATISTIK + " Stochastik")
+    assert [p["match"] for p in precedents] == ["similar", "similar"]
+    assert precedents[0]["module_title"] == "Statistik I"
+    assert precedents[0]["confirmations"] == 2
+    assert precedents[0]["verdict"] == "full"
+    assert 0.8 <= precedents[0]["similarity"] < 1
+    assert index.match("Modul Betriebswirtschaftslehre Marketing") == []
+
+
+def test_confirmations_of_other_processes_are_picked_up(tmp_path, index, embed):
+    assert index.match(STATISTIK) == []
+    other = PrecedentIndex(str(tmp_path / "precedents.sqlite3"), embed)
+    other.confirm(STATISTIK, {"title": "Statistik"}, card("Statistik I"), "full")
+    assert [p["module_title"] for p in index.match(STATISTIK)] == ["Statistik I"]
+
+
+def test_templated_modules_with_other_content_do_not_match(tmp_path):
+    # The model only sees the start of a document, which the template fills
+    template = "Modulhandbuch Hochschule Musterstadt Modulbeschreibung Credits 5 Workload 150 "
+
+    class PrefixEmbedding(CountingEmbedding):
+        def __call__(self, text):
+            return super().__call__(" ".join(text.split()[:8]))
+
+    index = PrecedentIndex(str(tmp_path / "precedents.sqlite3"), PrefixEmbedding())
+    statistik = template + "Lernziele: Regression, Hypothesentests und Varianzanalyse anwenden"
+    marketing = template + "Lernziele: Marktforschung, Preispolitik und Kommunikation planen"
+    index.confirm(statistik, {"title": "Statistik"}, card("Statistik I"), "full")
+
+    assert index.match(marketing) == []
+    (precedent,) = index.match(statistik + " können")
+    assert precedent["match"] == "similar"
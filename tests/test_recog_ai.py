@@ -125,3 +125,166 @@ def test_get_modul_info_parses_german_text():
         "Statistische Auswertungen anwenden",
     ]
     assert module["raw_document"] == doc
+
+
+def test_parse_verdict_uses_closing_recommendation():
+    from recog_ai.utils import parse_verdict
+
+    result = (
+        "<p>Eine <em>Vollständige Anerkennung</em> ist nicht möglich.</p>"
+        "<p>Es wird eine <strong>Teilweise Anerkennung</strong> empfohlen.</p>"
+    )
+    assert parse_verdict(result) == "partial"
+    assert parse_verdict("Keine **Keine Anerkennung**") == "none"
+    assert parse_verdict("kein Ergebnis") is None
+
+
+class AsyncStubClient:
+    """LLM stub answering examinations based on the internal module title."""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        import asyncio
+
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        verdict = "Keine Anerkennung"
+        if '"title": "Full"' in messages[1].content:
+            verdict = "Vollständige Anerkennung"
+        elif '"title": "Partial"' in messages[1].content:
+            verdict = "Teilweise Anerkennung"
+
+        class Result:
+            content = "Es wird eine *" + verdict + "* empfohlen."
+
+        return Result()
+
+
+def test_assess_candidates_runs_concurrently_and_ranks():
+    import asyncio
+    import time
+
+    llm = AsyncStubClient(delay=0.2)
+    assistant = RecognitionAssistant(None, llm_client=llm)
+    candidates = [{"title": t} for t in ["None", "Partial", "Full", "None", "Partial"]]
+
+    started = time.perf_counter()
+    ranking = asyncio.run(assistant.assess_candidates("{}", candidates, concurrency=5))
+    assert time.perf_counter() - started < 0.6
+    assert [a["module"]["title"] for a in ranking] == [
+        "Full",
+        "Partial",
+        "Partial",
+        "None",
+        "None",
+    ]
+    assert [a["rank"] for a in ranking] == [1, 2, 3, 4, 5]
+    assert ranking[0]["verdict"] == "full"
+
+
+def test_assess_candidates_stops_on_full_recognition():
+    import asyncio
+
+    llm = AsyncStubClient(delay=0.05)
+    assistant = RecognitionAssistant(None, llm_client=llm)
+    candidates = [{"title": t} for t in ["Full", "None", "None", "None"]]
+    ranking = asyncio.run(
+        assistant.assess_candidates("{}", candidates, concurrency=1, stop_on_full=True)
+    )
+    assert llm.calls < len(candidates)
+    assert ranking[0]["verdict"] == "full"
+    assert {a["verdict"] for a in ranking[1:]} == {"cancelled"}
+
+
+def test_async_counterparts_match_sync_behaviour():
+    import asyncio
+
+    class AsyncModuleClient:
+        async def ainvoke(self, messages):
+            class Result:
+                content = json.dumps({"title": "Async", "learninggoals": [{"a": "Ziel"}]})
+
+            return Result()
+
+    class FailingAsyncClient:
+        async def ainvoke(self, messages):
+            raise RuntimeError("chat unavailable")
+
+    modules = [DummyModule({"title": "A", "institution": "THL"})]
+    assistant = RecognitionAssistant(DummyDB(modules), llm_client=AsyncModuleClient())
+    module = asyncio.run(assistant.aget_module_info("raw"))
+    assert module["title"] == "Async"
+    assert module["learninggoals"] == ["Ziel"]
+    suggestions = asyncio.run(assistant.aget_module_suggestions("doc", institution="all"))
+    assert [s["title"] for s in suggestions] == ["A"]
+
+    assistant.llm = FailingAsyncClient()
+    module = asyncio.run(assistant.aget_module_info("raw text"))
+    assert module["error"] == "chat unavailable"
+    assert module["raw_document"] == "raw text"
+
+
+def test_sync_fallback_works_inside_running_loop():
+    import asyncio
+    from recog_ai.llm_client import _run_sync
+
+    async def answer():
+        return 42
+
+    async def main():
+        return _run_sync(answer())
+
+    assert _run_sync(answer()) == 42
+    assert asyncio.run(main()) == 42
+
+
+class RecordingClient:
+    """LLM stub returning a fixed answer and recording the prompts."""
+
+    def __init__(self, model, content):
+        self.model = model
+        self.content = content
+        self.prompts = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages)
+
+        class Result:
+            content = self.content
+
+        return Result()
+
+
+def test_extraction_uses_small_model_and_escalates_on_invalid_answer():
+    good = json.dumps({"title": "Mathe", "learninggoals": ["Rechnen"]})
+    large = RecordingClient("large", good)
+
+    small = RecordingClient("small", good)
+    assistant = RecognitionAssistant(
+        None, llm_client=large, task_clients={"extraction": small}
+    )
+    assert assistant.get_module_info("doc")["title"] == "Mathe"
+    assert len(small.prompts) == 1 and not large.prompts
+
+    for answer in ['{"title": ""}', "kein JSON"]:
+        small = RecordingClient("small", answer)
+        assistant.task_clients["extraction"] = small
+        assert assistant.get_module_info("doc")["learninggoals"] == ["Rechnen"]
+    assert len(large.prompts) == 2
+
+
+def test_examination_prompt_names_routed_model(monkeypatch):
+    monkeypatch.setenv("LLM_MODEL_EXAMINATION", "big-reasoner")
+    monkeypatch.delenv("LLM_MODEL_EXTRACTION", raising=False)
+    assistant = RecognitionAssistant(None)
+    assert set(assistant.task_clients) == {"examination"}
+    assert assistant.task_clients["examination"].max_tokens == 2048
+
+    examiner = RecordingClient("big-reasoner", "Keine Anerkennung")
+    assistant.task_clients["examination"] = examiner
+    assistant.get_examination_result("{}", "{}")
+    assert "namens big-reasoner generiert" in examiner.prompts[0][0].content
+    assert "gemma" not in examiner.prompts[0][0].content
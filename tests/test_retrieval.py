@@ -0,0 +1,86 @@
+"""Tests for the retrieval depth policy."""
+
+from recog_ai.retrieval import (
+    TRUNCATED_EXHAUSTED,
+    TRUNCATED_LATENCY_BUDGET,
+    TRUNCATED_LIMIT,
+    TRUNCATED_MIN_SIMILARITY,
+    TRUNCATED_SCORE_GAP,
+    RetrievalPolicy,
+)
+
+
+class DummyModule:
+    def __init__(self, title, institution):
+        self.metadata = {"title": title, "institution": institution}
+        self.page_content = ""
+
+
+class RankedDB:
+    """Returns modules in order with the given cosine similarities."""
+
+    def __init__(self, similarities, institutions=None):
+        self.similarities = similarities
+        self.institutions = institutions or ["THL"] * len(similarities)
+        self.requests = []
+
+    def similarity_search_with_score(self, query, k):
+        self.requests.append(k)
+        hits = zip(self.similarities, self.institutions)
+        return [
+            (DummyModule(f"M{i}", institution), 2 - 2 * similarity)
+            for i, (similarity, institution) in enumerate(hits)
+        ][:k]
+
+
+def test_filtered_queries_over_fetch_and_adapt():
+    institutions = ["UNIBI", "UNIBI", "THL"] * 10
+    db = RankedDB([0.9 - i * 0.01 for i in range(30)], institutions)
+    policy = RetrievalPolicy(limit=3, overfetch=2, max_fetch=30)
+
+    retrieval = policy.retrieve(db, "query", institution="thl")
+    assert [s["title"] for s in retrieval.suggestions] == ["M2", "M5", "M8"]
+    assert db.requests == [6, 12]
+    assert retrieval.rounds == 2
+    assert retrieval.scores == [s["similarity"] for s in retrieval.suggestions]
+
+    # The observed pass rate of one in three sizes the next first round
+    db.requests.clear()
+    policy.retrieve(db, "query", institution="THL")
+    assert db.requests[0] >= 9
+
+    db.requests.clear()
+    assert len(policy.retrieve(db, "query", institution="all").suggestions) == 3
+    assert db.requests == [3]
+
+
+def test_cut_offs_and_truncation_reasons():
+    db = RankedDB([0.92, 0.9, 0.89, 0.7, 0.69, 0.68])
+    assert RetrievalPolicy(limit=5).retrieve(db, "q").truncated is None
+    assert RetrievalPolicy(limit=10).retrieve(db, "q").truncated == TRUNCATED_EXHAUSTED
+
+    retrieval = RetrievalPolicy(limit=5, min_similarity=0.8).retrieve(db, "q")
+    assert len(retrieval.suggestions) == 3
+    assert retrieval.truncated == TRUNCATED_MIN_SIMILARITY
+
+    retrieval = RetrievalPolicy(limit=5, score_gap=0.1).retrieve(db, "q")
+    assert retrieval.scores == [0.92, 0.9, 0.89]
+    assert retrieval.truncated == TRUNCATED_SCORE_GAP
+
+    winner = RankedDB([0.95, 0.8, 0.79])
+    assert len(RetrievalPolicy(score_gap=0.1).retrieve(winner, "q").suggestions) == 1
+    kept = RetrievalPolicy(score_gap=0.1, min_results=2).retrieve(winner, "q")
+    assert len(kept.suggestions) == 3
+
+    policy = RetrievalPolicy(limit=2)
+    assert policy.cut([0.9, 0.8, 0.7], 2) == (2, TRUNCATED_LIMIT)
+
+
+def test_latency_budget_stops_refetching():
+    db = RankedDB([0.9] * 20, ["UNIBI"] * 19 + ["THL"])
+    retrieval = RetrievalPolicy(limit=3, max_fetch=20, latency_budget=0).retrieve(
+        db, "q", institution="THL"
+    )
+    assert retrieval.rounds == 1
+    assert retrieval.suggestions == []
+    assert retrieval.truncated == TRUNCATED_LATENCY_BUDGET
@@ -0,0 +1,232 @@
+"""Tests for single-flight coalescing of identical LLM calls."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from recog_ai.llm_client import LLMClient, track_usage
+from recog_ai.singleflight import SingleFlight
+
+
+def run_concurrently(count, target):
+    results = [None] * count
+
+    def worker(index):
+        results[index] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return "response"
+
+    results = run_concurrently(8, lambda: flight.do("key", slow))
+    assert results == ["response"] * 8
+    assert len(calls) == 1
+
+    # Once finished, the next call executes again
+    flight.do("key", slow)
+    assert len(calls) == 2
+
+
+def test_errors_are_shared_with_waiters():
+    flight = SingleFlight()
+    errors = []
+
+    def failing():
+        time.sleep(0.1)
+        raise RuntimeError("upstream down")
+
+    def call():
+        try:
+            flight.do("key", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    run_concurrently(4, call)
+    assert errors == ["upstream down"] * 4
+
+
+def test_async_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "response"
+
+    async def main():
+        return await asyncio.gather(*[flight.ado("key", slow) for _ in range(5)])
+
+    assert asyncio.run(main()) == ["response"] * 5
+    assert len(calls) == 1
+
+
+def test_cross_process_result_is_reused(tmp_path):
+    # Two instances with the same lock directory behave like two workers
+    first = SingleFlight(str(tmp_path), dumps=str, loads=str)
+    second = SingleFlight(str(tmp_path), dumps=str, loads=str)
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return "response"
+
+    leader = threading.Thread(target=first.do, args=("key", slow))
+    leader.start()
+    time.sleep(0.05)
+    assert second.do("key", slow) == "response"
+    leader.join()
+    assert len(calls) == 1
+
+    # Lock files are removed; a finished result is not reused by later calls
+    assert not list(tmp_path.glob("*.lock"))
+    assert second.do("key", slow) == "response"
+    assert len(calls) == 2
+
+
+def test_cross_process_requires_serializers(tmp_path):
+    with pytest.raises(ValueError):
+        SingleFlight(str(tmp_path))
+
+
+def test_llm_client_coalesces_identical_requests():
+    calls = []
+
+    class SlowClient(LLMClient):
+        def _invoke(self, messages):
+            calls.append(messages)
+            time.sleep(0.2)
+            return AIMessage(content="ok")
+
+    client = SlowClient(model="test-model")
+    messages = [SystemMessage(content="system"), HumanMessage(content="doc")]
+    results = run_concurrently(5, lambda: client.invoke(messages))
+    assert [r.content for r in results] == ["ok"] * 5
+    assert len(calls) == 1
+
+
+def test_llm_request_key_depends_on_parameters():
+    messages = [HumanMessage(content="doc")]
+    small = LLMClient(model="m", max_tokens=512)
+    large = LLMClient(model="m", max_tokens=4096)
+    assert small._request_key(messages) != large._request_key(messages)
+    assert small._request_key(messages) == LLMClient(model="m", max_tokens=512)._request_key(
+        [HumanMessage(content="doc")]
+    )
+    assert small._request_key(messages) != small._request_key([SystemMessage(content="doc")])
+
+
+def test_async_calls_on_separate_loops_share_one_execution():
+    # Flask runs every async view on its own event loop
+    flight = SingleFlight()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return "response"
+
+    results = run_concurrently(3, lambda: asyncio.run(flight.ado("key", slow)))
+    assert results == ["response"] * 3
+    assert len(calls) == 1
+
+
+def test_async_cross_process_result_is_reused(tmp_path):
+    first = SingleFlight(str(tmp_path), dumps=str, loads=str)
+    second = SingleFlight(str(tmp_path), dumps=str, loads=str)
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return "response"
+
+    leader = threading.Thread(target=lambda: asyncio.run(first.ado("key", slow)))
+    leader.start()
+    time.sleep(0.05)
+    assert asyncio.run(second.ado("key", slow)) == "response"
+    leader.join()
+    assert len(calls) == 1
+
+
+def test_cancelled_leader_only_stops_waiting():
+    flight = SingleFlight()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return "response"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("key", slow))
+        await asyncio.sleep(0.05)
+        waiter = asyncio.ensure_future(flight.ado("key", slow))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(main()) == "response"
+    assert len(calls) == 1
+
+
+def test_abandoned_call_is_cancelled():
+    flight = SingleFlight()
+    cancelled = threading.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def main():
+        callers = [asyncio.ensure_future(flight.ado("key", slow)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+
+    asyncio.run(main())
+    assert cancelled.wait(1)
+
+
+def test_usage_of_coalesced_calls_is_counted_once():
+    class SlowClient(LLMClient):
+        async def _acall_recorded(self, messages):
+            await asyncio.sleep(0.1)
+            return AIMessage(
+                content="ok",
+                usage_metadata={"input_tokens": 10, "output_tokens": 5, "total_tokens": 15},
+            )
+
+    client = SlowClient(model="usage-model")
+    messages = [HumanMessage(content="doc")]
+
+    async def main():
+        with track_usage() as usage:
+            await asyncio.gather(*[client.ainvoke(messages) for _ in range(3)])
+        return usage
+
+    usage = asyncio.run(main())
+    assert usage == {"calls": 1, "input_tokens": 10, "output_tokens": 5}
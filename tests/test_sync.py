@@ -0,0 +1,199 @@
+"""Tests for the incremental vector store sync engine."""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from recog_ai.config import get_module_database
+from recog_ai.sync import (
+    HASH_KEY,
+    ModuleDatabaseHandle,
+    ModuleRecord,
+    apply_sync,
+    existing_hashes,
+    load_jsonl_source,
+    plan_sync,
+    resolve_snapshot,
+    _publish_snapshot,
+    _sync_lock,
+    update_snapshot,
+)
+
+
+class FakeStore:
+    """Minimal stand-in for the Chroma API used by the sync engine."""
+
+    def __init__(self):
+        self.docs = {}
+        self.embedded = []
+
+    def get(self, include=None):
+        ids = list(self.docs)
+        return {"ids": ids, "metadatas": [self.docs[i][1] for i in ids]}
+
+    def add_texts(self, texts, metadatas, ids):
+        self.embedded.extend(ids)
+        for text, metadata, doc_id in zip(texts, metadatas, ids):
+            self.docs[doc_id] = (text, metadata)
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self.docs.pop(doc_id, None)
+
+
+def test_load_jsonl_source_accepts_flat_and_nested_rows(tmp_path):
+    feed = tmp_path / "modules.jsonl"
+    feed.write_text(
+        json.dumps({"id": 1, "content": "A", "title": "Mathe"})
+        + "\n\n"
+        + json.dumps({"id": "b", "page_content": "B", "metadata": {"title": "Physik"}})
+        + "\n",
+        encoding="utf-8",
+    )
+    records = list(load_jsonl_source(str(feed)))
+    assert [r.id for r in records] == ["1", "b"]
+    assert records[0].metadata == {"title": "Mathe"}
+    assert records[1].page_content == "B"
+
+
+def test_sync_only_reembeds_changed_modules():
+    store = FakeStore()
+    first = [
+        ModuleRecord("a", "Analysis", {"title": "A", "programs": ["X", "Y"]}),
+        ModuleRecord("b", "Biologie", {"title": "B"}),
+    ]
+    apply_sync(store, plan_sync(first, existing_hashes(store)))
+    assert sorted(store.embedded) == ["a", "b"]
+    assert store.docs["a"][1]["programs"] == "X, Y"
+    assert store.docs["a"][1][HASH_KEY] == first[0].content_hash
+
+    store.embedded.clear()
+    second = [
+        ModuleRecord("a", "Analysis", {"title": "A", "programs": ["X", "Y"]}),
+        ModuleRecord("c", "Chemie", {"title": "C"}),
+    ]
+    plan = plan_sync(second, existing_hashes(store))
+    assert plan.summary() == {"added": 1, "changed": 0, "removed": 1, "unchanged": 1}
+    apply_sync(store, plan)
+    assert store.embedded == ["c"]
+    assert sorted(store.docs) == ["a", "c"]
+
+
+def test_changed_content_is_detected():
+    store = FakeStore()
+    apply_sync(store, plan_sync([ModuleRecord("a", "v1")], existing_hashes(store)))
+    plan = plan_sync([ModuleRecord("a", "v2")], existing_hashes(store))
+    assert [r.id for r in plan.changed] == ["a"]
+
+
+def test_handle_swaps_to_published_snapshot(tmp_path):
+    root = str(tmp_path)
+    opened = []
+
+    def factory(embedding, path):
+        opened.append(path)
+        return path
+
+    handle = ModuleDatabaseHandle(None, root, factory=factory, check_interval=0)
+    assert handle.get() == root
+
+    (tmp_path / "snapshots" / "s1").mkdir(parents=True)
+    _publish_snapshot(root, "s1")
+    assert resolve_snapshot(root) == str(tmp_path / "snapshots" / "s1")
+    assert handle.get() == str(tmp_path / "snapshots" / "s1")
+    handle.get()
+    assert len(opened) == 2
+
+
+def test_handle_closes_retired_databases_one_swap_later(tmp_path):
+    root = str(tmp_path)
+    closed = []
+    handle = ModuleDatabaseHandle(
+        None, root, factory=lambda embedding, path: path, check_interval=0, close=closed.append
+    )
+    first = handle.get()
+    for name in ["s1", "s2"]:
+        (tmp_path / "snapshots" / name).mkdir(parents=True)
+        _publish_snapshot(root, name)
+        handle.get()
+    # The database of s1 may still be in use; only the one before is closed
+    assert closed == [first]
+
+
+class ConstantEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def test_update_snapshot_publishes_a_changed_copy(tmp_path):
+    root = str(tmp_path)
+    embedding = ConstantEmbeddings()
+    update_snapshot(lambda db: db.add_texts(["a"], ids=["a"]), embedding, root)
+    first = resolve_snapshot(root)
+
+    assert update_snapshot(lambda db: db.add_texts(["b"], ids=["b"]), embedding, root)
+    second = resolve_snapshot(root)
+    assert second != first
+    assert sorted(get_module_database(embedding, first).get()["ids"]) == ["a"]
+    assert sorted(get_module_database(embedding, second).get()["ids"]) == ["a", "b"]
+
+    def failing(db):
+        raise RuntimeError("backfill failed")
+
+    with pytest.raises(RuntimeError):
+        update_snapshot(failing, embedding, root)
+    assert resolve_snapshot(root) == second
+    assert len(os.listdir(os.path.join(root, "snapshots"))) == 2
+
+
+def test_retired_snapshots_are_kept_for_a_grace_period(tmp_path):
+    root = str(tmp_path)
+    embedding = ConstantEmbeddings()
+    snapshots = []
+    for text in "abc":
+        update_snapshot(lambda db: db.add_texts([text], ids=[text]), embedding, root, 1)
+        snapshots.append(resolve_snapshot(root))
+
+    # Workers may still serve the snapshots replaced a moment ago
+    assert all(os.path.isdir(path) for path in snapshots)
+    assert not os.path.exists(os.path.join(snapshots[-1], "RETIRED"))
+
+    update_snapshot(lambda db: None, embedding, root, 1, retire_grace=0)
+    assert os.listdir(os.path.join(root, "snapshots")) == [
+        os.path.basename(resolve_snapshot(root))
+    ]
+
+
+def test_concurrent_updates_run_one_after_another(tmp_path):
+    root = str(tmp_path)
+    embedding = ConstantEmbeddings()
+    update_snapshot(lambda db: db.add_texts(["a"], ids=["a"]), embedding, root)
+
+    # Another process holds the lock; the update copies what it publishes
+    done = threading.Event()
+    with _sync_lock(root):
+        worker = threading.Thread(
+            target=lambda: (
+                update_snapshot(lambda db: db.add_texts(["c"], ids=["c"]), embedding, root),
+                done.set(),
+            )
+        )
+        worker.start()
+        time.sleep(0.2)
+        assert not done.is_set()
+        external = os.path.join(root, "snapshots", "external")
+        get_module_database(embedding, external).add_texts(["b"], ids=["b"])
+        _publish_snapshot(root, "external")
+    worker.join(10)
+    assert done.is_set()
+    assert sorted(get_module_database(embedding, resolve_snapshot(root)).get()["ids"]) == [
+        "b",
+        "c",
+    ]
@@ -0,0 +1,113 @@
+"""Tests for streaming upload reading and module splitting."""
+
+import asyncio
+import io
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from recog_ai.uploads import (
+    UnsupportedFileType,
+    iter_lines,
+    iter_text_chunks,
+    iter_upload_sections,
+    iter_xml_modules,
+    split_modules,
+    stream_completed,
+)
+
+FILLER = "Die Studierenden lernen Grundlagen und wenden sie an. " * 5
+
+
+def combined(*titles):
+    return "Modulhandbuch Informatik\n" + "".join(
+        f"Modulbezeichnung: {title}\nCredits: 5\n{FILLER}\n" for title in titles
+    )
+
+
+def test_text_chunks_decode_multibyte_characters_across_reads():
+    stream = io.BytesIO("Übung für Prüfungsämter\nzweite Zeile".encode("utf-8"))
+    lines = list(iter_lines(iter_text_chunks(stream, chunk_size=1)))
+    assert lines == ["Übung für Prüfungsämter\n", "zweite Zeile"]
+
+
+def test_split_modules_at_repeated_heading():
+    text = combined("Statistik", "Analysis", "Algebra")
+    sections = list(split_modules(iter_lines([text])))
+    assert len(sections) == 3
+    assert sections[0].startswith("Modulhandbuch Informatik\nModulbezeichnung: Statistik")
+    assert sections[2].startswith("Modulbezeichnung: Algebra")
+
+    # A repeated label right after the first one does not split the module
+    short = "Modul: Statistik\nModul: STA-101\n" + FILLER
+    assert len(list(split_modules(iter_lines([short])))) == 1
+
+    (truncated,) = split_modules(iter_lines([FILLER * 10]), max_chars=100)
+    assert len(truncated) <= 100
+
+
+def test_xml_records_are_streamed_and_single_modules_kept_whole():
+    records = "".join(
+        f"<module><title>{title}</title><credits>5</credits>"
+        "<level>Bachelor</level></module>"
+        for title in ("Statistik", "Analysis")
+    )
+    export = f"<export><meta>x</meta><modules>{records}</modules></export>"
+    sections = list(iter_xml_modules(io.BytesIO(export.encode())))
+    assert sections == [
+        "title: Statistik\ncredits: 5\nlevel: Bachelor",
+        "title: Analysis\ncredits: 5\nlevel: Bachelor",
+    ]
+
+    single = (
+        "<module><title>Statistik</title><credits>5</credits>"
+        "<goals><goal>Regression</goal><goal>Tests</goal><goal>ANOVA</goal></goals></module>"
+    )
+    (section,) = iter_xml_modules(io.BytesIO(single.encode()))
+    assert section.splitlines()[:2] == ["title: Statistik", "credits: 5"]
+    assert "goal: ANOVA" in section
+
+    (partial,) = iter_xml_modules(io.BytesIO(b"<module><title>Statistik</title><cred"))
+    assert partial == "title: Statistik"
+
+
+def test_upload_sections_across_files():
+    files = [
+        FileStorage(io.BytesIO(combined("Statistik", "Analysis").encode()), "a.txt"),
+        FileStorage(io.BytesIO(b""), ""),
+        FileStorage(io.BytesIO(b"<module><title>Algebra</title></module>"), "b.xml"),
+    ]
+    sections = list(iter_upload_sections(files, max_sections=10))
+    assert [name for name, _ in sections] == ["a.txt", "a.txt", "b.xml"]
+    assert sections[2][1] == "title: Algebra"
+
+    files[0].stream.seek(0)
+    assert len(list(iter_upload_sections(files, max_sections=1))) == 1
+
+    with pytest.raises(UnsupportedFileType):
+        next(iter_upload_sections([files[0], FileStorage(io.BytesIO(b"x"), "c.docx")]))
+
+
+def test_stream_completed_yields_in_completion_order_with_bounded_concurrency():
+    running = 0
+    peak = 0
+    consumed = []
+
+    async def work(delay):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(delay)
+        running -= 1
+        return delay
+
+    def items():
+        for delay in (0.05, 0.01, 0.03, 0.02):
+            consumed.append(delay)
+            yield delay
+
+    results = stream_completed(work, items(), concurrency=2)
+    assert next(results) == (1, 0.01)
+    assert len(consumed) == 3
+    assert [index for index, _ in results] == [2, 0, 3]
+    assert peak == 2
@@ -0,0 +1,91 @@
+"""Tests for cache snapshots and warm-up."""
+
+import gzip
+import json
+import zlib
+
+import numpy as np
+
+from recog_ai.cache import SemanticCache
+from recog_ai.embeddings import CachedEmbeddings
+from recog_ai.warmstart import WarmStart
+
+
+class CountingEmbeddings:
+    """Bag-of-words hashing embedding that counts query calls."""
+
+    def __init__(self):
+        self.queries = 0
+
+    def embed_query(self, text):
+        self.queries += 1
+        vector = np.zeros(32, dtype=np.float32)
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode()) % 32] += 1
+        return (vector / (np.linalg.norm(vector) or 1)).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def make_caches():
+    model = CountingEmbeddings()
+    embedding = CachedEmbeddings(model, max_entries=2)
+    return model, embedding, SemanticCache(embedding.embed_query)
+
+
+def test_query_embeddings_are_cached():
+    model, embedding, _ = make_caches()
+    first = embedding.embed_query("lineare Regression")
+    assert embedding.embed_query("lineare Regression") == first
+    embedding.embed_query("Analysis")
+    embedding.embed_query("Algebra")
+    embedding.embed_query("lineare Regression")
+    assert model.queries == 4
+    assert embedding.stats()["size"] == 2
+
+
+def test_snapshot_roundtrip_respects_fingerprint(tmp_path):
+    path = str(tmp_path / "warm.json.gz")
+    model, embedding, cache = make_caches()
+    embedding.embed_query("lineare Regression")
+    cache.store("Modul Statistik", {"title": "Statistik"}, namespace="all")
+
+    warm = WarmStart(path, fingerprint={"embedding": "e5", "vectorstore": "a"})
+    warm.register_cache("query_embeddings", embedding, depends_on=["embedding"])
+    warm.register_cache("suggestions", cache, depends_on=["embedding", "vectorstore"])
+    assert warm.save()
+
+    model, embedding, cache = make_caches()
+    restarted = WarmStart(path, fingerprint={"embedding": "e5", "vectorstore": "b"})
+    restarted.register_cache("query_embeddings", embedding, depends_on=["embedding"])
+    restarted.register_cache("suggestions", cache, depends_on=["embedding", "vectorstore"])
+    assert restarted.restore() == {"query_embeddings": 2}
+
+    embedding.embed_query("lineare Regression")
+    assert model.queries == 0
+
+    restarted.fingerprint["vectorstore"] = "a"
+    restarted.restore()
+    assert cache.lookup("Modul Statistik", namespace="all") == {"title": "Statistik"}
+
+    with gzip.open(path, "wt") as file:
+        json.dump({"version": 0, "caches": {}}, file)
+    assert restarted.restore() == {}
+
+
+def test_warm_up_reports_steps_and_survives_failures(tmp_path):
+    warm = WarmStart(str(tmp_path / "missing" / "warm.json.gz"), interval=0)
+    warm.add_step("model", lambda: 768)
+
+    def broken():
+        raise RuntimeError("index unavailable")
+
+    warm.add_step("index", broken)
+    warm.start(background=False)
+    assert warm.ready.is_set()
+    assert warm.status["steps"]["model"]["result"] == 768
+    assert "error" in warm.status["steps"]["index"]["result"]
+
+    warm.stop()
+    assert (tmp_path / "missing" / "warm.json.gz").exists()
@@ -0,0 +1,51 @@
+"""Tests for the server-side workspace stores."""
+
+import time
+
+import pytest
+
+from recog_ai.workspace import InMemoryWorkspaceStore, SQLiteWorkspaceStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def factory(ttl=60):
+        if request.param == "memory":
+            return InMemoryWorkspaceStore(ttl=ttl)
+        return SQLiteWorkspaceStore(str(tmp_path / "workspaces.sqlite"), ttl=ttl)
+
+    return factory
+
+
+def test_roundtrip_and_update(make_store):
+    store = make_store()
+    data = {"external_module": {"title": "Extern"}, "candidates": [{"title": "A"}]}
+    token = store.create(data)
+    assert len(token) < 24
+    assert store.get(token) == data
+
+    data["internal_goals"] = {"0": ["Ziel"]}
+    store.update(token, data)
+    assert store.get(token)["internal_goals"] == {"0": ["Ziel"]}
+    assert store.get("unknown") is None
+
+
+def test_expired_workspaces_are_evicted(make_store):
+    store = make_store(ttl=0.05)
+    token = store.create({"a": 1})
+    time.sleep(0.1)
+    assert store.get(token) is None
+
+
+def test_memory_store_copies_workspaces_and_bounds_size():
+    store = InMemoryWorkspaceStore(max_entries=2)
+    data = {"a": 1, "internal_goals": {}}
+    first = store.create(data)
+    data["a"] = 2
+    workspace = store.get(first)
+    workspace["internal_goals"]["0"] = ["Ziel"]
+    # Changes only take effect through update
+    assert store.get(first) == {"a": 1, "internal_goals": {}}
+    store.create({"b": 2})
+    store.create({"c": 3})
+    assert store.get(first) is None
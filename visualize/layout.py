@@ -0,0 +1,251 @@
+"""Persistent 3-D layout of the module collection with out-of-sample placement."""
+
+import argparse
+import hashlib
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from sklearn.decomposition import PCA
+from sklearn.manifold import TSNE
+
+logger = logging.getLogger(__name__)
+
+
+def default_layout_path() -> str:
+    """Return the location of the persisted layout (env ``VISUALIZE_LAYOUT``)."""
+    return os.getenv("VISUALIZE_LAYOUT") or os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "data", "visualize_layout.npz"
+    )
+
+
+def collection_fingerprint(ids: Sequence[str], documents: Sequence[Optional[str]]) -> str:
+    """
+    Fingerprint of a collection's ids and texts, used to detect stale layouts.
+
+    A sync that rewrites a module keeps its id, so the text is part of it.
+
+    Args:
+        ids: Document ids in collection order.
+        documents: Document texts in the same order.
+
+    Returns:
+        Hex digest identifying the documents.
+    """
+    digest = hashlib.sha256()
+    for doc_id, document in zip(ids, documents):
+        digest.update(doc_id.encode("utf-8") + b"\0")
+        digest.update((document or "").encode("utf-8") + b"\0")
+    digest.update(str(len(ids)).encode("ascii"))
+    return digest.hexdigest()
+
+
+def _tsne(**kwargs) -> TSNE:
+    """Create a TSNE instance across scikit-learn versions (n_iter → max_iter)."""
+    try:
+        return TSNE(max_iter=kwargs.pop("iterations"), **kwargs)
+    except TypeError:
+        return TSNE(n_iter=kwargs.pop("iterations"), **kwargs)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length (zero rows stay zero)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class Layout:
+    """
+    Fixed 3-D coordinates for every document of the collection.
+
+    Queries are placed without refitting: their position is the
+    similarity-weighted mean of the coordinates of their nearest neighbours
+    in embedding space.
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        embeddings: np.ndarray,
+        positions: np.ndarray,
+        groups: np.ndarray,
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        """
+        Initialize a layout.
+
+        Args:
+            ids: Document ids in collection order.
+            embeddings: Document embeddings (n × d).
+            positions: Layout coordinates (n × 3).
+            groups: Cluster index per document, used for colouring.
+            fingerprint: ``collection_fingerprint`` of the documents; a
+                layout without one never matches a collection.
+        """
+        self.ids = list(ids)
+        self.embeddings = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        self.positions = np.asarray(positions, dtype=np.float32)
+        self.groups = np.asarray(groups, dtype=np.int64)
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def compute(
+        cls,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Sequence[Optional[str]],
+        perplexity: float = 40.0,
+        iterations: int = 300,
+        random_state: Optional[int] = 0,
+    ) -> "Layout":
+        """
+        Fit PCA(50) followed by a 3-D t-SNE on the collection.
+
+        Args:
+            ids: Document ids in collection order.
+            embeddings: Document embeddings.
+            documents: Document texts, fingerprinted to detect staleness.
+            perplexity: t-SNE perplexity (capped for small collections).
+            iterations: t-SNE optimization iterations.
+            random_state: Seed for reproducible layouts.
+
+        Returns:
+            The fitted layout.
+        """
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        count = len(matrix)
+        fingerprint = collection_fingerprint(ids, documents)
+        if count < 3:
+            positions = np.zeros((count, 3), dtype=np.float32)
+            return cls(ids, matrix, positions, np.zeros(count, dtype=np.int64), fingerprint)
+
+        start = time.time()
+        components = min(50, count, matrix.shape[1])
+        reduced = PCA(n_components=components).fit_transform(matrix)
+        tsne = _tsne(
+            n_components=3,
+            perplexity=min(perplexity, count - 1),
+            iterations=iterations,
+            random_state=random_state,
+        )
+        positions = tsne.fit_transform(reduced) / 3
+        logger.info("Layout of %d documents computed in %.1fs", count, time.time() - start)
+        return cls(ids, matrix, positions, np.argmax(reduced, axis=1), fingerprint)
+
+    @classmethod
+    def load(cls, path: str) -> "Layout":
+        """
+        Load a layout written by ``save``.
+
+        Args:
+            path: File path of the ``.npz`` archive.
+
+        Returns:
+            The stored layout.
+        """
+        with np.load(path, allow_pickle=False) as archive:
+            return cls(
+                archive["ids"].tolist(),
+                archive["embeddings"],
+                archive["positions"],
+                archive["groups"],
+                # Layouts saved before texts were fingerprinted are stale
+                str(archive["fingerprint"]) if "fingerprint" in archive.files else None,
+            )
+
+    def save(self, path: str) -> None:
+        """
+        Persist the layout atomically.
+
+        Args:
+            path: Destination ``.npz`` file.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".%d.tmp.npz" % os.getpid()
+        np.savez(
+            tmp_path,
+            ids=np.array(self.ids, dtype=str),
+            embeddings=self.embeddings,
+            positions=self.positions,
+            groups=self.groups,
+            fingerprint=np.array(self.fingerprint or ""),
+        )
+        os.replace(tmp_path, path)
+
+    def matches(self, ids: Sequence[str], documents: Sequence[Optional[str]]) -> bool:
+        """Whether the layout was computed for exactly these documents."""
+        return bool(self.fingerprint) and self.fingerprint == collection_fingerprint(
+            list(ids), list(documents)
+        )
+
+    def place(self, embedding: Sequence[float], k: int = 10) -> Dict[str, Any]:
+        """
+        Place a query embedding into the layout.
+
+        Args:
+            embedding: Query embedding.
+            k: Number of neighbours used for interpolation and returned.
+
+        Returns:
+            Dictionary with the interpolated ``position`` and ``neighbours``
+            (index, id, similarity, position), most similar first.
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        similarities = self.embeddings @ query
+        k = max(1, min(k, len(similarities)))
+        nearest = np.argpartition(-similarities, k - 1)[:k]
+        nearest = nearest[np.argsort(-similarities[nearest])]
+
+        # Closer neighbours pull harder; cosine distance of 0 means "on top"
+        distances = np.clip(1.0 - similarities[nearest], 0.0, None)
+        weights = 1.0 / (distances + 1e-6)
+        position = (self.positions[nearest] * weights[:, None]).sum(0) / weights.sum()
+
+        return {
+            "position": position.tolist(),
+            "neighbours": [
+                {
+                    "index": int(index),
+                    "id": self.ids[index],
+                    "similarity": float(similarities[index]),
+                    "position": self.positions[index].tolist(),
+                }
+                for index in nearest
+            ],
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point: ``python -m visualize.layout``."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectorstore", help="Vector store root directory")
+    parser.add_argument("--output", help="Layout file (default: VISUALIZE_LAYOUT)")
+    parser.add_argument("--perplexity", type=float, default=40.0)
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    import chromadb
+
+    from recog_ai.config import default_vectorstore_path
+    from recog_ai.sync import resolve_snapshot
+
+    path = resolve_snapshot(args.vectorstore or default_vectorstore_path())
+    collection = chromadb.PersistentClient(path).get_collection("langchain")
+    stored = collection.get(include=["embeddings", "documents"])
+    layout = Layout.compute(
+        stored["ids"],
+        stored["embeddings"],
+        stored["documents"],
+        perplexity=args.perplexity,
+        iterations=args.iterations,
+    )
+    layout.save(args.output or default_layout_path())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
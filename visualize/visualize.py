@@ -1,80 +1,227 @@
 import chromadb
 from flask import Flask
 from flask_cors import CORS
-import time
 import json
+import logging
+import os
+import threading
 import numpy as np
 import pandas as pd
-from sklearn.decomposition import PCA
-from sklearn.manifold import TSNE
 import webbrowser
 from flask import Blueprint
+from flask import abort
 from flask import cli
-from flask import Response
+from flask import jsonify
 from flask import request
+from recog_ai.assets import AssetCache
+from visualize.layout import Layout, default_layout_path
 cli.show_server_banner = lambda *_: None
-        
+
+logger = logging.getLogger(__name__)
+
 visualize_bp = Blueprint('visualize', __name__)
 
-data = [[]]
+collection = None
+collection_source = None
+data = None
+layout = None
+layout_path = None
+embed_fn = None
+layout_lock = threading.Lock()
+# Background layout computation: (collection, thread) of the running job
+layout_job = None
+
+# The built frontend (index.html and hashed bundles), read and compressed once
+assets = AssetCache(os.path.dirname(os.path.abspath(__file__)))
+
+def initChromaviz(col, embed=None, path=None):
+    """
+    Register the collection to visualize.
+
+    Documents and the layout are loaded on the first request that needs
+    them, so processes that never serve the map do not hold them.
+
+    Args:
+        col: Chroma collection to visualize, or a callable returning the
+            current one; data is reloaded when it returns another collection
+            (e.g. after a vector store snapshot swap).
+        embed: Function embedding a query text, used to place queries.
+        path: Layout file (default: ``VISUALIZE_LAYOUT``).
+    """
+    global collection, collection_source, data, embed_fn, layout, layout_path
+    with layout_lock:
+        collection_source = col
+        collection = None
+        data = None
+        layout = None
+    embed_fn = embed
+    layout_path = path or default_layout_path()
+
+def _refresh():
+    """Drop loaded data if the source now returns another collection (caller holds the lock)."""
+    global collection, data, layout
+    current = collection_source() if callable(collection_source) else collection_source
+    if current is not collection:
+        collection = current
+        data = None
+        layout = None
+
+def _stored_layout(ids, documents):
+    """Return the persisted layout if it matches the documents, else None."""
+    if not os.path.exists(layout_path):
+        return None
+    try:
+        stored = Layout.load(layout_path)
+    except (OSError, ValueError, KeyError):
+        logger.warning("Ignoring unreadable layout %s", layout_path)
+        return None
+    if not stored.matches(ids, documents):
+        logger.info("Layout %s is stale and will be recomputed", layout_path)
+        return None
+    return stored
+
+def _load():
+    """Load documents and the persisted layout (caller holds the lock)."""
+    global data, layout
+    if data is None:
+        # Embeddings are only needed to fit a layout; the layout keeps its
+        # own float32 copy for placing queries
+        data = collection.get(include=["documents", "metadatas"])
+        data["embeddings"] = None
+        layout = _stored_layout(data["ids"], data["documents"])
+    if layout is None:
+        _start_layout_job()
+
+def _start_layout_job():
+    """Compute a missing layout in a background thread (caller holds the lock)."""
+    global layout_job
+    if layout_job is not None and layout_job[0] is collection and layout_job[1].is_alive():
+        return
+    thread = threading.Thread(
+        target=_compute_layout,
+        args=(collection, data),
+        name="visualize-layout",
+        daemon=True,
+    )
+    layout_job = (collection, thread)
+    thread.start()
+
+def _compute_layout(target, source):
+    """Fit and persist the layout of ``target`` for ``source`` without holding the lock."""
+    global layout
+    ids = source["ids"]
+    try:
+        stored = target.get(include=["embeddings"])
+        order = {doc_id: i for i, doc_id in enumerate(stored["ids"])}
+        computed = Layout.compute(
+            ids, [stored["embeddings"][order[doc_id]] for doc_id in ids], source["documents"]
+        )
+    except Exception:
+        logger.exception("Layout computation failed")
+        return
+    with layout_lock:
+        # Only pair the layout with the data it was computed for
+        current = collection is target and data is source
+        if current:
+            layout = computed
+    if current and layout_path:
+        try:
+            computed.save(layout_path)
+        except OSError:
+            logger.warning("Could not persist layout to %s", layout_path)
+
+def get_data():
+    """Return documents and metadata, loading them on first use."""
+    with layout_lock:
+        _refresh()
+        if data is None:
+            _load()
+        return data
+
+def get_view(wait=False):
+    """
+    Return the layout and the data it was computed for, from one locked read.
+
+    Indexes into the layout are only valid for its own data; reading both
+    separately could pair them across a snapshot swap. A missing or stale
+    layout is computed in the background; until it is ready the layout is
+    None, or with ``wait`` the call blocks for it (warm start).
+    """
+    while True:
+        with layout_lock:
+            _refresh()
+            if data is None or layout is None:
+                _load()
+            if layout is not None or not wait:
+                return layout, data
+            job = layout_job[1]
+        job.join()
+        with layout_lock:
+            if layout is None and layout_job[1] is job:
+                # The computation failed; do not retry in a loop
+                return None, data
+
+def get_layout(wait=False):
+    """Return the layout, loading the persisted one on first use (see ``get_view``)."""
+    return get_view(wait)[0]
 
-def initChromaviz(col: chromadb.api.models.Collection.Collection):
-    global data
-    data = col.get(include=["documents", "metadatas", "embeddings"])
+def layout_pending():
+    """Answer requests that need the layout while it is being computed."""
+    response = jsonify({"error": "layout is being computed"})
+    response.status_code = 503
+    response.headers["Retry-After"] = "10"
+    return response
+
+def memory_usage():
+    """Memory held by the loaded documents and layout."""
+    from recog_ai.memory import deep_sizeof
+
+    with layout_lock:
+        size = deep_sizeof(data) if data is not None else 0
+        if layout is not None:
+            size += layout.embeddings.nbytes + layout.positions.nbytes + layout.groups.nbytes
+        return {"bytes": size, "loaded": data is not None}
+
+def send_asset(name):
+    """Serve a file of the visualization bundle from memory."""
+    response = assets.response(
+        name,
+        accept_encoding=request.headers.get("Accept-Encoding"),
+        if_none_match=request.headers.get("If-None-Match"),
+    )
+    if response is None:
+        abort(404)
+    return response
 
 @visualize_bp.route("/visualize", methods=["GET"])
 def hello_world():
-    with open("visualize/index.html", "r") as file:
-        contents = file.read()
-        return contents
+    return send_asset("index.html")
 
 @visualize_bp.route('/assets/<path:filename>')
 def serve_assets(filename):
-
-    mime = 'text/html'
-
-    if(".js" in filename):
-         mime = 'text/javascript'
-    if('.css' in filename):
-        mime = 'text/css'
-    # Logic to serve the assets
-    # Here, you can use the `filename` parameter to determine which asset to serve
-    # You can use the `url_for` function to generate the URL for the asset dynamically
-    with open(f"visualize/{filename}", "r") as file:
-        contents = file.read()
-        return Response(contents, mimetype=mime)
+    return send_asset(filename)
 
 @visualize_bp.route("/import-data", methods=["POST"])
 def import_data_api():
-     global data
-     data = json.loads(request.data)
+     global data, layout
+     imported = json.loads(request.data)
+     # Imported data has its own ids; never persist over the collection layout
+     computed = Layout.compute(imported["ids"], imported["embeddings"], imported["documents"])
+     imported["embeddings"] = None
+     with layout_lock:
+         _refresh()
+         layout = computed
+         data = imported
      return '', 204
 
 @visualize_bp.route("/data", methods=["GET"])
 def data_api():
-    df = pd.DataFrame.from_dict(data=data["embeddings"])
-    
-    pca_50 = PCA(n_components=50)
-    pca_result_50 = pca_50.fit_transform(df)
-
-    print('Cumulative explained variation for 50 principal components: {}'.format(np.sum(pca_50.explained_variance_ratio_)))
-
-    time_start = time.time()
-
-    tsne = TSNE(n_components=3, verbose=0, perplexity=40, n_iter=300)
-    tsne_pca_results = tsne.fit_transform(pca_result_50)
-
-    print('t-SNE done! Time elapsed: {} seconds'.format(time.time()-time_start))
-    tsne_pca_results = tsne_pca_results / 3
-
-    pca_3 = PCA(n_components=3)
-    pca_result_3 = pca_3.fit_transform(df)
-    pca_result_3 *= 10
-
-    groups = np.argmax(pca_result_50, axis=1)
+    current, data = get_view()
+    if current is None:
+        return layout_pending()
 
     points = []
-    for position, document, metadata, id, group in zip(tsne_pca_results.tolist(), data["documents"], data["metadatas"], data["ids"], groups.tolist()):
+    for position, document, metadata, id, group in zip(current.positions.tolist(), data["documents"], data["metadatas"], data["ids"], current.groups.tolist()):
         point = {
         'position': position,
         'document': document,
@@ -83,4 +230,42 @@ def data_api():
         'group': group
         }
         points.append(point)
-    return json.dumps({'points': points})
\ No newline at end of file
+    return json.dumps({'points': points})
+
+@visualize_bp.route("/visualize/query", methods=["POST"])
+def query_api():
+    """
+    Place a query into the layout without refitting.
+
+    Expects JSON with ``text`` (embedded with the app's embedding) or a
+    precomputed ``embedding``, and optionally ``k`` neighbours (default 10).
+    """
+    payload = request.get_json(silent=True) or {}
+    embedding = payload.get("embedding")
+    if embedding is None:
+        if not payload.get("text") or embed_fn is None:
+            return jsonify({"error": "text or embedding required"}), 400
+        embedding = embed_fn(payload["text"])
+    elif not isinstance(embedding, list) or not all(
+        isinstance(value, (int, float)) and not isinstance(value, bool)
+        for value in embedding
+    ):
+        return jsonify({"error": "embedding must be a list of numbers"}), 400
+    try:
+        k = int(payload.get("k", 10))
+    except (TypeError, ValueError):
+        return jsonify({"error": "k must be an integer"}), 400
+
+    current, data = get_view()
+    if current is None:
+        return layout_pending()
+    embedding = np.asarray(embedding, dtype=np.float32)
+    dimensions = current.embeddings.shape[1]
+    if embedding.shape != (dimensions,) or not np.all(np.isfinite(embedding)):
+        return jsonify({"error": f"embedding must have {dimensions} finite values"}), 400
+    placement = current.place(embedding, k=k)
+    for neighbour in placement["neighbours"]:
+        metadata = data["metadatas"][neighbour["index"]] or {}
+        neighbour["title"] = metadata.get("title") or metadata.get("name")
+        neighbour["group"] = int(current.groups[neighbour["index"]])
+    return jsonify(placement)